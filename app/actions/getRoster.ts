@@ -1,18 +1,7 @@
 "use server";
 
-import { DeepARInput } from "@/types/types";
-import { InvokeEndpointCommand, SageMakerRuntimeClient } from "@aws-sdk/client-sagemaker-runtime";
+import { Roster } from "@/types/types";
 import { LambdaClient, InvokeCommand } from "@aws-sdk/client-lambda";
-import { db } from "@/lib/db";
-
-// SageMaker client
-const sageMakerClient = new SageMakerRuntimeClient({
-    region: "us-east-1",
-    credentials: {
-        accessKeyId: process.env.ACCESS_KEY_ID_AWS!,
-        secretAccessKey: process.env.SECRET_ACCESS_KEY_AWS!,
-    },
-});
 
 // Lambda client
 const lambdaClient = new LambdaClient({
@@ -23,31 +12,31 @@ const lambdaClient = new LambdaClient({
     },
 });
 
-const sageMakerEndpointName = "forecasting-deepar-2025-09-21-08-50-50-702";
 const lambdaFunctionName = "rostering_final";
 
+// Weeks ahead to forecast demand for inside the Lambda; unset = plain N.
+// Only enable it where the Lambda has a FORECAST_DATA_PATH table for one ward.
+const forecastWeeksAhead = Number(process.env.ROSTER_FORECAST_WEEKS_AHEAD) || 0;
+
+async function invokeRostering(payload: object) {
+    const lambdaCommand = new InvokeCommand({
+        FunctionName: lambdaFunctionName,
+        Payload: Buffer.from(JSON.stringify(payload)),
+    });
+    const lambdaResponse = await lambdaClient.send(lambdaCommand);
+    const lambdaBody = new TextDecoder("utf-8").decode(lambdaResponse.Payload as Uint8Array);
+    return JSON.parse(lambdaBody);
+}
+
 /**
- * Call SageMaker DeepAR endpoint and then rostering_final Lambda
- * @param input - DeepAR input
- * @returns The mean prediction value
+ * Call the rostering_final Lambda. With ROSTER_FORECAST_WEEKS_AHEAD set,
+ * demand is forecast inside the Lambda ("forecast" key) and added on top of
+ * the base N per day and shift; if the forecast fails, the roster is solved
+ * again for plain N.
+ * @returns The roster, or null if the Lambda returned none
  */
-export async function getRosterAction(input: DeepARInput): Promise<number | null> {
+export async function getRosterAction(): Promise<Roster | null> {
     try {
-        // --- Step 1: Call SageMaker DeepAR ---
-        const smCommand = new InvokeEndpointCommand({
-            EndpointName: sageMakerEndpointName,
-            ContentType: "application/json",
-            Body: JSON.stringify(input),
-        });
-
-        const smResponse = await sageMakerClient.send(smCommand);
-        const smBody = new TextDecoder("utf-8").decode(smResponse.Body);
-        const smResult = JSON.parse(smBody);
-
-        const meanValues = smResult.predictions.map((pred: { mean: number[] }) => pred.mean);
-
-        // --- Step 3: Call rostering_final Lambda ---
-        // Using your provided input as test payload
         const lambdaPayload = {
             nurse_profiles: [
                 { nurse_id: "n001", preferred_days_off: [0, 6], preferred_shift_type: 0 },
@@ -60,22 +49,24 @@ export async function getRosterAction(input: DeepARInput): Promise<number | null
             max_seconds: 20,
         };
 
-        const lambdaCommand = new InvokeCommand({
-            FunctionName: lambdaFunctionName,
-            Payload: Buffer.from(JSON.stringify(lambdaPayload)),
-        });
-
-
-        const lambdaResponse = await lambdaClient.send(lambdaCommand);
-        const lambdaBody = new TextDecoder("utf-8").decode(lambdaResponse.Payload as Uint8Array);
-        const lambdaResult = JSON.parse(lambdaBody);
+        let lambdaResult = forecastWeeksAhead > 0
+            ? await invokeRostering({ ...lambdaPayload, forecast: { weeks_ahead: forecastWeeksAhead } })
+            : await invokeRostering(lambdaPayload);
+        if (lambdaResult.error && forecastWeeksAhead > 0) {
+            console.warn("Forecast roster failed, falling back to N:", lambdaResult.error);
+            lambdaResult = await invokeRostering(lambdaPayload);
+        }
+        if (lambdaResult.error) {
+            console.error("Rostering error:", lambdaResult.error);
+            return null;
+        }
 
         console.log("Rostering response:", lambdaResult.roster);
 
-        return lambdaResult.roster
+        return (lambdaResult.roster as Roster) ?? null;
 
     } catch (err) {
-        console.error("Error calling endpoint or Lambda:", err);
+        console.error("Error calling Lambda:", err);
         return null;
     }
 }
@@ -1,28 +1,13 @@
 "use client";
 import { getRosterAction } from "@/app/actions/getRoster";
-import { DeepARInput } from "@/types/types";
 import { useTransition } from "react";
 
 export default function AdminDashboardPage() {
   const [isPending, startTransition] = useTransition();
 
   async function getRoster() {
-    const userInput: DeepARInput = {
-      instances: [
-        {
-          start: "2024-01-01T00:00:00",
-          target: [10, 12, 15, 17, 20, 22, 25, 27],
-        },
-      ],
-      configuration: {
-        num_samples: 100,
-        output_types: ["mean", "quantiles"],
-        quantiles: ["0.1", "0.5", "0.9"],
-      },
-    };
     startTransition(async () => {
-      let N = await getRosterAction(userInput);
-      N = N ? Math.ceil(N) : null;
+      await getRosterAction();
     });
   }
   return (
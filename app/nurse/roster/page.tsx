@@ -3,7 +3,7 @@ import { useState, useEffect } from "react";
 import { Calendar, momentLocalizer, Event } from "react-big-calendar";
 import moment from "moment";
 import "react-big-calendar/lib/css/react-big-calendar.css";
-import { DeepARInput } from "@/types/types";
+import { Roster } from "@/types/types";
 import { getRosterAction } from "@/app/actions/getRoster";
 
 const localizer = momentLocalizer(moment);
@@ -13,22 +13,10 @@ export default function RosterPage() {
   const [loading, setLoading] = useState(false);
 
   async function fetchRoster() {
-    // Example DeepAR input
     setLoading(true);
-    const input: DeepARInput = {
-      instances: [
-        { start: "2025-09-21T00:00:00", target: [10, 12, 15, 17, 20] },
-      ],
-      configuration: {
-        num_samples: 100,
-        output_types: ["mean"],
-        quantiles: ["0.1", "0.5", "0.9"],
-      },
-    };
-
-    const roster = await getRosterAction(input);
-    if (roster && typeof roster === "object" && !Array.isArray(roster)) {
-      setEvents(transformRosterToEvents(roster as Roster));
+    const roster = await getRosterAction();
+    if (roster) {
+      setEvents(transformRosterToEvents(roster));
     }
     setLoading(false);
   }
@@ -122,13 +110,6 @@ export default function RosterPage() {
     </main>
   );
 }
-type Roster = {
-  [day: string]: {
-    day_shift: string[];
-    night_shift: string[];
-  };
-};
-
 function transformRosterToEvents(roster: Roster): Event[] {
   const daysOfWeek = [
     "Sunday",
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+NURSE ROSTERING SOLVER BENCHMARK
+================================
+Runs the rostering engines over the bundled INRC-II instances and writes one
+machine-readable record per run:
+
+- engine "full":   FinalMalaysianNurseRoster rolling horizon (all weeks)
+- engine "decomposed": the same horizon solved by skill block, then repaired
+- engine "aggregated": the same horizon solved as staffing counts per nurse
+  class, then individuals assigned per class
+- engine "lambda": lambda_rostering.build_and_solve on the first week
+- engine "greedy": greedy_roster.construct_roster on the same first week
+
+Each record holds build time, time-to-first-feasible, time-to-best, final
+objective and the gap to CP-SAT's bound. Horizon engines are also scored
+under the INRC-II rules by inrc2_scorer ("inrc2_penalty") and, where
+testdatasets_json ships a Solution_* folder for the same history/week
+sequence, compared with that reference roster's INRC-II penalty
+("reference_objective", "reference_gap").
+
+Usage:
+    python benchmark.py --suite test --engines full,lambda --time-limit 10
+    python benchmark.py --suite datasets --instances n030w4,n120w8 --weeks 1
+    python benchmark.py --suite test --compare output/benchmark_baseline.json
+    python benchmark.py --suite datasets --instances n120w4 --weeks 1 --lns-seconds 20
+    python benchmark.py --suite datasets --instances n100w8,n120w8 --engines full,aggregated
+    python benchmark.py --suite datasets --instances n060w4 --weeks 1 --workers 2 --seeds 4
+    python benchmark.py tune --classes small,medium --time-limit 5   (see tuning.py)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from final_complete_system import FinalMalaysianNurseRoster
+from greedy_roster import construct_roster
+from inrc2_scorer import Inrc2Scorer, read_solution_folder
+from lambda_rostering import DAY_NAMES as LAMBDA_DAY_NAMES
+from lambda_rostering import build_and_solve
+from solver_config import SolverConfig
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SUITES = {
+    "datasets": os.path.join(BASE_DIR, "dataset", "datasets_json"),
+    "hidden": os.path.join(BASE_DIR, "dataset", "hidden-JSON"),
+    "test": os.path.join(BASE_DIR, "dataset", "testdatasets_json"),
+}
+ENGINES = ["full", "decomposed", "aggregated", "lambda", "greedy"]
+HORIZON_ENGINES = ["full", "decomposed", "aggregated"]
+LATENCY_METRICS = ["build_time", "time_to_first_feasible", "time_to_best"]
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def discover_instances(root: str) -> List[str]:
+    """Scenario ids under a suite root (per-scenario folders or flat Sc-*.json files)."""
+    instances = set()
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and os.path.exists(os.path.join(path, f"Sc-{name}.json")):
+            instances.add(name)
+        elif name.startswith("Sc-") and name.endswith(".json"):
+            instances.add(name[len("Sc-"):-len(".json")])
+    return sorted(instances)
+
+
+def reference_runs(root: str, scenario_id: str) -> List[Dict]:
+    """Reference rosters from Solution_H_<h>-WD_<a-b-...> folders, one entry per folder."""
+    scenario_path = os.path.join(root, scenario_id)
+    runs = []
+    if not os.path.isdir(scenario_path):
+        return runs
+
+    for folder in sorted(os.listdir(scenario_path)):
+        if not folder.startswith("Solution_H_"):
+            continue
+        history_id, week_demand_ids, weekly_assignments = read_solution_folder(
+            os.path.join(scenario_path, folder), scenario_id)
+        runs.append({
+            "history_id": history_id,
+            "week_demand_ids": week_demand_ids,
+            "reference": folder,
+            "weekly_assignments": weekly_assignments,
+        })
+    return runs
+
+
+def relative_gap(objective: Optional[float], reference: Optional[float]) -> Optional[float]:
+    """(objective - reference) / max(1, |reference|); None if either side is missing."""
+    if objective is None or reference is None:
+        return None
+    return (objective - reference) / max(1.0, abs(reference))
+
+
+def bound_gap(objective: Optional[float], bound: Optional[float]) -> Optional[float]:
+    """(objective - bound) / max(1, |objective|), CP-SAT's relative gap; None if either side is missing."""
+    if objective is None or bound is None:
+        return None
+    return (objective - bound) / max(1.0, abs(objective))
+
+
+def lambda_inputs(system: FinalMalaysianNurseRoster, scenario_id: str, demand_id: str):
+    """Derive lambda nurse_profiles and N from an INRC-II scenario week."""
+    store = system.scenarios[scenario_id]["store"]
+    week = store.week_index[demand_id]
+
+    # A day off is a day with every shift requested off ("Any")
+    days_off = store.shift_off[week].all(axis=2)  # nurse x Monday-first day
+    lambda_days = [LAMBDA_DAY_NAMES.index(day) for day in WEEKDAY_NAMES]
+    nurse_profiles = [
+        {"nurse_id": nurse, "preferred_days_off": sorted(lambda_days[d] for d in np.flatnonzero(days_off[i])),
+         "preferred_shift_type": 0}
+        for i, nurse in enumerate(store.nurses)
+    ]
+    daily_minimum = store.demand_minimum[week].sum(axis=(1, 2))
+    N = math.ceil(int(daily_minimum.sum()) / len(daily_minimum))
+    return nurse_profiles, N
+
+
+def summarize_incumbents(solves: List[Dict]) -> Dict:
+    """Aggregate per-solve timings/objectives (one solve per week) into a run record."""
+    first = [s["incumbents"][0]["wall_time"] for s in solves if s.get("incumbents")]
+    best = [s["incumbents"][-1]["wall_time"] for s in solves if s.get("incumbents")]
+    objective = sum(s["objective"] for s in solves)
+    best_bound = sum(s["best_bound"] for s in solves)
+    return {
+        "build_time": sum(s["build_time"] for s in solves),
+        "solve_time": sum(s["solve_time"] for s in solves),
+        "time_to_first_feasible": sum(first) if len(first) == len(solves) else None,
+        "time_to_best": sum(best) if len(best) == len(solves) else None,
+        "objective": objective,
+        "best_bound": best_bound,
+        "bound_gap": bound_gap(objective, best_bound),
+        "num_incumbents": sum(len(s.get("incumbents", [])) for s in solves),
+    }
+
+
+def run_full(system: FinalMalaysianNurseRoster, scenario_id: str, run: Dict, time_limit: float,
+             lns_seconds: float = 0.0, break_symmetry: bool = False,
+             solver_config: Optional[SolverConfig] = None,
+             decompose: bool = False, aggregate: bool = False) -> Dict:
+    """Rolling-horizon run of FinalMalaysianNurseRoster, compared with a reference roster if given."""
+    horizon = system.load_and_solve_rolling_horizon(
+        scenario_id, week_demand_ids=run["week_demand_ids"],
+        history_id=run["history_id"], time_limit_per_week=time_limit, decompose=decompose,
+        aggregate=aggregate, lns_seconds=lns_seconds, break_symmetry=break_symmetry,
+        solver_config=solver_config)
+    if not horizon:
+        return {"status": "NO_SOLUTION"}
+
+    record = {"status": "FEASIBLE", **summarize_incumbents(horizon["weeks"])}
+    scorer = Inrc2Scorer(system.scenarios[scenario_id]["store"], run["week_demand_ids"], run["history_id"])
+    inrc2 = scorer.score([week["assignments"] for week in horizon["weeks"]])
+    record["inrc2_penalty"] = inrc2["penalty"]
+    record["inrc2_feasible"] = inrc2["feasible"]
+    if run.get("weekly_assignments"):
+        evaluation = system.evaluate_rolling_horizon(
+            scenario_id, run["weekly_assignments"], run["week_demand_ids"], history_id=run["history_id"])
+        record["reference"] = run["reference"]
+        record["reference_objective"] = evaluation.get("objective")
+        record["reference_feasible"] = evaluation["feasible"]
+        record["reference_gap"] = relative_gap(record["inrc2_penalty"], evaluation.get("objective"))
+    return record
+
+
+def run_decomposed(system: FinalMalaysianNurseRoster, scenario_id: str, run: Dict, time_limit: float,
+                   **options) -> Dict:
+    """run_full with each week solved by skill block and repaired."""
+    return run_full(system, scenario_id, run, time_limit, decompose=True, **options)
+
+
+def run_aggregated(system: FinalMalaysianNurseRoster, scenario_id: str, run: Dict, time_limit: float,
+                   **options) -> Dict:
+    """run_full with each week solved as class staffing counts, then per-class assignment."""
+    return run_full(system, scenario_id, run, time_limit, aggregate=True, **options)
+
+
+def run_lambda(system: FinalMalaysianNurseRoster, scenario_id: str, run: Dict, time_limit: float,
+               lns_seconds: float = 0.0, break_symmetry: bool = False,
+               solver_config: Optional[SolverConfig] = None) -> Dict:
+    """Single-week build_and_solve run on profiles/demand derived from the instance."""
+    nurse_profiles, N = lambda_inputs(system, scenario_id, run["week_demand_ids"][0])
+    result = build_and_solve(nurse_profiles, N, time_limit=time_limit, lns_seconds=lns_seconds,
+                             break_symmetry=break_symmetry, solver_config=solver_config)
+    if "error" in result:
+        return {"status": result["status"], "build_time": result["build_time"]}
+    return {"status": result["status"], "N": N, **summarize_incumbents([result])}
+
+
+def run_greedy(system: FinalMalaysianNurseRoster, scenario_id: str, run: Dict, time_limit: float,
+               **options) -> Dict:
+    """Single-week construct_roster run on the run_lambda inputs; no solver, so no bound."""
+    nurse_profiles, N = lambda_inputs(system, scenario_id, run["week_demand_ids"][0])
+    result = construct_roster(nurse_profiles, N)
+    return {
+        "status": result["status"],
+        "N": N,
+        "build_time": result["build_time"],
+        "time_to_first_feasible": result["build_time"],
+        "time_to_best": result["build_time"],
+        "objective": result["objective"],
+        "uncovered": sum(result["slack"].values()),
+    }
+
+
+RUNNERS = {"full": run_full, "decomposed": run_decomposed, "aggregated": run_aggregated,
+           "lambda": run_lambda, "greedy": run_greedy}
+
+
+def run_benchmark(suites: List[str], engines: List[str], instances: Optional[List[str]],
+                  weeks: Optional[int], time_limit: float, verbose: bool = False,
+                  lns_seconds: float = 0.0, break_symmetry: bool = False,
+                  solver_config: Optional[SolverConfig] = None) -> List[Dict]:
+    """Run every selected (suite, instance, engine, history/week sequence) combination."""
+    records = []
+    for suite in suites:
+        root = SUITES[suite]
+        system = FinalMalaysianNurseRoster(datasets_path=root)
+        for scenario_id in discover_instances(root):
+            if instances and scenario_id not in instances:
+                continue
+
+            with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+                loaded = system._load_scenario(scenario_id)
+            if not loaded:
+                continue
+
+            runs = reference_runs(root, scenario_id)
+            if not runs:
+                scenario_data = system.scenarios[scenario_id]
+                num_weeks = scenario_data["scenario_config"].get("numberOfWeeks", 1)
+                runs = [{"history_id": "0", "week_demand_ids": scenario_data["demand_ids"][:num_weeks]}]
+            for run in runs:
+                if weeks:
+                    run["week_demand_ids"] = run["week_demand_ids"][:weeks]
+                    if run.get("weekly_assignments"):
+                        run["weekly_assignments"] = run["weekly_assignments"][:weeks]
+
+            for engine in engines:
+                for run in runs if engine in HORIZON_ENGINES else runs[:1]:
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+                        result = RUNNERS[engine](system, scenario_id, run, time_limit, lns_seconds=lns_seconds,
+                                                 break_symmetry=break_symmetry, solver_config=solver_config)
+                    record = {
+                        "suite": suite,
+                        "instance": scenario_id,
+                        "engine": engine,
+                        "history_id": run["history_id"],
+                        "week_demand_ids": (run["week_demand_ids"] if engine in HORIZON_ENGINES
+                                            else run["week_demand_ids"][:1]),
+                        "time_limit": time_limit,
+                        "lns_seconds": lns_seconds,
+                        "break_symmetry": break_symmetry,
+                        "solver": (solver_config or system.SOLVER_CONFIG).as_dict(),
+                        "wall_time": time.perf_counter() - start,
+                        **result,
+                    }
+                    records.append(record)
+                    print(f"   {suite:8} {scenario_id:8} {engine:10} H{run['history_id']} "
+                          f"{record['status']:11} obj={record.get('objective')} "
+                          f"first={_fmt(record.get('time_to_first_feasible'))} "
+                          f"best={_fmt(record.get('time_to_best'))} "
+                          f"ref_gap={_fmt(record.get('reference_gap'))} "
+                          f"inrc2={record.get('inrc2_penalty')}")
+    return records
+
+
+def compare_with_baseline(records: List[Dict], baseline: Dict, max_slowdown: float,
+                          min_seconds: float = 0.05) -> List[str]:
+    """Latency regressions of `records` against a previous benchmark file."""
+    def run_key(r):
+        return (r["suite"], r["instance"], r["engine"], r["history_id"], tuple(r["week_demand_ids"]))
+
+    previous = {run_key(r): r for r in baseline.get("runs", [])}
+    regressions = []
+    for record in records:
+        old = previous.get(run_key(record))
+        if not old:
+            continue
+        for metric in LATENCY_METRICS:
+            new_value, old_value = record.get(metric), old.get(metric)
+            if new_value is None or old_value is None:
+                continue
+            if new_value > old_value * max_slowdown + min_seconds:
+                regressions.append(f"{record['instance']} {record['engine']} H{record['history_id']} "
+                                   f"{metric}: {old_value:.3f}s -> {new_value:.3f}s")
+    return regressions
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+def main():
+    if sys.argv[1:2] == ["tune"]:
+        from tuning import main as tune  # tuning imports this module
+
+        return tune(sys.argv[2:])
+
+    parser = argparse.ArgumentParser(description="Benchmark the nurse rostering solvers")
+    parser.add_argument("--suite", default="test",
+                        help=f"comma-separated suites: {','.join(SUITES)} or all")
+    parser.add_argument("--engines", default="full,lambda", help=f"comma-separated engines: {','.join(ENGINES)}")
+    parser.add_argument("--instances", default="", help="comma-separated scenario ids (default: all)")
+    parser.add_argument("--weeks", type=int, default=None, help="solve at most this many weeks per run")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="solver seconds per week")
+    parser.add_argument("--lns-seconds", type=float, default=0.0,
+                        help="LNS improvement seconds after each solve (0 = off)")
+    parser.add_argument("--break-symmetry", action="store_true",
+                        help="lex-order interchangeable nurses in the CP-SAT models")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="CP-SAT search workers per solve (default: available CPUs)")
+    parser.add_argument("--subsolvers", default="",
+                        help="comma-separated fixed CP-SAT subsolvers (default: portfolio)")
+    parser.add_argument("--seeds", type=int, default=1,
+                        help="independent seeded solves per model, best kept")
+    parser.add_argument("--output", default="output/benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="previous results file to check for regressions")
+    parser.add_argument("--max-slowdown", type=float, default=1.25,
+                        help="allowed latency ratio versus --compare before failing")
+    parser.add_argument("--verbose", action="store_true", help="show solver output")
+    args = parser.parse_args()
+
+    suites = list(SUITES) if args.suite == "all" else args.suite.split(",")
+    engines = args.engines.split(",")
+    for name, allowed in ((suites, SUITES), (engines, ENGINES)):
+        unknown = [n for n in name if n not in allowed]
+        if unknown:
+            parser.error(f"unknown value(s): {', '.join(unknown)}")
+    instances = [i for i in args.instances.split(",") if i] or None
+
+    print("🏁 NURSE ROSTERING BENCHMARK")
+    print("=" * 60)
+    solver_config = SolverConfig(num_workers=args.workers, seeds=args.seeds,
+                                 subsolvers=[s for s in args.subsolvers.split(",") if s] or None)
+    records = run_benchmark(suites, engines, instances, args.weeks, args.time_limit, args.verbose,
+                            args.lns_seconds, args.break_symmetry, solver_config)
+
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "config": vars(args),
+        "runs": records,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved: {args.output} ({len(records)} runs)")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(records, baseline, args.max_slowdown)
+        if regressions:
+            print(f"\n❌ {len(regressions)} latency regression(s) versus {args.compare}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"✅ No latency regressions versus {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
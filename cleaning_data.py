@@ -1,82 +1,174 @@
+"""
+Influenza surveillance -> weekly nurse requirements.
+
+Reads a WHO FluNet style CSV (country, surveillance site type, ISO week,
+specimen counts) in chunks and turns every (country, site type) series into
+weekly ICU and general ward (GW) nurse requirements:
+
+    hospitalised     = influenza_positive * hospitalisation_rate
+    total_admissions = hospitalised summed over this week and the previous
+                       lag_weeks calendar weeks of the same series
+    icu_nurses       = total_admissions * icu_share / icu_patients_per_nurse
+    gw_nurses        = total_admissions * (1 - icu_share) / gw_patients_per_nurse
+
+Rows of a series must arrive in date order (as FluNet exports are); series
+may be interleaved and may span chunk boundaries. Output is a typed
+columnar table written as .npz, which demand_forecast.load_weekly_nurses
+reads, or as Parquet (needs pyarrow) for an output path ending in .parquet.
+
+Usage:
+    python cleaning_data.py [input.csv] [output.npz|output.parquet]
+"""
+
+import sys
+from typing import Dict, Iterator, Optional
+
 import numpy as np
+import pandas as pd
+
+# Input CSV header -> column name
+COLUMNS = {
+    "Country area or territory": "country",
+    "Surveillance site type": "site_type",
+    "Year-week (ISO 8601 calendar)": "year_week",
+    "Week start date (ISO 8601 calendar)": "week_start",
+    "Specimen tested": "specimens_tested",
+    "Influenza positive": "influenza_positive",
+}
+COUNT_COLUMNS = ["specimens_tested", "influenza_positive"]
+GROUP_KEYS = ["country", "site_type"]
+CHUNK_ROWS = 100_000
+
+# Staffing assumptions
+HOSPITALISATION_RATE = 0.01  # 1% of positives admitted to hospital
+LAG_WEEKS = 1  # admissions still in hospital from the previous week
+ICU_SHARE = 0.165  # 16.5% of admissions need ICU
+ICU_PATIENTS_PER_NURSE = 2
+GW_PATIENTS_PER_NURSE = 4
+
+
+def read_surveillance(path: str, chunksize: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield typed chunks of the surveillance CSV; missing counts ("NA") become 0."""
+    reader = pd.read_csv(
+        path,
+        usecols=list(COLUMNS),
+        dtype={"Country area or territory": "category", "Surveillance site type": "category",
+               "Year-week (ISO 8601 calendar)": str},
+        na_values=["NA"],
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        chunk = chunk.rename(columns=COLUMNS)
+        chunk[COUNT_COLUMNS] = chunk[COUNT_COLUMNS].fillna(0).astype(np.int32)
+        chunk["week_start"] = pd.to_datetime(chunk["week_start"], format="%Y-%m-%d")
+        # "2019-44" -> 201944
+        chunk["year_week"] = chunk["year_week"].str.replace("-", "", regex=False).astype(np.int32)
+        yield chunk
+
+
+def compute_staffing(
+    frame: pd.DataFrame,
+    hospitalisation_rate: float = HOSPITALISATION_RATE,
+    lag_weeks: int = LAG_WEEKS,
+    icu_share: float = ICU_SHARE,
+    icu_patients_per_nurse: float = ICU_PATIENTS_PER_NURSE,
+    gw_patients_per_nurse: float = GW_PATIENTS_PER_NURSE,
+) -> pd.DataFrame:
+    """Add admissions and nurse columns to a typed frame, per (country, site type) series."""
+    frame = frame.sort_values([*GROUP_KEYS, "week_start"], kind="stable")
+    hospitalised = frame["influenza_positive"].to_numpy(dtype=np.float64) * hospitalisation_rate
+
+    # Sum over (week_start - (lag_weeks + 1) weeks, week_start] within each series:
+    # rows are ordered by (series, day), so one searchsorted on a combined
+    # series/day key finds every window start and a cumulative sum does the rest
+    series = frame.groupby(GROUP_KEYS, observed=True, sort=False).ngroup().to_numpy(dtype=np.int64)
+    days = frame["week_start"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    key = series * (1 << 32) + (days - days.min(initial=0))
+    window_start = np.searchsorted(key, key - 7 * (lag_weeks + 1), side="right")
+    cumulative = np.concatenate(([0.0], np.cumsum(hospitalised)))
+    admissions = cumulative[1:] - cumulative[window_start]
+
+    frame["total_admissions"] = admissions.astype(np.float32)
+    frame["icu_nurses"] = (admissions * icu_share / icu_patients_per_nurse).astype(np.float32)
+    frame["gw_nurses"] = (admissions * (1 - icu_share) / gw_patients_per_nurse).astype(np.float32)
+    frame["total_nurses"] = frame["icu_nurses"] + frame["gw_nurses"]
+    return frame
+
+
+def iter_staffing(path: str, chunksize: int = CHUNK_ROWS, lag_weeks: int = LAG_WEEKS,
+                  **rates) -> Iterator[pd.DataFrame]:
+    """
+    Stream staffing rows chunk by chunk. The last lag_weeks of every series are
+    carried into the next chunk so lag sums are exact across chunk boundaries.
+    `rates` are passed to compute_staffing.
+    """
+    carry = None
+    for chunk in read_surveillance(path, chunksize):
+        chunk["_carried"] = False
+        frame = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+        for key in GROUP_KEYS:
+            frame[key] = frame[key].astype(str).astype("category")
+
+        staffing = compute_staffing(frame, lag_weeks=lag_weeks, **rates)
+        yield staffing[~staffing["_carried"]].drop(columns="_carried")
+
+        latest = frame.groupby(GROUP_KEYS, observed=True)["week_start"].transform("max")
+        carry = frame[frame["week_start"] > latest - pd.Timedelta(weeks=lag_weeks)].copy()
+        carry["_carried"] = True
+
+
+def staffing_table(path: str, chunksize: int = CHUNK_ROWS, **options) -> pd.DataFrame:
+    """All staffing rows of a CSV as one typed table, ordered by series and week."""
+    table = pd.concat(list(iter_staffing(path, chunksize, **options)), ignore_index=True)
+    for key in GROUP_KEYS:
+        table[key] = table[key].astype(str).astype("category")
+    return table.sort_values([*GROUP_KEYS, "week_start"], kind="stable", ignore_index=True)
+
+
+def write_columnar(table: pd.DataFrame, path: Optional[str] = None) -> str:
+    """
+    Write the table as a NumPy .npz of typed columns, with categoricals
+    stored as int codes plus a <name>_categories array, or as Parquet (needs
+    pyarrow) if the path ends in .parquet. Without a path, the .npz goes to
+    demand_forecast's default input.
+    """
+    if path is None:
+        path = "weekly_nurse_requirements.npz"
+
+    if path.endswith(".parquet"):
+        table.to_parquet(path, index=False)
+        return path
+
+    columns: Dict[str, np.ndarray] = {}
+    for name, column in table.items():
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            columns[name] = column.cat.codes.to_numpy()
+            columns[f"{name}_categories"] = column.cat.categories.to_numpy(dtype="U")
+        elif name == "week_start":
+            columns[name] = column.to_numpy(dtype="datetime64[D]")
+        else:
+            columns[name] = column.to_numpy()
+    np.savez(path, **columns)
+    return path
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else "./influenza_data.csv"
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+
+    table = staffing_table(source)
+    summary = table.groupby(GROUP_KEYS, observed=True).agg(
+        weeks=("week_start", "size"),
+        first_week=("week_start", "min"),
+        last_week=("week_start", "max"),
+        peak_nurses=("total_nurses", "max"),
+        mean_nurses=("total_nurses", "mean"),
+    )
+    print(summary.to_string())
+
+    path = write_columnar(table, output)
+    print(f"Saved {len(table)} rows to {path}")
+
 
-# -------------------------
-# 1. Load CSV
-# -------------------------
-data = np.genfromtxt(
-    "./influenza_data.csv", delimiter=",", encoding="utf-8", skip_header=1, dtype=str
-)
-
-# -------------------------
-# 2. Replace 'NA' with '0'
-# -------------------------
-data[data == "NA"] = "0"
-
-# -------------------------
-# 3. Extract relevant columns
-# Columns in CSV:
-# 0 = Country
-# 1 = Surveillance site type
-# 2 = Year-week
-# 3 = Week start date
-# 4 = Specimen tested
-# 5 = Influenza positive
-# 6 = Influenza negative
-# 7 = A(H1N1)pdm09
-# 8 = A(H3)
-# 9 = A not subtyped
-# 10 = B(Victoria)
-# 11 = B(Yamagata)
-# 12 = B(lineage not determined)
-# -------------------------
-weeks = data[:, 2]  # Year-week
-specimens_tested = data[:, 4].astype(int)
-influenza_positive = data[:, 5].astype(int)
-
-# -------------------------
-# 4. Compute hospitalised patients
-# -------------------------
-hospitalised = influenza_positive * 0.01  # 1% admitted to hospital
-
-# -------------------------
-# 5. Compute total admissions accounting for previous week
-# -------------------------
-total_admissions = np.zeros_like(hospitalised, dtype=float)
-
-for i in range(len(hospitalised)):
-    if i == 0:
-        total_admissions[i] = hospitalised[i]
-    else:
-        total_admissions[i] = hospitalised[i] + hospitalised[i - 1]
-
-# -------------------------
-# 6. Compute ICU and General Ward nurses
-# ICU: 16.5%, 1 nurse per 2 patients
-# GW: 83.5%, 1 nurse per 4 patients
-# -------------------------
-icu_nurses = (total_admissions * 0.165) / 2
-gw_nurses = (total_admissions * 0.835) / 4
-total_nurses = icu_nurses + gw_nurses
-
-# -------------------------
-# 7. Combine results for inspection
-# -------------------------
-results = np.column_stack(
-    (weeks, total_admissions, icu_nurses, gw_nurses, total_nurses)
-)
-
-print("Week | Total Admissions | ICU Nurses | GW Nurses | Total Nurses")
-for row in results:
-    print(row)
-
-# -------------------------
-# 8. Optional: Save to CSV for modeling
-# -------------------------
-np.savetxt(
-    "weekly_nurse_requirements.csv",
-    results,
-    delimiter=",",
-    fmt="%s",
-    header="Week,Total_Admissions,ICU_Nurses,GW_Nurses,Total_Nurses",
-    comments="",
-)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Local nurse demand forecast for the rostering Lambda.
+
+Fits an additive Holt-Winters model (NumPy only) to the weekly nurse
+requirements produced by cleaning_data.py and turns the forecast for a
+target week into a per-day, per-shift demand matrix for
+lambda_rostering.build_and_solve:
+
+    demand[day, shift] = base[day, shift]
+                         + forecast * day_profile[day] * shift_share[shift]
+
+rounded by largest remainder: every cell gets the floor of its share, and
+the cells with the largest fractions get one more nurse each until the added
+demand sums to the ceiling of the whole forecast spread.
+
+Smoothing parameters are chosen by one-step-ahead squared error over a small
+grid, with all grid points run side by side as NumPy vectors. Series shorter
+than two seasons fall back to Holt's linear trend (no seasonal term).
+
+Input may be the .npz table written by cleaning_data.write_columnar, a CSV
+with a Total_Nurses column, or the raw surveillance CSV (processed with
+cleaning_data first).
+"""
+
+import itertools
+import math
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_DATA_PATH = os.environ.get("FORECAST_DATA_PATH", "weekly_nurse_requirements.npz")
+SEASON_LENGTH = 52  # weeks
+ALPHAS = (0.1, 0.2, 0.3, 0.5, 0.7, 0.9)  # level
+BETAS = (0.0, 0.05, 0.1, 0.2)  # trend
+GAMMAS = (0.05, 0.1, 0.3, 0.5)  # season
+
+NUM_DAYS = 7
+SHIFT_SHARE = (0.5, 0.5)  # (day, night) share of the daily requirement
+
+
+def load_weekly_nurses(path: str = DEFAULT_DATA_PATH, country: Optional[str] = None,
+                       site_types: Optional[Sequence[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Weekly total_nurses as (week_start datetime64[D], values), summed over the
+    selected (country, site type) series and with missing weeks interpolated.
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as table:
+            weeks = table["week_start"].astype("datetime64[D]")
+            values = table["total_nurses"].astype(np.float64)
+            keep = np.ones(len(weeks), dtype=bool)
+            if country is not None:
+                keep &= table["country_categories"][table["country"]] == country
+            if site_types is not None:
+                keep &= np.isin(table["site_type_categories"][table["site_type"]], list(site_types))
+        weeks, values = weeks[keep], values[keep]
+    else:
+        with open(path, "r") as f:
+            header = f.readline()
+        if "Total_Nurses" in header:
+            table = np.genfromtxt(path, delimiter=",", names=True, dtype=None, encoding="utf-8")
+            weeks = _iso_week_starts(table["Week"])
+            values = table["Total_Nurses"].astype(np.float64)
+        else:
+            from cleaning_data import staffing_table
+
+            staffing = staffing_table(path)
+            if country is not None:
+                staffing = staffing[staffing["country"] == country]
+            if site_types is not None:
+                staffing = staffing[staffing["site_type"].isin(list(site_types))]
+            weeks = staffing["week_start"].to_numpy(dtype="datetime64[D]")
+            values = staffing["total_nurses"].to_numpy(dtype=np.float64)
+
+    if not len(weeks):
+        raise ValueError(f"No weekly nurse requirements in {path}")
+
+    # One value per week start, then a regular weekly grid
+    unique_weeks, inverse = np.unique(weeks, return_inverse=True)
+    totals = np.bincount(inverse, weights=values)
+    grid = np.arange(unique_weeks[0], unique_weeks[-1] + 1, 7)
+    offsets = (unique_weeks - unique_weeks[0]).astype(np.int64)
+    series = np.interp((grid - grid[0]).astype(np.int64), offsets, totals)
+    return grid, series
+
+
+def _iso_week_starts(year_weeks) -> np.ndarray:
+    """'2020-01' (ISO year-week) -> Monday of that week."""
+    starts = []
+    for value in year_weeks:
+        year, week = (int(part) for part in str(value).split("-"))
+        # Week 1 starts on the Monday on or before 4 January; day 4 (1970-01-05) was a Monday
+        jan4 = np.datetime64(f"{year:04d}-01-04", "D")
+        monday = jan4 - np.timedelta64(int((jan4.astype(np.int64) - 4) % 7), "D")
+        starts.append(monday + np.timedelta64(7 * (week - 1), "D"))
+    return np.array(starts, dtype="datetime64[D]")
+
+
+def _smooth(y: np.ndarray, alpha: np.ndarray, beta: np.ndarray, gamma: Optional[np.ndarray],
+            season_length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Run additive Holt-Winters for every parameter set at once (one entry each).
+    The first season (or first two points without seasonality) initialises the
+    state. Returns final level, trend, seasonal state and one-step-ahead SSE.
+    """
+    k = len(alpha)
+    seasonal = gamma is not None
+    m = season_length if seasonal else 1
+    if seasonal:
+        level = np.full(k, y[:m].mean())
+        trend = np.full(k, (y[m:2 * m].mean() - y[:m].mean()) / m)
+        season = np.tile(y[:m] - y[:m].mean(), (k, 1))
+        first = m
+    else:
+        level = np.full(k, y[0])
+        trend = np.full(k, y[1] - y[0])
+        season = np.zeros((k, 1))
+        first = 1
+
+    sse = np.zeros(k)
+    for t in range(first, len(y)):
+        s = season[:, t % m] if seasonal else 0.0
+        error = y[t] - (level + trend + s)
+        sse += error ** 2
+        previous_level = level
+        level = alpha * (y[t] - s) + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+        if seasonal:
+            season[:, t % m] = gamma * (y[t] - level) + (1 - gamma) * s
+    return level, trend, season, sse
+
+
+def fit_forecast(series: np.ndarray, horizon: int = 1, season_length: int = SEASON_LENGTH) -> Dict:
+    """Fit the best Holt-Winters parameters on `series` and forecast `horizon` steps."""
+    y = np.asarray(series, dtype=np.float64)
+    if len(y) < 3:
+        return {"forecast": np.full(horizon, y.mean() if len(y) else 0.0), "method": "mean"}
+
+    seasonal = len(y) >= 2 * season_length + 1
+    grid = list(itertools.product(ALPHAS, BETAS, GAMMAS if seasonal else (None,)))
+    alpha = np.array([g[0] for g in grid])
+    beta = np.array([g[1] for g in grid])
+    gamma = np.array([g[2] for g in grid]) if seasonal else None
+
+    level, trend, season, sse = _smooth(y, alpha, beta, gamma, season_length)
+    best = int(np.argmin(sse))
+    steps = np.arange(1, horizon + 1)
+    forecast = level[best] + steps * trend[best]
+    if seasonal:
+        forecast = forecast + season[best, (len(y) - 1 + steps) % season_length]
+    return {
+        "forecast": np.maximum(forecast, 0.0),
+        "method": "holt_winters" if seasonal else "holt",
+        "alpha": float(alpha[best]),
+        "beta": float(beta[best]),
+        "gamma": float(gamma[best]) if seasonal else None,
+        "rmse": math.sqrt(sse[best] / max(1, len(y) - (season_length if seasonal else 1))),
+    }
+
+
+def weekly_to_demand(weekly_nurses: float, base: Optional[np.ndarray] = None,
+                     day_profile: Optional[Sequence[float]] = None,
+                     shift_share: Sequence[float] = SHIFT_SHARE) -> np.ndarray:
+    """
+    Integer (day x shift) demand: base plus the forecast spread over days and
+    shifts. The added nurses sum to ceil(weekly_nurses * total weight), with
+    the rounding left over from flooring given to the largest remainders.
+    """
+    profile = np.ones(NUM_DAYS) if day_profile is None else np.asarray(day_profile, dtype=np.float64)
+    exact = weekly_nurses * np.outer(profile, np.asarray(shift_share, dtype=np.float64))
+    extra = np.floor(exact + 1e-9)
+    remaining = max(0, math.ceil(exact.sum() - 1e-9) - int(extra.sum()))
+    # Ties go to the earlier day and shift
+    largest = np.argsort(extra - exact, axis=None, kind="stable")[:remaining]
+    extra.flat[largest] += 1
+    demand = extra.astype(np.int64)
+    if base is not None:
+        demand = demand + np.asarray(base, dtype=np.int64)
+    return demand
+
+
+def forecast_demand(path: str = DEFAULT_DATA_PATH, weeks_ahead: int = 1,
+                    base: Optional[np.ndarray] = None, country: Optional[str] = None,
+                    site_types: Optional[Sequence[str]] = None,
+                    day_profile: Optional[Sequence[float]] = None,
+                    shift_share: Sequence[float] = SHIFT_SHARE) -> Dict:
+    """
+    Forecast the week `weeks_ahead` after the last observed week and return its
+    demand matrix ("demand", days x shifts, as nested lists) with the fit details.
+    """
+    weeks, series = load_weekly_nurses(path, country=country, site_types=site_types)
+    fit = fit_forecast(series, horizon=weeks_ahead)
+    weekly = float(fit["forecast"][-1])
+    demand = weekly_to_demand(weekly, base=base, day_profile=day_profile, shift_share=shift_share)
+    return {
+        "demand": demand.tolist(),
+        "weekly_nurses": weekly,
+        "week_start": str(weeks[-1] + np.timedelta64(7 * weeks_ahead, "D")),
+        "method": fit["method"],
+        "parameters": {k: fit.get(k) for k in ("alpha", "beta", "gamma", "rmse")},
+    }
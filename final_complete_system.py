@@ -7,16 +7,29 @@ Full implementation with ALL Malaysian labor law requirements:
 - Mandatory breaks with coverage
 - Overtime tracking and costs
 - Nursing preferences
-- Real competition data
+- Real competition data, with INRC-II soft constraints weighted as in the competition
 - Government compliance reporting
 """
 
+import contextlib
+import io
+import itertools
 import json
 import pandas as pd
 import numpy as np
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Optional, Tuple
 from ortools.sat.python import cp_model
+from inrc2_scorer import SOFT_WEIGHTS, Inrc2Scorer
+from lns import improve_roster
+from roster_index import RosterIndex
+from scenario_store import ScenarioStore
+from shift_automaton import SequenceRules, add_sequence_constraint
+from solver_config import SolverConfig, SolverProfiles, available_cpus
+from solver_progress import SolverInstrumentation
+from symmetry import add_lex_ordering, equivalence_classes, sort_rows
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
@@ -24,7 +37,9 @@ warnings.filterwarnings('ignore')
 class FinalMalaysianNurseRoster:
     """COMPLETE Malaysian Labor Law Compliant Nurse Rostering System"""
     
-    def __init__(self):
+    def __init__(self, datasets_path: str = "datasets_json",
+                 instrumentation: Optional[SolverInstrumentation] = None,
+                 output_dir: Optional[str] = None, store_path: Optional[str] = None):
         # Malaysian Labor Law Constants (FINAL VERSION)
         self.MAX_HOURS_PER_WEEK = 45  # Work hours
         self.MAX_OVERTIME_PER_MONTH = 104
@@ -44,83 +59,400 @@ class FinalMalaysianNurseRoster:
         self.SHIFT_HOURS = {"Early": 8, "Late": 8, "Night": 12, "Day": 12}
         self.SHIFT_BREAKS = {"Early": 1, "Late": 1, "Night": 2, "Day": 2}  # Breaks per shift
         self.DAYS = range(7)  # Week
-        
+        self.DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday',
+                          'Friday', 'Saturday', 'Sunday']
+        self.TIME_LIMIT_SECONDS = 180.0  # 3 minutes per weekly model
+        self.LOG_SEARCH_PROGRESS = False  # Raw CP-SAT log; telemetry goes through instrumentation
+        # Search workers, subsolvers and seeds (solver_config.py); the default
+        # portfolio uses every CPU available to the container
+        self.SOLVER_CONFIG = SolverConfig()
+        # Tuned settings and time limits per ward size class (tuning.py), used
+        # when no solver_config / time_limit is given; see load_solver_profiles
+        self.SOLVER_PROFILES: Optional[SolverProfiles] = None
+        # Stop once the incumbent is within 1% of the bound or idle for 20s
+        self.EARLY_STOP = {'relative_gap': 0.01, 'stagnation_seconds': 20.0, 'target_objective': None}
+        self.PENALTY_EXTRA_WEEKEND = 5  # Weekend work beyond contract limit
+        # INRC-II soft constraints (optimal coverage, consecutive runs, weekends,
+        # assignment totals, shift-off requests) are weighted as in the competition
+        self.INRC2_WEIGHTS = dict(SOFT_WEIGHTS)
+        # Minimum staffing is hard in INRC-II; only when the Malaysian limits above
+        # make it unreachable does a week miss nurses, as few as possible, each
+        # costing this much (reported as 'understaffing', see _minimize_understaffing)
+        self.PENALTY_UNDERSTAFFED = 1000
+        self.UNDERSTAFFING_TIME_SHARE = 0.5  # Most of the time limit the fewest-missing probe may use
+        self.LNS_SECONDS = 0.0  # Adaptive LNS after each weekly solve (lns.improve_roster); 0 = off
+        # Lex-order interchangeable nurses (same contract, skills, history and
+        # requests); helps close the gap on tight weeks, can slow easy ones
+        self.SYMMETRY_BREAKING = False
+        
+        # Skill-block decomposition (_solve_decomposed): nurses join the block of
+        # their highest skill in this order, blocks solve in parallel processes
+        self.SKILL_BLOCKS = ['HeadNurse', 'Nurse', 'Caretaker', 'Trainee']
+        self.BLOCK_TIME_SHARE = 0.5  # Share of the time limit given to the blocks
+        self.PENALTY_UNCOVERED_BLOCK = 50  # Per missing nurse inside a block model
+        
+        # Aggregated engine (_solve_aggregated): staffing counts per nurse class
+        # (contract, skills, weekend status), then individuals per class
+        self.COUNT_TIME_SHARE = 0.5  # Share of the time limit given to the count model
+        
+        # Reports go to `output_dir` (default ROSTER_OUTPUT_DIR, else ./output);
+        # compiled scenarios to `store_path` (see ScenarioStore)
+        self.OUTPUT_DIR = output_dir or os.environ.get("ROSTER_OUTPUT_DIR", "output")
+        
+        self.datasets_path = datasets_path
+        self.store = ScenarioStore(datasets_path, store_path)
+        self.instrumentation = instrumentation or SolverInstrumentation()
         self.scenarios = {}
         self.solutions = {}
     
-    def load_and_solve_scenario(self, scenario_id: str = "n030w4") -> Dict:
-        """Load scenario and solve with full Malaysian compliance"""
+    def load_and_solve_scenario(self, scenario_id: str = "n030w4", decompose: bool = False,
+                                aggregate: bool = False) -> Dict:
+        """Load scenario and solve with full Malaysian compliance
+        
+        `decompose` solves by skill block first (see `_solve_decomposed`);
+        `aggregate` uses the count-based engine (see `_solve_aggregated`).
+        """
         print(f"🏥🇲🇾 FINAL MALAYSIAN SYSTEM: {scenario_id}")
         print("=" * 60)
         
         # Load scenario data
-        if not self._load_scenario(scenario_id):
+        with self.instrumentation.phase("load", scenario_id=scenario_id):
+            loaded = self._load_scenario(scenario_id)
+        if not loaded:
             return {}
         
         # Solve with ALL Malaysian constraints
-        solution = self._solve_with_full_compliance(scenario_id)
+        if aggregate:
+            solution = self._solve_aggregated(scenario_id)
+        elif decompose:
+            solution = self._solve_decomposed(scenario_id)
+        else:
+            solution = self._solve_with_full_compliance(scenario_id)
         
         if solution:
             # Add break scheduling
-            solution_with_breaks = self._add_break_scheduling(solution)
+            with self.instrumentation.phase("breaks", scenario_id=scenario_id):
+                solution_with_breaks = self._add_break_scheduling(solution)
             
             # Validate complete compliance
-            compliance = self._validate_full_compliance(solution_with_breaks)
+            with self.instrumentation.phase("validate", scenario_id=scenario_id):
+                compliance = self._validate_full_compliance(solution_with_breaks)
             solution_with_breaks['full_compliance'] = compliance
             
             # Generate comprehensive report
-            self._generate_final_report(solution_with_breaks)
+            with self.instrumentation.phase("report", scenario_id=scenario_id):
+                self._generate_final_report(solution_with_breaks)
             
             return solution_with_breaks
         
         return {}
     
-    def _load_scenario(self, scenario_id: str) -> bool:
-        """Load scenario data"""
-        datasets_path = "datasets_json"
-        scenario_path = os.path.join(datasets_path, scenario_id)
+    def load_and_solve_rolling_horizon(self, scenario_id: str = "n030w4",
+                                       week_demand_ids: Optional[List[str]] = None,
+                                       history_id: str = "0",
+                                       time_limit_per_week: Optional[float] = None,
+                                       decompose: bool = False, aggregate: bool = False,
+                                       lns_seconds: Optional[float] = None,
+                                       break_symmetry: Optional[bool] = None,
+                                       solver_config: Optional[SolverConfig] = None) -> Dict:
+        """Solve a multi-week horizon week by week, chaining history between weeks
+        
+        Each week is a separate 7-day model. The solved week is converted into an
+        INRC-II history record (last shift, consecutive counts, working weekends)
+        that constrains the next week, and its pattern is used as the next
+        week's solver hint. Total time therefore grows linearly with the weeks.
+        With `decompose`, each week is solved by `_solve_decomposed`; with
+        `aggregate`, by `_solve_aggregated`. `lns_seconds`, `break_symmetry`
+        and `solver_config` are passed to every weekly solve (see
+        `_solve_with_full_compliance`).
+        """
+        print(f"🏥🇲🇾 ROLLING HORIZON: {scenario_id}")
+        print("=" * 60)
         
-        if not os.path.exists(scenario_path):
-            print(f"❌ Scenario not found: {scenario_path}")
-            return False
+        with self.instrumentation.phase("load", scenario_id=scenario_id):
+            loaded = self._load_scenario(scenario_id)
+        if not loaded:
+            return {}
         
-        try:
-            scenario_data = {'scenario_id': scenario_id, 'scenario_config': None, 'demands': {}}
+        scenario_data = self.scenarios[scenario_id]
+        if history_id not in scenario_data['history_ids']:
+            print(f"❌ History not found: H0-{scenario_id}-{history_id}")
+            return {}
+        
+        if week_demand_ids is None:
+            num_weeks = scenario_data['scenario_config'].get('numberOfWeeks', 1)
+            week_demand_ids = scenario_data['demand_ids'][:num_weeks]
+        
+        history = scenario_data['store'].history(history_id)
+        horizon_weeks = max(scenario_data['scenario_config'].get('numberOfWeeks', 1),
+                            len(week_demand_ids))
+        hint = None
+        weeks = []
+        
+        for week_index, demand_id in enumerate(week_demand_ids):
+            print(f"\n📅 WEEK {week_index + 1}/{len(week_demand_ids)}: {demand_id}")
+            
+            if aggregate:
+                solve = self._solve_aggregated
+            elif decompose:
+                solve = self._solve_decomposed
+            else:
+                solve = self._solve_with_full_compliance
+            solution = solve(
+                scenario_id, demand_id=demand_id, history=history,
+                week_index=week_index, num_weeks=horizon_weeks,
+                hint=hint, time_limit=time_limit_per_week, lns_seconds=lns_seconds,
+                break_symmetry=break_symmetry, solver_config=solver_config)
             
-            # Load scenario config
-            sc_file = os.path.join(scenario_path, f"Sc-{scenario_id}.json")
-            with open(sc_file, 'r') as f:
-                scenario_data['scenario_config'] = json.load(f)
+            if not solution:
+                print(f"❌ Rolling horizon stopped at week {week_index + 1}")
+                return {}
             
-            # Load first demand
-            demand_files = [f for f in os.listdir(scenario_path) if f.startswith('WD-')]
-            if demand_files:
-                with open(os.path.join(scenario_path, demand_files[0]), 'r') as f:
-                    demand_id = demand_files[0].replace('WD-', '').replace('.json', '')
-                    scenario_data['demands'][demand_id] = json.load(f)
+            with self.instrumentation.phase("breaks", scenario_id=scenario_id, demand_id=demand_id):
+                solution = self._add_break_scheduling(solution)
+            solution['week'] = week_index
+            solution['history'] = history
+            with self.instrumentation.phase("validate", scenario_id=scenario_id, demand_id=demand_id):
+                solution['full_compliance'] = self._validate_full_compliance(solution)
+            weeks.append(solution)
             
-            self.scenarios[scenario_id] = scenario_data
-            print(f"✅ Loaded: {scenario_id} with {len(scenario_data['scenario_config']['nurses'])} nurses")
+            history = self._history_from_solution(solution, history)
+            hint = {(a['nurse'], a['day'], a['shift']): 1 for a in solution['assignments']}
+        
+        horizon = {
+            'scenario_id': scenario_id,
+            'history_id': history_id,
+            'week_demand_ids': week_demand_ids,
+            'weeks': weeks,
+            'final_history': history,
+            'solve_time': sum(w['solve_time'] for w in weeks),
+            'total_hours': sum(w['statistics']['total_hours'] for w in weeks),
+            'total_assignments': sum(w['statistics']['total_assignments'] for w in weeks),
+            'compliance_score': min(w['full_compliance']['compliance_score'] for w in weeks),
+            'inrc2_valid': all(w['inrc2_valid'] for w in weeks),
+        }
+        
+        print(f"\n📋 ROLLING HORIZON SUMMARY")
+        print("=" * 60)
+        print(f"   📅 Weeks: {len(weeks)}")
+        print(f"   ⏱️  Total solve time: {horizon['solve_time']:.2f}s")
+        print(f"   📊 Total assignments: {horizon['total_assignments']}")
+        print(f"   📊 Worst weekly compliance: {horizon['compliance_score']}%")
+        if not horizon['inrc2_valid']:
+            print(f"   ⚠️ Not a valid INRC-II solution: minimum staffing uncovered in "
+                  f"{sum(not w['inrc2_valid'] for w in weeks)} weeks")
+        
+        os.makedirs(self.OUTPUT_DIR, exist_ok=True)
+        with open(os.path.join(self.OUTPUT_DIR, f"final_malaysian_rolling_{scenario_id}.json"), 'w') as f:
+            json.dump(horizon, f, indent=2, default=str)
+        
+        return horizon
+    
+    def evaluate_rolling_horizon(self, scenario_id: str, weekly_assignments: List[List[Dict]],
+                                 week_demand_ids: List[str], history_id: str = "0") -> Dict:
+        """Score an existing multi-week roster (e.g. a reference solution) under the INRC-II rules
+        
+        `weekly_assignments` holds one list of assignment entries per week, as in
+        the weeks of `load_and_solve_rolling_horizon` or an INRC-II solution
+        folder (see inrc2_scorer.read_solution_folder). Reference rosters ignore
+        the Malaysian limits, so they are scored by inrc2_scorer rather than
+        pinned into this model; the objective is the INRC-II penalty.
+        """
+        if scenario_id not in self.scenarios and not self._load_scenario(scenario_id):
+            return {'feasible': False, 'reason': 'scenario not found'}
+        
+        scorer = Inrc2Scorer(self.scenarios[scenario_id]['store'], week_demand_ids, history_id)
+        score = scorer.score(weekly_assignments)
+        return {'feasible': score['feasible'], 'objective': score['penalty'],
+                'hard': score['hard'], 'weighted': score['weighted']}
+    
+    def _load_scenario(self, scenario_id: str) -> bool:
+        """Open the compiled scenario (config, week demands, initial histories)
+        
+        The first load of an instance compiles its JSON files into the scenario
+        store (see scenario_store.py); later loads memory-map the arrays.
+        """
+        try:
+            store = self.store.open(scenario_id)
+            if store is None:
+                print(f"❌ Scenario not found: {os.path.join(self.datasets_path, scenario_id)}")
+                return False
+            
+            self.scenarios[scenario_id] = {
+                'scenario_id': scenario_id,
+                'scenario_config': store.config,
+                'store': store,
+                'demand_ids': store.week_ids,
+                'history_ids': store.history_ids,
+            }
+            print(f"✅ Loaded: {scenario_id} with {len(store.nurses)} nurses, "
+                  f"{len(store.week_ids)} week demands, {len(store.history_ids)} histories")
             return True
             
         except Exception as e:
             print(f"❌ Loading error: {e}")
             return False
     
-    def _solve_with_full_compliance(self, scenario_id: str) -> Optional[Dict]:
-        """Solve with ALL Malaysian labor law constraints"""
+    def _history_from_solution(self, solution: Dict, previous_history: Optional[Dict]) -> Dict:
+        """Turn a solved week into the INRC-II history record for the next week"""
+        scenario_config = self.scenarios[solution['scenario_id']]['scenario_config']
+        previous = {h['nurse']: h for h in (previous_history or {}).get('nurseHistory', [])}
+        
+        shifts_by_nurse = {n['id']: [None] * len(self.DAYS) for n in scenario_config['nurses']}
+        for a in solution['assignments']:
+            shifts_by_nurse[a['nurse']][a['day']] = a['shift']
+        
+        nurse_history = []
+        for nurse, week_shifts in shifts_by_nurse.items():
+            prev = previous.get(nurse, {})
+            last_shift = prev.get('lastAssignedShiftType', 'None')
+            consecutive_assignments = prev.get('numberOfConsecutiveAssignments', 0)
+            consecutive_working = prev.get('numberOfConsecutiveWorkingDays', 0)
+            consecutive_off = prev.get('numberOfConsecutiveDaysOff', 0)
+            
+            for shift in week_shifts:
+                if shift is None:
+                    last_shift = 'None'
+                    consecutive_assignments = 0
+                    consecutive_working = 0
+                    consecutive_off += 1
+                else:
+                    consecutive_assignments = consecutive_assignments + 1 if shift == last_shift else 1
+                    last_shift = shift
+                    consecutive_working += 1
+                    consecutive_off = 0
+            
+            worked = [s is not None for s in week_shifts]
+            nurse_history.append({
+                'nurse': nurse,
+                'numberOfAssignments': prev.get('numberOfAssignments', 0) + sum(worked),
+                'numberOfWorkingWeekends': prev.get('numberOfWorkingWeekends', 0) + int(worked[5] or worked[6]),
+                'lastAssignedShiftType': last_shift,
+                'numberOfConsecutiveAssignments': consecutive_assignments,
+                'numberOfConsecutiveWorkingDays': consecutive_working,
+                'numberOfConsecutiveDaysOff': consecutive_off,
+            })
+        
+        return {
+            'week': (previous_history or {}).get('week', 0) + 1,
+            'scenario': solution['scenario_id'],
+            'nurseHistory': nurse_history,
+        }
+    
+    def _solve_with_full_compliance(self, scenario_id: str, demand_id: Optional[str] = None,
+                                    history: Optional[Dict] = None, week_index: int = 0,
+                                    num_weeks: Optional[int] = None,
+                                    hint: Optional[Dict[Tuple[str, int, str], int]] = None,
+                                    time_limit: Optional[float] = None,
+                                    fixed: Optional[Dict[Tuple[str, int, str], int]] = None,
+                                    early_stop: Optional[Dict] = None,
+                                    nurse_subset: Optional[List[str]] = None,
+                                    skill_subset: Optional[List[str]] = None,
+                                    lns_seconds: Optional[float] = None,
+                                    break_symmetry: Optional[bool] = None,
+                                    class_counts: Optional[Dict[Tuple[int, str], int]] = None,
+                                    free_nurses: Optional[List[str]] = None,
+                                    solver_config: Optional[SolverConfig] = None) -> Optional[Dict]:
+        """Solve with ALL Malaysian labor law constraints
+        
+        `history` is an INRC-II nurse history record (H0 file or the output of
+        `_history_from_solution`) carried into this week; `hint` maps
+        (nurse, day, shift) to a suggested value for warm-starting the solver.
+        `fixed` pins assignment variables to the given values instead, e.g. to
+        evaluate an existing roster under this model; nurses in `free_nurses`
+        are left unpinned, so only their rosters are re-solved. `early_stop` overrides
+        self.EARLY_STOP (see solver_progress.EarlyStopRecorder).
+        
+        Minimum staffing per skill is a hard constraint, as in INRC-II, unless
+        the Malaysian hour and night limits make it unreachable: the fewest
+        missing nurses are found first (see `_minimize_understaffing`) and the
+        week is solved with no more than that. A solution missing nurses lists
+        them under 'understaffing' and has 'inrc2_valid' False. Optimal
+        staffing, consecutive runs, weekends, assignment totals and shift-off
+        requests are INRC-II soft constraints weighted by INRC2_WEIGHTS.
+        
+        `nurse_subset`/`skill_subset` restrict the model to one skill block of
+        `_solve_decomposed`: only those nurses and requirements are modelled, and
+        unmet minimum staffing only costs PENALTY_UNCOVERED_BLOCK, since other
+        blocks may cover it.
+        
+        `lns_seconds` (default self.LNS_SECONDS) runs adaptive large neighbourhood
+        search on the CP-SAT roster for that many extra seconds.
+        
+        `break_symmetry` (default self.SYMMETRY_BREAKING) orders the rows of
+        interchangeable nurses lexicographically (see symmetry.py); it is
+        ignored when `fixed` is given.
+        
+        `class_counts` maps (day, shift) to the exact number of `nurse_subset`
+        nurses to assign, replacing the staffing requirements; this is the
+        individual assignment step of `_solve_aggregated`.
+        
+        `solver_config` overrides self.SOLVER_CONFIG, e.g. with a share of the
+        CPUs for a pool worker.
+        
+        The steps are `_build_weekly_model` (one `_add_*` method per constraint
+        family), `_add_start` (hint, pinned assignments), `_solve_weekly_model`
+        and `_extract_weekly_solution`.
+        """
         print(f"\n🔧 SOLVING WITH FULL MALAYSIAN COMPLIANCE")
         print("-" * 50)
-        
+        build_start = time.perf_counter()
+        
+        break_symmetry = self.SYMMETRY_BREAKING if break_symmetry is None else break_symmetry
+        model_kwargs = dict(nurse_subset=nurse_subset, skill_subset=skill_subset, class_counts=class_counts,
+                            break_symmetry=break_symmetry and fixed is None)
+        weekly = self._build_weekly_model(scenario_id, demand_id, history, week_index, num_weeks, **model_kwargs)
+        self._add_start(weekly, hint, fixed, free_nurses)
+        
+        weekly['build_time'] = time.perf_counter() - build_start
+        self.instrumentation.emit("phase", phase="build", seconds=weekly['build_time'], **weekly['labels'])
+        self.instrumentation.model_stats(weekly['model'], nurses=len(weekly['nurses']), **weekly['labels'])
+        
+        # LNS only improves a free roster of the whole ward
+        lns_seconds = self.LNS_SECONDS if lns_seconds is None else lns_seconds
+        if fixed is not None or nurse_subset is not None:
+            lns_seconds = 0.0
+        time_limit = time_limit or self._time_limit(len(self.scenarios[scenario_id]['store'].nurses))
+        # MINIMUM STAFFING: the ward model may only miss the fewest nurses the
+        # Malaysian limits force; skill blocks leave unmet minimum staffing to the repair pass
+        if nurse_subset is None:
+            weekly['understaffing_time'] = self._minimize_understaffing(
+                weekly, time_limit * self.UNDERSTAFFING_TIME_SHARE, solver_config)
+            if weekly['understaffing_time'] is None:
+                return None
+            time_limit = max(1.0, time_limit - weekly['understaffing_time'])
+        solved = self._solve_weekly_model(weekly, time_limit, early_stop, solver_config, lns_seconds)
+        if solved is None:
+            return None
+        return self._extract_weekly_solution(weekly, solved)
+    
+    def _build_weekly_model(self, scenario_id: str, demand_id: Optional[str] = None,
+                            history: Optional[Dict] = None, week_index: int = 0,
+                            num_weeks: Optional[int] = None,
+                            nurse_subset: Optional[List[str]] = None,
+                            skill_subset: Optional[List[str]] = None,
+                            class_counts: Optional[Dict[Tuple[int, str], int]] = None,
+                            break_symmetry: bool = False) -> Dict:
+        """The weekly CP-SAT model with every constraint family and the objective
+        
+        Returns a dict with the model, its assignment variables keyed by
+        (nurse, day, shift) and the week's data, which the `_add_*` steps
+        extend with their variables and objective terms. Missing nurses below
+        minimum staffing are allowed at `understaffing_weight` each, until
+        `_minimize_understaffing` bounds them.
+        """
         scenario_data = self.scenarios[scenario_id]
         scenario_config = scenario_data['scenario_config']
-        demands = scenario_data['demands']
-        demand_id = list(demands.keys())[0]
-        demand_data = demands[demand_id]
+        store = scenario_data['store']
+        if demand_id is None:
+            demand_id = store.week_ids[0]
+        if num_weeks is None:
+            num_weeks = scenario_config.get('numberOfWeeks', 1)
         
         # Extract data
-        nurses = [n['id'] for n in scenario_config.get('nurses', [])]
-        nurse_skills = {n['id']: n.get('skills', []) for n in scenario_config.get('nurses', [])}
+        nurse_records = [n for n in scenario_config.get('nurses', [])
+                         if nurse_subset is None or n['id'] in nurse_subset]
+        nurses = [n['id'] for n in nurse_records]
         shift_types = {st['id']: st for st in scenario_config.get('shiftTypes', [])}
         valid_shifts = [s for s in self.SHIFTS if s in shift_types]
         
@@ -137,14 +469,62 @@ class FinalMalaysianNurseRoster:
                 for shift in valid_shifts:
                     assign[(nurse, day, shift)] = model.NewBoolVar(f"work_{nurse}_{day}_{shift}")
         
-        # Weekly hours tracking
-        nurse_weekly_hours = {}
-        for nurse in nurses:
-            nurse_weekly_hours[nurse] = model.NewIntVar(0, 60, f"hours_{nurse}")
-        
         print(f"   ✓ Created {len(nurses) * len(self.DAYS) * len(valid_shifts)} assignment variables")
         
+        nurse_rows = [store.nurse_index[n] for n in nurses]
+        weekly = {
+            'scenario_id': scenario_id,
+            'demand_id': demand_id,
+            'labels': {'scenario_id': scenario_id, 'demand_id': demand_id},
+            'scenario_config': scenario_config,
+            'store': store,
+            'week': store.week_index[demand_id],
+            'week_index': week_index,
+            'num_weeks': num_weeks,
+            'nurse_history': {h['nurse']: h for h in (history or {}).get('nurseHistory', [])},
+            'nurse_records': nurse_records,
+            'nurses': nurses,
+            'nurse_rows': nurse_rows,
+            'shift_types': shift_types,
+            'valid_shifts': valid_shifts,
+            'model': model,
+            'assign': assign,
+            'rows': [[assign[(nurse, day, shift)] for day in self.DAYS for shift in valid_shifts]
+                     for nurse in nurses],
+            'soft_terms': {name: [] for name in self.INRC2_WEIGHTS},
+            'uncovered': [],
+            'uncovered_slots': [],  # (day, shift, skill) of each 'uncovered' variable
+            'understaffing_time': 0.0,  # solve time of _minimize_understaffing, before the final solve
+            'symmetry_classes': [],
+            # UNDERSTAFFING: last resort in the full model, left for the repair pass in a skill block
+            'understaffing_weight': (self.PENALTY_UNDERSTAFFED if nurse_subset is None
+                                     else self.PENALTY_UNCOVERED_BLOCK),
+        }
+        
         # ===== MALAYSIAN LABOR LAW CONSTRAINTS =====
+        self._add_labor_law_constraints(weekly)
+        self._add_runs_and_weekends(weekly)
+        self._add_assignment_totals(weekly)
+        self._add_staffing_requirements(weekly, skill_subset, class_counts)
+        if break_symmetry:
+            self._add_symmetry_breaking(weekly)
+        
+        # ===== OBJECTIVE: MALAYSIAN NURSING PREFERENCES =====
+        self._set_weekly_objective(weekly)
+        
+        print(f"   ✓ Added Malaysian labor law constraints")
+        print(f"   ✓ Added nursing preference optimization")
+        return weekly
+    
+    def _add_labor_law_constraints(self, weekly: Dict):
+        """One shift a day and the 45-hour week"""
+        model, assign, nurses = weekly['model'], weekly['assign'], weekly['nurses']
+        valid_shifts = weekly['valid_shifts']
+        
+        # Weekly hours tracking
+        weekly['hours'] = {}
+        for nurse in nurses:
+            weekly['hours'][nurse] = model.NewIntVar(0, 60, f"hours_{nurse}")
         
         # 1. One shift per nurse per day
         for nurse in nurses:
@@ -156,180 +536,875 @@ class FinalMalaysianNurseRoster:
             weekly_hours = sum(assign[(nurse, day, shift)] * self.SHIFT_HOURS[shift] 
                               for day in self.DAYS for shift in valid_shifts)
             model.Add(weekly_hours <= self.MAX_HOURS_PER_WEEK)
-            model.Add(nurse_weekly_hours[nurse] == weekly_hours)
-        
-        # 3. MALAYSIAN LAW: Maximum 2 consecutive night shifts
-        for nurse in nurses:
-            if "Night" in valid_shifts:
-                for day in range(5):  # Check 3-day windows
-                    model.Add(sum(assign[(nurse, day + i, "Night")] for i in range(3)) <= 2)
-        
-        # 4. CONTRACT CONSTRAINTS: Minimum/maximum assignments
-        contracts = {c['id']: c for c in scenario_config.get('contracts', [])}
-        for nurse_data in scenario_config.get('nurses', []):
+            model.Add(weekly['hours'][nurse] == weekly_hours)
+    
+    def _add_runs_and_weekends(self, weekly: Dict):
+        """SHIFT SEQUENCES and WEEKENDS
+        
+        One automaton per nurse, compiled once per contract, carries the
+        Malaysian night limit and minimum rest (forbidden successions) as hard
+        rules and prices the INRC-II soft runs per shift type, of working days
+        and of days off, continuing the runs in the history record (see
+        shift_automaton.py). Complete weekends and the contract's working
+        weekend maximum are checked per nurse.
+        """
+        model, assign = weekly['model'], weekly['assign']
+        valid_shifts, soft_terms = weekly['valid_shifts'], weekly['soft_terms']
+        nurse_history, contracts = weekly['nurse_history'], weekly['store'].contracts
+        sequence_rules = {}
+        weekly['working'] = working = {}
+        for nurse_data in weekly['nurse_records']:
             nurse = nurse_data['id']
+            history_entry = nurse_history.get(nurse, {})
             contract_id = nurse_data.get('contract', '')
-            if contract_id in contracts:
-                contract = contracts[contract_id]
-                min_assignments = contract.get('minimumNumberOfAssignments', 0)
-                max_assignments = contract.get('maximumNumberOfAssignments', 40)
-                
-                total_assignments = sum(assign[(nurse, day, shift)] 
-                                      for day in self.DAYS for shift in valid_shifts)
-                model.Add(total_assignments >= min_assignments)
-                model.Add(total_assignments <= max_assignments)
-        
-        # 5. STAFFING REQUIREMENTS: Meet minimum demand
-        requirements = demand_data.get('requirements', [])
-        for req in requirements:
-            shift_type = req.get('shiftType', '')
-            skill_required = req.get('skill', '')
-            
-            if shift_type in valid_shifts:
-                day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 
-                           'Friday', 'Saturday', 'Sunday']
-                for day_idx, day_name in enumerate(day_names):
-                    min_requirement = req.get(f'requirementOn{day_name}', {}).get('minimum', 0)
-                    
-                    if min_requirement > 0:
-                        # Find qualified nurses
-                        qualified_nurses = [n for n in nurses if skill_required in nurse_skills.get(n, [])]
-                        if not qualified_nurses:
-                            qualified_nurses = nurses  # Fallback to all nurses
-                        
-                        # Ensure minimum staffing (80% of requirement to ensure feasibility)
-                        min_staff = max(1, int(min_requirement * 0.8))
-                        model.Add(sum(assign[(nurse, day_idx, shift_type)] 
-                                    for nurse in qualified_nurses) >= min_staff)
-        
-        # 6. SHIFT-OFF REQUESTS: Honor nurse preferences
-        shift_off_requests = demand_data.get('shiftOffRequests', [])
-        for request in shift_off_requests:
-            nurse = request.get('nurse', '')
-            shift_type = request.get('shiftType', '')
-            day_str = request.get('day', '')
+            contract = contracts.get(contract_id, {})
+            working[nurse] = []
+            for day in self.DAYS:
+                works = model.NewBoolVar(f"works_{nurse}_{day}")
+                model.Add(works == sum(assign[(nurse, day, shift)] for shift in valid_shifts))
+                working[nurse].append(works)
             
-            day_mapping = {'Monday': 0, 'Tuesday': 1, 'Wednesday': 2, 'Thursday': 3,
-                          'Friday': 4, 'Saturday': 5, 'Sunday': 6}
+            if contract_id not in sequence_rules:
+                sequence_rules[contract_id] = self._sequence_rules(weekly['scenario_config'], valid_shifts,
+                                                                   contract)
+            rules = sequence_rules[contract_id]
+            start = rules.start_state(history_entry.get('lastAssignedShiftType'),
+                                      history_entry.get('numberOfConsecutiveAssignments', 0),
+                                      history_entry.get('numberOfConsecutiveWorkingDays', 0),
+                                      history_entry.get('numberOfConsecutiveDaysOff', 0))
+            _, run_costs = add_sequence_constraint(
+                model, rules, [[assign[(nurse, day, shift)] for shift in valid_shifts] for day in self.DAYS],
+                start, f"sequence_{nurse}", working[nurse])
+            soft_terms['consecutive_shift'] += run_costs.get('shift', [])
+            soft_terms['consecutive_work'] += run_costs.get('work', [])
+            soft_terms['consecutive_off'] += run_costs.get('off', [])
             
-            if nurse in nurses and day_str in day_mapping:
-                day_idx = day_mapping[day_str]
-                if shift_type == 'Any':
-                    # No work on this day
-                    model.Add(sum(assign[(nurse, day_idx, shift)] for shift in valid_shifts) == 0)
-                elif shift_type in valid_shifts:
-                    # Avoid specific shift
-                    model.Add(assign[(nurse, day_idx, shift_type)] == 0)
-        
-        # ===== OBJECTIVE: MALAYSIAN NURSING PREFERENCES =====
-        
-        objective_terms = []
-        
-        # PREFER 12-HOUR SHIFTS (Research: nurses prefer 12h over 8h shifts)
-        for nurse in nurses:
-            for day in self.DAYS:
-                # Reward 12-hour shifts
-                for shift in ["Day", "Night"]:
-                    if shift in valid_shifts:
-                        objective_terms.append(assign[(nurse, day, shift)] * (-3))  # Reward
-                
-                # Penalize 8-hour shifts  
-                for shift in ["Early", "Late"]:
-                    if shift in valid_shifts:
-                        objective_terms.append(assign[(nurse, day, shift)] * 2)  # Penalty
-        
-        # PREFER DAY SHIFTS (Research: nurses prefer day over night)
-        for nurse in nurses:
+            # WEEKENDS: both days or neither, and no weekend beyond the contract maximum
+            saturday, sunday = working[nurse][5], working[nurse][6]
+            if contract.get('completeWeekends', 0):
+                incomplete = model.NewBoolVar(f"incomplete_weekend_{nurse}")
+                model.AddBoolOr([saturday.Not(), sunday, incomplete])
+                model.AddBoolOr([sunday.Not(), saturday, incomplete])
+                soft_terms['complete_weekends'].append(incomplete)
+            weekend_limit = contract.get('maximumNumberOfWorkingWeekends', weekly['num_weeks'])
+            if history_entry.get('numberOfWorkingWeekends', 0) >= weekend_limit:
+                extra_weekend = model.NewBoolVar(f"extra_weekend_{nurse}")
+                model.AddBoolOr([saturday.Not(), extra_weekend])
+                model.AddBoolOr([sunday.Not(), extra_weekend])
+                soft_terms['working_weekends'].append(extra_weekend)
+    
+    def _add_assignment_totals(self, weekly: Dict):
+        """CONTRACT CONSTRAINTS: Minimum/maximum assignments (INRC-II soft)
+        
+        Contract totals cover the whole horizon, so each week gets its share of
+        what is still outstanding after the assignments already in the history.
+        """
+        model = weekly['model']
+        for nurse_data in weekly['nurse_records']:
+            nurse = nurse_data['id']
+            bounds = self._assignment_bounds(nurse_data, weekly['store'].contracts, weekly['nurse_history'],
+                                             weekly['week_index'], weekly['num_weeks'])
+            if bounds is not None:
+                min_assignments, max_assignments = bounds
+                total_assignments = sum(weekly['working'][nurse])
+                below = model.NewIntVar(0, min_assignments, f"below_assignments_{nurse}")
+                above = model.NewIntVar(0, len(self.DAYS), f"above_assignments_{nurse}")
+                model.Add(total_assignments + below >= min_assignments)
+                model.Add(total_assignments - above <= max_assignments)
+                weekly['soft_terms']['total_assignments'] += [below, above]
+    
+    def _add_staffing_requirements(self, weekly: Dict, skill_subset: Optional[List[str]] = None,
+                                   class_counts: Optional[Dict[Tuple[int, str], int]] = None):
+        """STAFFING REQUIREMENTS: minimum demand per skill (hard), optimal level (soft)
+        
+        Each working nurse covers one skill; nurses qualified for several of a
+        (day, shift)'s required skills get a variable per skill to choose from.
+        A shortfall variable per requirement records missing nurses (see
+        `_minimize_understaffing`). With `class_counts` the staffing was
+        settled by the count model and exactly its counts are assigned instead.
+        """
+        model, assign, store = weekly['model'], weekly['assign'], weekly['store']
+        nurses, valid_shifts = weekly['nurses'], weekly['valid_shifts']
+        minimum = store.demand_minimum[weekly['week']]  # day x shift x skill
+        optimal = np.maximum(store.demand_optimal[weekly['week']], minimum)
+        uncovered = weekly['uncovered']
+        if class_counts is not None:
             for day in self.DAYS:
-                if "Day" in valid_shifts:
-                    objective_terms.append(assign[(nurse, day, "Day")] * (-2))  # Reward day
-                if "Night" in valid_shifts:
-                    objective_terms.append(assign[(nurse, day, "Night")] * 1)   # Small penalty
-        
-        # MINIMIZE WEEKEND WORK
-        for nurse in nurses:
-            for day in [5, 6]:  # Saturday, Sunday
                 for shift in valid_shifts:
-                    objective_terms.append(assign[(nurse, day, shift)] * 2)
+                    model.Add(sum(assign[(nurse, day, shift)] for nurse in nurses)
+                              == class_counts.get((day, shift), 0))
+        skill_columns = [k for k, skill in enumerate(store.skills)
+                         if skill_subset is None or skill in skill_subset]
+        qualified = store.nurse_skills[np.ix_(weekly['nurse_rows'], skill_columns)].astype(bool)
+        qualified[:, ~qualified.any(axis=0)] = True  # Fallback to all nurses
+        for day_idx, shift_type in itertools.product(self.DAYS, valid_shifts if class_counts is None else []):
+            shift_idx = store.shift_index[shift_type]
+            required = [j for j, k in enumerate(skill_columns) if optimal[day_idx, shift_idx, k]]
+            if not required:
+                continue
+            staffed = {j: [] for j in required}
+            for row in np.flatnonzero(qualified[:, required].any(axis=1)).tolist():
+                works = assign[(nurses[row], day_idx, shift_type)]
+                options = [j for j in required if qualified[row, j]]
+                if len(options) == 1:
+                    staffed[options[0]].append(works)
+                    continue
+                covers = [model.NewBoolVar(f"skill_{nurses[row]}_{day_idx}_{shift_type}_{j}") for j in options]
+                model.Add(sum(covers) <= works)
+                for j, cover in zip(options, covers):
+                    staffed[j].append(cover)
+            for j in required:
+                skill_required, k = store.skills[skill_columns[j]], skill_columns[j]
+                min_staff, optimal_staff = int(minimum[day_idx, shift_idx, k]), int(optimal[day_idx, shift_idx, k])
+                shortfall = 0
+                if min_staff:
+                    shortfall = model.NewIntVar(0, min_staff, f"short_{skill_required}_{day_idx}_{shift_type}")
+                    uncovered.append(shortfall)
+                    weekly['uncovered_slots'].append((day_idx, shift_type, skill_required))
+                    model.Add(sum(staffed[j]) + shortfall >= min_staff)
+                if optimal_staff > min_staff:
+                    below_optimal = model.NewIntVar(0, optimal_staff - min_staff,
+                                                    f"below_optimal_{skill_required}_{day_idx}_{shift_type}")
+                    model.Add(sum(staffed[j]) + shortfall + below_optimal >= optimal_staff)
+                    weekly['soft_terms']['optimal_coverage'].append(below_optimal)
+    
+    def _add_symmetry_breaking(self, weekly: Dict):
+        """SYMMETRY: nurses that differ only by name are ordered lexicographically"""
+        store, nurse_history = weekly['store'], weekly['nurse_history']
+        shift_off = store.shift_off[weekly['week']][weekly['nurse_rows']]
+        history_fields = ('lastAssignedShiftType', 'numberOfConsecutiveAssignments',
+                          'numberOfConsecutiveWorkingDays', 'numberOfConsecutiveDaysOff',
+                          'numberOfAssignments', 'numberOfWorkingWeekends')
+        symmetry_classes = equivalence_classes([
+            (nurse_data.get('contract', ''),
+             store.nurse_skills[store.nurse_index[nurse_data['id']]].tobytes(),
+             tuple(nurse_history.get(nurse_data['id'], {}).get(f) for f in history_fields),
+             shift_off[row].tobytes())
+            for row, nurse_data in enumerate(weekly['nurse_records'])])
+        add_lex_ordering(weekly['model'], weekly['rows'], symmetry_classes)
+        weekly['symmetry_classes'] = symmetry_classes
+        print(f"   ✓ Ordered {sum(len(c) for c in symmetry_classes)} interchangeable nurses "
+              f"in {len(symmetry_classes)} classes")
+    
+    def _set_weekly_objective(self, weekly: Dict):
+        """Per-assignment preferences, overtime, understaffing and the INRC-II soft terms"""
+        model, assign, store = weekly['model'], weekly['assign'], weekly['store']
+        nurses, valid_shifts = weekly['nurses'], weekly['valid_shifts']
+        
+        # PER ASSIGNMENT: 12-hour and day shifts, weekend work (heavier once the
+        # contract's working weekends are used up) and SHIFT-OFF REQUESTS ("Any"
+        # marks every shift; INRC-II soft), summed into one coefficient per
+        # assignment variable (see _assignment_costs)
+        shift_off = store.shift_off[weekly['week']][weekly['nurse_rows']]  # nurse x day x shift
+        valid_columns = [store.shift_index[shift] for shift in valid_shifts]
+        weekend_weights = [self._weekend_weight(nurse_data, store.contracts, weekly['nurse_history'],
+                                                weekly['num_weeks'])
+                           for nurse_data in weekly['nurse_records']]
+        cost = self._assignment_costs(valid_shifts, weekend_weights)
+        cost += self.INRC2_WEIGHTS['preferences'] * shift_off[:, :, valid_columns]
+        costed = np.nonzero(cost)
+        objective_vars = [assign[(nurses[row], day, valid_shifts[column])]
+                          for row, day, column in zip(*(axis.tolist() for axis in costed))]
+        objective_coeffs = cost[costed].tolist()
         
         # BALANCE WORKLOAD: Penalize overtime
         for nurse in nurses:
             overtime_var = model.NewIntVar(0, 20, f"overtime_{nurse}")
-            model.Add(overtime_var >= nurse_weekly_hours[nurse] - 40)
+            model.Add(overtime_var >= weekly['hours'][nurse] - 40)
             model.Add(overtime_var >= 0)
-            objective_terms.append(overtime_var * 3)
+            objective_vars.append(overtime_var)
+            objective_coeffs.append(3)
         
-        model.Minimize(sum(objective_terms))
+        objective_vars += weekly['uncovered']
+        objective_coeffs += [weekly['understaffing_weight']] * len(weekly['uncovered'])
         
-        print(f"   ✓ Added Malaysian labor law constraints")
-        print(f"   ✓ Added nursing preference optimization")
+        # INRC-II SOFT CONSTRAINTS, weighted as in the competition
+        for name, terms in weekly['soft_terms'].items():
+            objective_vars += terms
+            objective_coeffs += [self.INRC2_WEIGHTS[name]] * len(terms)
         
-        # SOLVE
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = 180.0  # 3 minutes
-        solver.parameters.log_search_progress = True
+        weekly['objective'] = cp_model.LinearExpr.WeightedSum(objective_vars, objective_coeffs)
+        model.Minimize(weekly['objective'])
+    
+    def _add_start(self, weekly: Dict, hint: Optional[Dict[Tuple[str, int, str], int]] = None,
+                   fixed: Optional[Dict[Tuple[str, int, str], int]] = None,
+                   free_nurses: Optional[List[str]] = None):
+        """Warm start from `hint` and pin the `fixed` assignments (except `free_nurses`)"""
+        model, nurses, valid_shifts = weekly['model'], weekly['nurses'], weekly['valid_shifts']
+        
+        # WARM START: hint from a previous roster (e.g. the preceding week),
+        # with interchangeable nurses permuted into the symmetry-breaking order
+        if hint:
+            hint_rows = np.array([[hint.get(key, 0) for key in
+                                   ((nurse, day, shift) for day in self.DAYS for shift in valid_shifts)]
+                                  for nurse in nurses], dtype=np.int64).reshape(len(nurses), -1)
+            hint_rows = hint_rows[sort_rows(hint_rows, weekly['symmetry_classes'])]
+            for row, values in zip(weekly['rows'], hint_rows.tolist()):
+                for var, value in zip(row, values):
+                    model.AddHint(var, value)
+        
+        if fixed is not None:
+            for key, var in weekly['assign'].items():
+                if free_nurses is None or key[0] not in free_nurses:
+                    model.Add(var == fixed.get(key, 0))
+    
+    def _minimize_understaffing(self, weekly: Dict, time_limit: float,
+                                solver_config: Optional[SolverConfig] = None) -> Optional[float]:
+        """Bound the weekly model to the fewest missing nurses it can reach
+        
+        A copy of the model minimizing only the shortfall is solved first,
+        stopping as soon as nobody is missing; the best total found becomes a
+        constraint of the weekly model, so its own objective cannot trade
+        minimum staffing for soft terms. The copy's roster becomes the model's
+        hint and weekly['fallback'], kept if the final solve finds nothing in
+        time. Returns the copy's solve time, or None if it has no solution.
+        """
+        if not weekly['uncovered']:
+            return 0.0
+        labels = weekly['labels']
+        probe = weekly['model'].Clone()
+        probe.Minimize(sum(probe.GetIntVarFromProtoIndex(v.Index()) for v in weekly['uncovered']))
+        with self.instrumentation.phase("understaffing", **labels):
+            solver, status = self._solver_config(solver_config, len(weekly['store'].nurses)).solve(
+                probe, time_limit)
+        self.instrumentation.solve_summary(solver, status, model='understaffing', **labels)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            print(f"❌ No solution found (status: {solver.StatusName(status)})")
+            return False
+        missing = int(solver.ObjectiveValue())
+        model = weekly['model']
+        model.Add(sum(weekly['uncovered']) <= missing)
+        model.ClearHints()
+        for index in range(len(probe.Proto().variables)):
+            model.AddHint(model.GetIntVarFromProtoIndex(index),
+                          solver.Value(probe.GetIntVarFromProtoIndex(index)))
+        # The copy shares the model's variable indices, so its solver evaluates the model's variables
+        weekly['fallback'] = {
+            'values': {key: int(solver.BooleanValue(var)) for key, var in weekly['assign'].items()},
+            'uncovered': [solver.Value(v) for v in weekly['uncovered']],
+            'objective': solver.Value(weekly['objective']),
+        }
+        if missing:
+            print(f"   ⚠️ {missing} nurses below minimum staffing "
+                  f"({'proven fewest' if status == cp_model.OPTIMAL else 'fewest found'})")
+        return solver.WallTime()
+    
+    def _solve_weekly_model(self, weekly: Dict, time_limit: Optional[float] = None,
+                            early_stop: Optional[Dict] = None,
+                            solver_config: Optional[SolverConfig] = None,
+                            lns_seconds: float = 0.0) -> Optional[Dict]:
+        """Solve a built weekly model, then run LNS on it for `lns_seconds`
+        
+        Returns the solver, status and assignment values, or None without a
+        solution. A model with weekly['fallback'] (see _minimize_understaffing)
+        keeps that roster when the solve finds none in time.
+        """
+        labels = weekly['labels']
+        ward_size = len(weekly['store'].nurses)
+        solver_config = self._solver_config(solver_config, ward_size)
+        recorder = self.instrumentation.recorder(
+            early_stop=self.EARLY_STOP if early_stop is None else early_stop, **labels)
         
         print(f"\n🚀 Solving complete optimization model...")
-        status = solver.Solve(model)
+        with self.instrumentation.phase("solve", **labels), recorder.watching():
+            solver, status = solver_config.solve(weekly['model'], time_limit or self._time_limit(ward_size),
+                                                 recorder)
+        stop_reason = recorder.final_stop_reason(status)
+        self.instrumentation.solve_summary(solver, status, stop_reason=stop_reason, **labels)
         
         if status in [cp_model.FEASIBLE, cp_model.OPTIMAL]:
             print(f"✅ {'OPTIMAL' if status == cp_model.OPTIMAL else 'FEASIBLE'} solution found!")
-            print(f"   Objective: {solver.ObjectiveValue()}")
-            
-            # Extract solution
-            solution = {
-                'scenario_id': scenario_id,
-                'demand_id': demand_id,
-                'assignments': [],
-                'statistics': {},
-                'solve_time': solver.WallTime()
-            }
-            
-            total_hours = 0
-            nurse_hours = {}
-            shift_counts = {}
+            print(f"   Objective: {solver.ObjectiveValue()} (stopped: {stop_reason})")
+            values = {key: int(solver.BooleanValue(var)) for key, var in weekly['assign'].items()}
+            uncovered = [solver.Value(v) for v in weekly['uncovered']]
+            objective = solver.ObjectiveValue()
+            incumbents = list(recorder.incumbents)
+        elif weekly.get('fallback'):
+            fallback = weekly['fallback']
+            print(f"   ⚠️ No solution in time (status: {solver.StatusName(status)}), "
+                  f"keeping the fewest-missing roster (objective {fallback['objective']})")
+            status = cp_model.FEASIBLE
+            values, uncovered, objective = fallback['values'], fallback['uncovered'], fallback['objective']
+            incumbents = [{'wall_time': 0.0, 'objective': objective, 'bound': solver.BestObjectiveBound()}]
+        else:
+            print(f"❌ No solution found (status: {status})")
+            return None
+        
+        # IMPROVE: adaptive LNS around the CP-SAT roster
+        lns_result = None
+        if lns_seconds > 0 and status != cp_model.OPTIMAL:
+            with self.instrumentation.phase("lns", **labels):
+                lns_result = improve_roster(weekly['model'], weekly['assign'], values, objective, lns_seconds,
+                                            solver_config=solver_config,
+                                            instrumentation=self.instrumentation, **labels)
+            values, objective = lns_result['assignment'], lns_result['objective']
+            incumbents += [dict(inc, wall_time=inc['wall_time'] + solver.WallTime())
+                           for inc in lns_result['incumbents']]
+            print(f"   🔁 LNS: {lns_result['iterations']} iterations, objective {objective}")
+        
+        return {
+            'solver': solver,
+            'status': status,
+            'stop_reason': stop_reason,
+            'values': values,
+            'uncovered': uncovered,
+            'objective': objective,
+            'incumbents': incumbents,
+            'lns': lns_result,
+        }
+    
+    def _extract_weekly_solution(self, weekly: Dict, solved: Dict) -> Dict:
+        """The solution dict (assignments, statistics, solve details) of a solved weekly model
+        
+        'solve_time' and the incumbents' wall times include the
+        `_minimize_understaffing` probe that ran before the final solve.
+        """
+        extract_start = time.perf_counter()
+        solver, lns_result, values = solved['solver'], solved['lns'], solved['values']
+        nurses = weekly['nurses']
+        offset = weekly['understaffing_time']
+        
+        # Extract solution
+        solution = {
+            'scenario_id': weekly['scenario_id'],
+            'demand_id': weekly['demand_id'],
+            'assignments': [],
+            'statistics': {},
+            'status': solver.StatusName(solved['status']),
+            'objective': solved['objective'],
+            'best_bound': solver.BestObjectiveBound(),
+            'build_time': weekly['build_time'],
+            'solve_time': offset + solver.WallTime() + (lns_result['lns_time'] if lns_result else 0.0),
+            'understaffing_time': offset,
+            'stop_reason': solved['stop_reason'],
+            'uncovered': sum(solved['uncovered']),
+            # INRC-II hard violations: minimum staffing the Malaysian limits left uncovered
+            'understaffing': [{'day': day, 'shift': shift, 'skill': skill, 'missing': missing}
+                              for (day, shift, skill), missing in zip(weekly['uncovered_slots'], solved['uncovered'])
+                              if missing],
+            'incumbents': [dict(inc, wall_time=inc['wall_time'] + offset) for inc in solved['incumbents']]
+        }
+        solution['inrc2_valid'] = not solution['understaffing']
+        if lns_result:
+            solution['lns'] = {k: lns_result[k] for k in
+                               ('iterations', 'initial_objective', 'lns_time', 'operators')}
+        
+        for nurse in nurses:
+            for day in self.DAYS:
+                for shift in weekly['valid_shifts']:
+                    if values[(nurse, day, shift)]:
+                        solution['assignments'].append({
+                            'nurse': nurse,
+                            'day': day,
+                            'shift': shift, 
+                            'hours': self.SHIFT_HOURS[shift],
+                            'day_name': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'][day]
+                        })
+        
+        # Calculate statistics from the (nurse x day) shift-code index in one pass
+        roster_index = RosterIndex.from_assignments(solution['assignments'], nurses, self.SHIFTS)
+        solution['statistics'] = roster_index.statistics(self.SHIFT_HOURS)
+        total_hours = solution['statistics']['total_hours']
+        
+        self.instrumentation.emit("phase", phase="extract",
+                                  seconds=time.perf_counter() - extract_start, **weekly['labels'])
+        
+        print(f"   📊 Total hours: {total_hours}")
+        print(f"   📊 Assignments: {len(solution['assignments'])}")
+        print(f"   📊 Avg hours/nurse: {total_hours / len(nurses):.1f}")
+        
+        return solution
+    
+    def settings(self) -> Dict:
+        """The tunable settings (upper-case attributes), e.g. for a pool worker's copy of this system"""
+        return {name: value for name, value in vars(self).items() if name.isupper()}
+    
+    def load_solver_profiles(self, path: str):
+        """Use the tuned per-size-class solver profiles written by tuning.py"""
+        self.SOLVER_PROFILES = SolverProfiles.load(path)
+        print(f"✅ Solver profiles: {', '.join(self.SOLVER_PROFILES.profiles)}")
+    
+    def _solver_config(self, solver_config: Optional[SolverConfig] = None,
+                       ward_size: Optional[int] = None) -> SolverConfig:
+        """`solver_config` (default: the ward size's tuned profile, else
+        self.SOLVER_CONFIG) with the LOG_SEARCH_PROGRESS setting"""
+        if solver_config is None and self.SOLVER_PROFILES is not None and ward_size is not None:
+            solver_config = self.SOLVER_PROFILES.config(ward_size)
+        config = SolverConfig.from_dict((solver_config or self.SOLVER_CONFIG).as_dict())
+        config.parameters.setdefault('log_search_progress', self.LOG_SEARCH_PROGRESS)
+        return config
+    
+    def _time_limit(self, ward_size: int) -> float:
+        """Seconds per weekly model: the ward size's tuned limit, else TIME_LIMIT_SECONDS"""
+        if self.SOLVER_PROFILES is not None:
+            return self.SOLVER_PROFILES.time_limit(ward_size) or self.TIME_LIMIT_SECONDS
+        return self.TIME_LIMIT_SECONDS
+    
+    def _assignment_bounds(self, nurse_data: Dict, contracts: Dict, nurse_history: Dict,
+                           week_index: int, num_weeks: int) -> Optional[Tuple[int, int]]:
+        """This week's (min, max) assignments for a nurse, or None without a known contract
+        
+        Contract totals cover the whole horizon, so each week gets its share of
+        what is still outstanding after the assignments already in the history.
+        """
+        contract = contracts.get(nurse_data.get('contract', ''))
+        if contract is None:
+            return None
+        weeks_left = max(1, num_weeks - week_index)
+        done = nurse_history.get(nurse_data['id'], {}).get('numberOfAssignments', 0)
+        min_remaining = max(0, contract.get('minimumNumberOfAssignments', 0) - done)
+        max_remaining = max(0, contract.get('maximumNumberOfAssignments', 40) - done)
+        max_assignments = min(len(self.DAYS), -(-max_remaining // weeks_left))
+        return min(min_remaining // weeks_left, max_assignments), max_assignments
+    
+    def _sequence_rules(self, scenario_config: Dict, valid_shifts: List[str], contract: Dict) -> SequenceRules:
+        """Shift-sequence rules of one contract in the weekly model
+        
+        Hard: the Malaysian night limit and the scenario's forbidden
+        successions. Soft (INRC-II): the shift types' consecutive assignment
+        limits and the contract's consecutive working day and day-off limits.
+        """
+        shift_types = {st['id']: st for st in scenario_config.get('shiftTypes', [])}
+        successions = {f['precedingShiftType']: f['succeedingShiftTypes']
+                       for f in scenario_config.get('forbiddenShiftTypeSuccessions', [])}
+        days = len(self.DAYS)
+        return SequenceRules(
+            valid_shifts, successions, {'Night': self.MAX_CONSECUTIVE_NIGHTS},
+            consecutive_limits={shift: (shift_types[shift].get('minimumNumberOfConsecutiveAssignments', 0),
+                                        shift_types[shift].get('maximumNumberOfConsecutiveAssignments', days))
+                                for shift in valid_shifts},
+            working_days_limits=(contract.get('minimumNumberOfConsecutiveWorkingDays', 0),
+                                 contract.get('maximumNumberOfConsecutiveWorkingDays', days)),
+            days_off_limits=(contract.get('minimumNumberOfConsecutiveDaysOff', 0),
+                             contract.get('maximumNumberOfConsecutiveDaysOff', days)))
+    
+    def _shift_weights(self) -> Dict[str, int]:
+        """Objective weight per assignment of each shift type
+        
+        Research: nurses prefer 12h over 8h shifts (12h -3, 8h +2) and day
+        over night shifts (Day -2, Night +1).
+        """
+        weights = {shift: 0 for shift in self.SHIFTS}
+        for shift in self.SHIFTS:
+            weights[shift] += -3 if self.SHIFT_HOURS[shift] == 12 else 2
+        weights['Day'] += -2
+        weights['Night'] += 1
+        return weights
+    
+    def _assignment_costs(self, valid_shifts: List[str], weekend_weights: List[int]) -> np.ndarray:
+        """Objective coefficient per (row, day, shift) assignment
+        
+        Each row (a nurse in the weekly model, a nurse class in the count
+        model) pays the _shift_weights of the shift plus its weekend weight on
+        Saturday and Sunday.
+        """
+        shift_weights = self._shift_weights()
+        cost = np.zeros((len(weekend_weights), len(self.DAYS), len(valid_shifts)), dtype=np.int64)
+        cost += np.array([shift_weights[shift] for shift in valid_shifts], dtype=np.int64)
+        cost[:, [5, 6], :] += np.array(weekend_weights, dtype=np.int64)[:, None, None]  # Saturday, Sunday
+        return cost
+    
+    def _weekend_weight(self, nurse_data: Dict, contracts: Dict, nurse_history: Dict,
+                        num_weeks: int) -> int:
+        """Weekend assignment penalty, heavier once the contract's working weekends are used up"""
+        weekend_limit = contracts.get(nurse_data.get('contract', ''), {}).get(
+            'maximumNumberOfWorkingWeekends', num_weeks)
+        weekends_worked = nurse_history.get(nurse_data['id'], {}).get('numberOfWorkingWeekends', 0)
+        return 2 + (self.PENALTY_EXTRA_WEEKEND if weekends_worked >= weekend_limit else 0)
+    
+    def _nurse_classes(self, scenario_id: str, history: Optional[Dict],
+                       week_index: int, num_weeks: int) -> List[Dict]:
+        """Group nurses by skills, weekend weight and this week's assignment bounds"""
+        scenario_config = self.scenarios[scenario_id]['scenario_config']
+        contracts = self.scenarios[scenario_id]['store'].contracts
+        nurse_history = {h['nurse']: h for h in (history or {}).get('nurseHistory', [])}
+        classes = {}
+        for nurse_data in scenario_config.get('nurses', []):
+            bounds = self._assignment_bounds(nurse_data, contracts, nurse_history, week_index, num_weeks)
+            key = (tuple(sorted(nurse_data.get('skills', []))),
+                   self._weekend_weight(nurse_data, contracts, nurse_history, num_weeks),
+                   bounds or (0, len(self.DAYS)))
+            classes.setdefault(key, []).append(nurse_data)
+        return [{'skills': list(key[0]), 'weekend_weight': key[1], 'assignment_bounds': key[2],
+                 'nurses': members} for key, members in classes.items()]
+    
+    def _solve_aggregated(self, scenario_id: str, demand_id: Optional[str] = None,
+                          history: Optional[Dict] = None, week_index: int = 0,
+                          num_weeks: Optional[int] = None,
+                          hint: Optional[Dict[Tuple[str, int, str], int]] = None,
+                          time_limit: Optional[float] = None,
+                          early_stop: Optional[Dict] = None,
+                          max_workers: Optional[int] = None,
+                          lns_seconds: Optional[float] = None,
+                          break_symmetry: Optional[bool] = None,
+                          solver_config: Optional[SolverConfig] = None) -> Optional[Dict]:
+        """Solve one week by staffing counts per nurse class, then assign individuals
+        
+        Nurses with the same skills, weekend weight and assignment bounds form
+        a class. The count model decides how many nurses of each class work
+        each (day, shift), and how many of them work each weekly composition
+        (number of shifts of each length) that fits 45h, which makes hours,
+        overtime and the assignment-total penalty exact per nurse. Night runs
+        are summed over the class. Availability after the previous week's last
+        shift is stated for every set of shifts on a day, so each day's counts
+        can be matched to distinct nurses. Shift-off requests are soft, as in
+        the weekly model: only nurses beyond those without a request pay for
+        one. Minimum and optimal staffing count every qualified class towards
+        every skill.
+        
+        The count model is a relaxation of the weekly model: it leaves out
+        consecutive runs and weekend terms, and lets a nurse count towards
+        several skills, so its best bound is a lower bound on the weekly
+        objective and is reported as the solution's 'best_bound'. This
+        integer model is a fraction of the size of the Boolean one and gets
+        COUNT_TIME_SHARE of the time limit. Each class is then rostered on its own with exactly those
+        counts, and the merged roster is scored by the full model. If a class
+        cannot realise its counts, the full model repairs from the merged
+        roster: first only the failed classes' nurses with everyone else
+        pinned, then the whole week. Takes the same arguments as
+        `_solve_with_full_compliance` and returns the same solution, with an
+        'aggregation' entry.
+        """
+        print(f"\n🧮 AGGREGATED SOLVE BY NURSE CLASS")
+        print("-" * 50)
+        start = time.perf_counter()
+        labels = {'scenario_id': scenario_id, 'demand_id': demand_id}
+        
+        scenario_data = self.scenarios[scenario_id]
+        scenario_config = scenario_data['scenario_config']
+        store = scenario_data['store']
+        ward_size = len(store.nurses)
+        total_limit = time_limit or self._time_limit(ward_size)
+        if demand_id is None:
+            demand_id = store.week_ids[0]
+            labels['demand_id'] = demand_id
+        week = store.week_index[demand_id]
+        if num_weeks is None:
+            num_weeks = scenario_config.get('numberOfWeeks', 1)
+        nurse_history = {h['nurse']: h for h in (history or {}).get('nurseHistory', [])}
+        valid_shifts = [s for s in self.SHIFTS if s in store.shift_index]
+        classes = self._nurse_classes(scenario_id, history, week_index, num_weeks)
+        hour_values = sorted({self.SHIFT_HOURS[shift] for shift in valid_shifts})
+        successions = {f['precedingShiftType']: f['succeedingShiftTypes']
+                       for f in scenario_config.get('forbiddenShiftTypeSuccessions', [])}
+        shift_off = store.shift_off[week]  # nurse x day x shift
+        
+        # COUNT MODEL
+        model = cp_model.CpModel()
+        count = {}
+        objective_vars, objective_coeffs = [], []
+        for k, nurse_class in enumerate(classes):
+            members = nurse_class['nurses']
+            size = len(members)
+            rows = [store.nurse_index[n['id']] for n in members]
+            requested_off = shift_off[rows][:, :, [store.shift_index[s] for s in valid_shifts]]
+            available = np.ones_like(requested_off, dtype=bool)
+            carried_nights = np.zeros(size, dtype=np.int64)
+            for i, nurse_data in enumerate(members):
+                history_entry = nurse_history.get(nurse_data['id'], {})
+                last_shift = history_entry.get('lastAssignedShiftType', 'None')
+                for shift in successions.get(last_shift, []):
+                    if shift in valid_shifts:
+                        available[i, 0, valid_shifts.index(shift)] = False
+                if last_shift == "Night":
+                    carried_nights[i] = min(history_entry.get('numberOfConsecutiveAssignments', 0),
+                                            self.MAX_CONSECUTIVE_NIGHTS)
+            if "Night" in valid_shifts:
+                available[carried_nights == self.MAX_CONSECUTIVE_NIGHTS, 0, valid_shifts.index("Night")] = False
             
-            for nurse in nurses:
-                nurse_weekly_hours_val = 0
-                for day in self.DAYS:
-                    for shift in valid_shifts:
-                        if solver.BooleanValue(assign[(nurse, day, shift)]):
-                            hours = self.SHIFT_HOURS[shift]
-                            
-                            solution['assignments'].append({
-                                'nurse': nurse,
-                                'day': day,
-                                'shift': shift, 
-                                'hours': hours,
-                                'day_name': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'][day]
-                            })
-                            
-                            total_hours += hours
-                            nurse_weekly_hours_val += hours
-                            shift_counts[shift] = shift_counts.get(shift, 0) + 1
-                
-                nurse_hours[nurse] = nurse_weekly_hours_val
+            for day in self.DAYS:
+                for j, shift in enumerate(valid_shifts):
+                    count[(k, day, shift)] = model.NewIntVar(
+                        0, int(available[:, day, j].sum()), f"count_{k}_{day}_{shift}")
+                    # SHIFT-OFF REQUESTS (soft): nurses beyond those without a request
+                    unrequested = int((available[:, day, j] & ~requested_off[:, day, j]).sum())
+                    if unrequested < available[:, day, j].sum():
+                        requested = model.NewIntVar(0, int(available[:, day, j].sum()) - unrequested,
+                                                    f"requested_off_{k}_{day}_{shift}")
+                        model.Add(count[(k, day, shift)] - requested <= unrequested)
+                        objective_vars.append(requested)
+                        objective_coeffs.append(self.INRC2_WEIGHTS['preferences'])
+                # One shift per nurse per day: any set of shifts needs that many
+                # distinct nurses available for one of them (Hall's condition)
+                for r in range(2, len(valid_shifts) + 1):
+                    for subset in itertools.combinations(range(len(valid_shifts)), r):
+                        model.Add(sum(count[(k, day, valid_shifts[j])] for j in subset)
+                                  <= int(available[:, day, list(subset)].any(axis=1).sum()))
             
-            # Calculate statistics
-            solution['statistics'] = {
-                'total_hours': total_hours,
-                'total_assignments': len(solution['assignments']),
-                'avg_hours_per_nurse': total_hours / len(nurses) if nurses else 0,
-                'nurse_hours': nurse_hours,
-                'shift_distribution': shift_counts,
-                'weekend_assignments': len([a for a in solution['assignments'] if a['day'] in [5, 6]]),
-                'night_assignments': len([a for a in solution['assignments'] if a['shift'] == 'Night']),
-                'twelve_hour_assignments': len([a for a in solution['assignments'] if a['shift'] in ['Day', 'Night']])
+            # Weekly compositions: shifts of each length per nurse within 45h, paying
+            # overtime and assignments outside the class's bounds; nurses per
+            # composition add up to the counts
+            min_assignments, max_assignments = nurse_class['assignment_bounds']
+            compositions = [c for c in itertools.product(range(len(self.DAYS) + 1), repeat=len(hour_values))
+                            if sum(c) <= len(self.DAYS)
+                            and sum(n * h for n, h in zip(c, hour_values)) <= self.MAX_HOURS_PER_WEEK]
+            nurses_per_composition = [model.NewIntVar(0, size, f"composition_{k}_{c}") for c in compositions]
+            model.Add(sum(nurses_per_composition) == size)
+            for h_idx, hours in enumerate(hour_values):
+                model.Add(sum(count[(k, day, shift)] for day in self.DAYS for shift in valid_shifts
+                              if self.SHIFT_HOURS[shift] == hours)
+                          == sum(y * c[h_idx] for y, c in zip(nurses_per_composition, compositions)))
+            for y, c in zip(nurses_per_composition, compositions):
+                overtime = max(0, sum(n * h for n, h in zip(c, hour_values)) - 40)
+                outside = max(0, min_assignments - sum(c)) + max(0, sum(c) - max_assignments)
+                weight = overtime * 3 + self.INRC2_WEIGHTS['total_assignments'] * outside
+                if weight:
+                    objective_vars.append(y)
+                    objective_coeffs.append(weight)
+            if "Night" in valid_shifts:
+                for day in range(5):
+                    model.Add(sum(count[(k, day + i, "Night")] for i in range(3))
+                              <= self.MAX_CONSECUTIVE_NIGHTS * size)
+                # Night runs carried over from the previous week, over the first days
+                model.Add(sum(count[(k, day, "Night")] for day in range(self.MAX_CONSECUTIVE_NIGHTS))
+                          <= self.MAX_CONSECUTIVE_NIGHTS * size - int((carried_nights > 0).sum()))
+        
+        # Per-assignment preferences, one coefficient per count variable
+        cost = self._assignment_costs(valid_shifts, [c['weekend_weight'] for c in classes])
+        costed = np.nonzero(cost)
+        objective_vars += [count[(k, day, valid_shifts[column])]
+                           for k, day, column in zip(*(axis.tolist() for axis in costed))]
+        objective_coeffs += cost[costed].tolist()
+        
+        # Staffing: missing nurses below the minimum at PENALTY_UNDERSTAFFED (the
+        # weekly model's fallback), below the optimal level as the INRC-II soft term
+        minimum = store.demand_minimum[week]  # day x shift x skill
+        optimal = np.maximum(store.demand_optimal[week], minimum)
+        for shift_type in valid_shifts:
+            shift_idx = store.shift_index[shift_type]
+            for skill_idx, skill_required in enumerate(store.skills):
+                required_days = np.flatnonzero(optimal[:, shift_idx, skill_idx])
+                if not len(required_days):
+                    continue
+                qualified = [k for k, c in enumerate(classes) if skill_required in c['skills']]
+                if not qualified:
+                    qualified = list(range(len(classes)))  # Fallback to all nurses
+                for day_idx in required_days.tolist():
+                    staffed = sum(count[(k, day_idx, shift_type)] for k in qualified)
+                    min_staff = int(minimum[day_idx, shift_idx, skill_idx])
+                    optimal_staff = int(optimal[day_idx, shift_idx, skill_idx])
+                    shortfall = 0
+                    if min_staff:
+                        shortfall = model.NewIntVar(0, min_staff, f"short_{skill_required}_{day_idx}_{shift_type}")
+                        model.Add(staffed + shortfall >= min_staff)
+                        objective_vars.append(shortfall)
+                        objective_coeffs.append(self.PENALTY_UNDERSTAFFED)
+                    if optimal_staff > min_staff:
+                        below_optimal = model.NewIntVar(0, optimal_staff - min_staff,
+                                                        f"below_optimal_{skill_required}_{day_idx}_{shift_type}")
+                        model.Add(staffed + shortfall + below_optimal >= optimal_staff)
+                        objective_vars.append(below_optimal)
+                        objective_coeffs.append(self.INRC2_WEIGHTS['optimal_coverage'])
+        
+        model.Minimize(cp_model.LinearExpr.WeightedSum(objective_vars, objective_coeffs))
+        if hint:
+            for (k, day, shift), var in count.items():
+                model.AddHint(var, sum(hint.get((n['id'], day, shift), 0) for n in classes[k]['nurses']))
+        self.instrumentation.model_stats(model, nurses=sum(len(c['nurses']) for c in classes),
+                                         classes=len(classes), **labels)
+        print(f"   ✓ {len(classes)} nurse classes, {len(count)} count variables")
+        
+        recorder = self.instrumentation.recorder(
+            early_stop=self.EARLY_STOP if early_stop is None else early_stop, model='count', **labels)
+        with self.instrumentation.phase("count", **labels), recorder.watching():
+            solver, status = self._solver_config(solver_config, ward_size).solve(
+                model, total_limit * self.COUNT_TIME_SHARE, recorder)
+        self.instrumentation.solve_summary(solver, status, stop_reason=recorder.final_stop_reason(status),
+                                           model='count', **labels)
+        count_time = time.perf_counter() - start
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            print(f"❌ Count model: {solver.StatusName(status)}")
+            return None
+        print(f"   ✓ Count model {solver.StatusName(status)}: objective {solver.ObjectiveValue()}")
+        
+        # ASSIGN INDIVIDUALS: one small model per class with its counts fixed
+        workers = max(1, min(len(classes), max_workers or available_cpus()))
+        class_config = self._solver_config(solver_config, ward_size).with_workers(
+            max(1, available_cpus() // workers))
+        rounds = -(-len(classes) // workers)
+        assign_limit = max(0.5, (total_limit - count_time) * 0.5 / rounds)
+        class_kwargs = [dict(demand_id=demand_id, history=history, week_index=week_index,
+                             num_weeks=num_weeks, hint=hint, early_stop=early_stop,
+                             time_limit=assign_limit, lns_seconds=0.0, break_symmetry=break_symmetry,
+                             nurse_subset=[n['id'] for n in nurse_class['nurses']], skill_subset=[],
+                             solver_config=class_config,
+                             class_counts={(day, shift): solver.Value(count[(k, day, shift)])
+                                           for day in self.DAYS for shift in valid_shifts})
+                        for k, nurse_class in enumerate(classes)]
+        settings = self.settings()
+        with self.instrumentation.phase("assign", classes=len(classes), workers=workers, **labels):
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(_solve_subset, self.datasets_path, scenario_data, settings, kwargs)
+                               for kwargs in class_kwargs]
+                    results = [f.result() for f in futures]
+            except (OSError, NotImplementedError):
+                results = [_solve_subset(self.datasets_path, scenario_data, settings, kwargs)
+                           for kwargs in class_kwargs]
+        class_solutions = []
+        for k, (class_solution, records) in enumerate(results):
+            self.instrumentation.forward(records, nurse_class=k)
+            class_solutions.append(class_solution)
+        
+        merged = {(a['nurse'], a['day'], a['shift']): 1
+                  for class_solution in class_solutions if class_solution
+                  for a in class_solution['assignments']}
+        failed_nurses = [n['id'] for nurse_class, class_solution in zip(classes, class_solutions)
+                         if not class_solution for n in nurse_class['nurses']]
+        failed = sum(1 for class_solution in class_solutions if not class_solution)
+        assign_time = time.perf_counter() - start - count_time
+        print(f"   ✓ Assigned {len(classes) - failed}/{len(classes)} classes")
+        
+        # SCORE the merged roster with the full model, re-solving failed classes only
+        remaining = max(1.0, total_limit - (time.perf_counter() - start))
+        solution = self._solve_with_full_compliance(
+            scenario_id, demand_id=demand_id, history=history, week_index=week_index,
+            num_weeks=num_weeks, hint=merged, fixed=merged, free_nurses=failed_nurses or None,
+            time_limit=remaining, early_stop=early_stop, lns_seconds=lns_seconds,
+            break_symmetry=break_symmetry, solver_config=solver_config)
+        repaired = solution is None or not solution['inrc2_valid']
+        if repaired:
+            # REPAIR: whole week, warm-started from the merged roster
+            remaining = max(1.0, total_limit - (time.perf_counter() - start))
+            repair = self._solve_with_full_compliance(
+                scenario_id, demand_id=demand_id, history=history, week_index=week_index,
+                num_weeks=num_weeks, hint=merged, time_limit=remaining, early_stop=early_stop,
+                lns_seconds=lns_seconds, break_symmetry=break_symmetry, solver_config=solver_config)
+            repaired = repair is not None
+            solution = repair or solution
+        if not solution:
+            return None
+        
+        offset = count_time + assign_time
+        for incumbent in solution['incumbents']:
+            incumbent['wall_time'] += offset
+        # The merged roster is scored with its assignments pinned, so only the
+        # count model (and a free repair) bound the weekly objective
+        count_bound = solver.BestObjectiveBound()
+        solution['best_bound'] = max(count_bound, solution['best_bound']) if repaired else count_bound
+        solution['aggregation'] = {
+            'classes': len(classes),
+            'count_variables': len(count),
+            'count_status': solver.StatusName(status),
+            'count_objective': solver.ObjectiveValue(),
+            'count_bound': count_bound,
+            'count_time': count_time,
+            'assign_time': assign_time,
+            'failed_classes': failed,
+            'repaired': repaired,
+        }
+        solution['solve_time'] += offset
+        return solution
+    
+    def _skill_blocks(self, scenario_id: str) -> List[Dict]:
+        """Partition nurses by their highest skill (in SKILL_BLOCKS order)"""
+        scenario_config = self.scenarios[scenario_id]['scenario_config']
+        order = self.SKILL_BLOCKS + [s for s in scenario_config.get('skills', [])
+                                     if s not in self.SKILL_BLOCKS]
+        blocks = {skill: [] for skill in order}
+        for nurse_data in scenario_config.get('nurses', []):
+            skills = nurse_data.get('skills', [])
+            primary = next((skill for skill in order if skill in skills), None)
+            if primary is not None:
+                blocks[primary].append(nurse_data['id'])
+        return [{'skill': skill, 'nurses': nurses} for skill, nurses in blocks.items() if nurses]
+    
+    def _solve_decomposed(self, scenario_id: str, demand_id: Optional[str] = None,
+                          history: Optional[Dict] = None, week_index: int = 0,
+                          num_weeks: Optional[int] = None,
+                          hint: Optional[Dict[Tuple[str, int, str], int]] = None,
+                          time_limit: Optional[float] = None,
+                          early_stop: Optional[Dict] = None,
+                          max_workers: Optional[int] = None,
+                          lns_seconds: Optional[float] = None,
+                          break_symmetry: Optional[bool] = None,
+                          solver_config: Optional[SolverConfig] = None) -> Optional[Dict]:
+        """Solve one week by skill blocks, then repair the merged roster
+        
+        Each block (nurses whose highest skill is HeadNurse, Nurse, ...) is solved
+        against its own skill's requirements in a separate worker process, using
+        BLOCK_TIME_SHARE of the time limit. The block rosters are merged into a
+        hint for the full model, which reconciles cross-skill coverage (e.g. head
+        nurses covering Nurse demand) in the remaining time. Takes the same
+        arguments as `_solve_with_full_compliance` and returns the same solution,
+        with wall-clock solve_time over both stages and a 'decomposition' entry.
+        """
+        print(f"\n🧩 DECOMPOSED SOLVE BY SKILL BLOCK")
+        print("-" * 50)
+        ward_size = len(self.scenarios[scenario_id]['store'].nurses)
+        total_limit = time_limit or self._time_limit(ward_size)
+        blocks = self._skill_blocks(scenario_id)
+        workers = max(1, min(len(blocks), max_workers or available_cpus()))
+        block_config = self._solver_config(solver_config, ward_size).with_workers(
+            max(1, available_cpus() // workers))
+        # Blocks beyond the worker count run in later rounds, so split the block
+        # share of the time limit across rounds to keep the overall budget
+        rounds = -(-len(blocks) // workers)
+        block_kwargs = [dict(demand_id=demand_id, history=history, week_index=week_index,
+                             num_weeks=num_weeks, hint=hint, early_stop=early_stop,
+                             time_limit=total_limit * self.BLOCK_TIME_SHARE / rounds,
+                             nurse_subset=block['nurses'], skill_subset=[block['skill']],
+                             break_symmetry=break_symmetry, solver_config=block_config)
+                        for block in blocks]
+        
+        start = time.perf_counter()
+        scenario_data = self.scenarios[scenario_id]
+        settings = self.settings()
+        with self.instrumentation.phase("blocks", scenario_id=scenario_id, demand_id=demand_id,
+                                        blocks=len(blocks), workers=workers):
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    futures = [pool.submit(_solve_subset, self.datasets_path, scenario_data, settings, kwargs)
+                               for kwargs in block_kwargs]
+                    results = [f.result() for f in futures]
+            except (OSError, NotImplementedError):
+                results = [_solve_subset(self.datasets_path, scenario_data, settings, kwargs)
+                           for kwargs in block_kwargs]
+        block_time = time.perf_counter() - start
+        block_solutions = []
+        for block, (block_solution, records) in zip(blocks, results):
+            self.instrumentation.forward(records, block=block['skill'])
+            block_solutions.append(block_solution)
+        
+        merged_hint = dict(hint or {})
+        block_report = []
+        for block, block_solution in zip(blocks, block_solutions):
+            if block_solution:
+                block_nurses = set(block['nurses'])
+                merged_hint = {k: v for k, v in merged_hint.items() if k[0] not in block_nurses}
+                merged_hint.update({(a['nurse'], a['day'], a['shift']): 1
+                                    for a in block_solution['assignments']})
+            report = {
+                'skill': block['skill'],
+                'nurses': len(block['nurses']),
+                'status': block_solution['status'] if block_solution else 'NO_SOLUTION',
+                'objective': block_solution['objective'] if block_solution else None,
+                'uncovered': block_solution['uncovered'] if block_solution else None,
+                'solve_time': block_solution['solve_time'] if block_solution else None,
             }
-            
-            print(f"   📊 Total hours: {total_hours}")
-            print(f"   📊 Assignments: {len(solution['assignments'])}")
-            print(f"   📊 Avg hours/nurse: {total_hours / len(nurses):.1f}")
-            
-            return solution
-        else:
-            print(f"❌ No solution found (status: {status})")
+            block_report.append(report)
+            self.instrumentation.emit("block", scenario_id=scenario_id, demand_id=demand_id, **report)
+            print(f"   🧩 {block['skill']:10} {len(block['nurses']):3} nurses: {report['status']}, "
+                  f"uncovered={report['uncovered']}")
+        
+        # REPAIR: full model warm-started from the merged block rosters
+        repair_limit = max(1.0, total_limit - block_time)
+        solution = self._solve_with_full_compliance(
+            scenario_id, demand_id=demand_id, history=history, week_index=week_index,
+            num_weeks=num_weeks, hint=merged_hint, time_limit=repair_limit, early_stop=early_stop,
+            lns_seconds=lns_seconds, break_symmetry=break_symmetry, solver_config=solver_config)
+        if not solution:
             return None
+        
+        for incumbent in solution['incumbents']:
+            incumbent['wall_time'] += block_time
+        solution['decomposition'] = {
+            'blocks': block_report,
+            'block_time': block_time,
+            'repair_time': solution['solve_time'],
+        }
+        solution['solve_time'] += block_time
+        return solution
     
     def _add_break_scheduling(self, solution: Dict) -> Dict:
         """Add mandatory break scheduling with coverage"""
@@ -429,62 +1504,86 @@ class FinalMalaysianNurseRoster:
         nurse_hours = solution['statistics']['nurse_hours']
         assignments = solution['assignments']
         break_schedule = solution.get('break_schedule', [])
+        scenario_config = self.scenarios.get(solution.get('scenario_id'), {}).get('scenario_config', {})
+        history = {h['nurse']: h for h in (solution.get('history') or {}).get('nurseHistory', [])}
+        
+        # One pass over the assignments into a (nurse x day) shift-code array;
+        # every check below is a vectorized per-nurse count on it
+        nurses = list(nurse_hours)
+        roster_index = RosterIndex.from_assignments(assignments, nurses, self.SHIFTS)
+        previous = np.array([roster_index.shift_code(history.get(n, {}).get('lastAssignedShiftType'))
+                             for n in nurses], dtype=np.int64)
         
         # 1. Check 45-hour weekly limit
         hour_violations = 0
-        for nurse, hours in nurse_hours.items():
+        for nurse, hours in zip(nurses, roster_index.nurse_totals(self.SHIFT_HOURS).tolist()):
             if hours > self.MAX_HOURS_PER_WEEK:
                 compliance['violations'].append(f"❌ {nurse}: {hours}h > {self.MAX_HOURS_PER_WEEK}h limit")
                 hour_violations += 1
-            elif hours <= self.MAX_HOURS_PER_WEEK:
+            else:
                 compliance['strengths'].append(f"✅ {nurse}: {hours}h ≤ {self.MAX_HOURS_PER_WEEK}h")
         
-        # 2. Check consecutive night shifts
+        # 2. Check consecutive night shifts, including a night run carried from the previous week
         night_violations = 0
-        for nurse in nurse_hours:
-            nurse_nights = [a for a in assignments if a['nurse'] == nurse and a['shift'] == 'Night']
-            if len(nurse_nights) > 0:
-                # Check consecutive nights
-                nights_by_day = {a['day']: True for a in nurse_nights}
-                consecutive = 0
-                max_consecutive = 0
-                
-                for day in self.DAYS:
-                    if day in nights_by_day:
-                        consecutive += 1
-                        max_consecutive = max(max_consecutive, consecutive)
-                    else:
-                        consecutive = 0
-                
-                if max_consecutive > self.MAX_CONSECUTIVE_NIGHTS:
-                    compliance['violations'].append(f"❌ {nurse}: {max_consecutive} consecutive nights > {self.MAX_CONSECUTIVE_NIGHTS}")
-                    night_violations += 1
-                else:
-                    compliance['strengths'].append(f"✅ {nurse}: Night shifts within limit")
+        carried = np.array([history.get(n, {}).get('numberOfConsecutiveAssignments', 0)
+                            if history.get(n, {}).get('lastAssignedShiftType') == 'Night' else 0
+                            for n in nurses], dtype=np.int64)
+        nights = roster_index.shift_counts()[:, roster_index.shift_code('Night')] if 'Night' in self.SHIFTS else 0
+        max_consecutive = roster_index.max_consecutive('Night', carried)
+        for i in np.flatnonzero(nights > 0):
+            if max_consecutive[i] > self.MAX_CONSECUTIVE_NIGHTS:
+                compliance['violations'].append(f"❌ {nurses[i]}: {max_consecutive[i]} consecutive nights > {self.MAX_CONSECUTIVE_NIGHTS}")
+                night_violations += 1
+            else:
+                compliance['strengths'].append(f"✅ {nurses[i]}: Night shifts within limit")
         
         # 3. Check break requirements
         break_violations = 0
-        nurse_breaks = {}
-        for break_entry in break_schedule:
-            nurse = break_entry['nurse']
-            nurse_breaks[nurse] = nurse_breaks.get(nurse, 0) + 1
-        
-        for nurse in nurse_hours:
-            nurse_assignments = [a for a in assignments if a['nurse'] == nurse]
-            expected_breaks = sum(self.SHIFT_BREAKS.get(a['shift'], 0) for a in nurse_assignments)
-            actual_breaks = nurse_breaks.get(nurse, 0)
-            
-            if actual_breaks < expected_breaks:
-                compliance['violations'].append(f"❌ {nurse}: {actual_breaks} breaks < {expected_breaks} required")
+        break_nurses = [roster_index.nurse_index[b['nurse']] for b in break_schedule
+                        if b['nurse'] in roster_index.nurse_index]
+        actual_breaks = np.bincount(np.array(break_nurses, dtype=np.int64), minlength=len(nurses))
+        expected_breaks = roster_index.nurse_totals(self.SHIFT_BREAKS)
+        for i, nurse in enumerate(nurses):
+            if actual_breaks[i] < expected_breaks[i]:
+                compliance['violations'].append(f"❌ {nurse}: {actual_breaks[i]} breaks < {expected_breaks[i]} required")
                 break_violations += 1
             else:
                 compliance['strengths'].append(f"✅ {nurse}: Adequate break allocation")
         
+        # 4. Check minimum rest: forbidden shift successions, from the previous week's last shift on
+        successions = {f['precedingShiftType']: f['succeedingShiftTypes']
+                       for f in scenario_config.get('forbiddenShiftTypeSuccessions', [])}
+        succession_counts = roster_index.forbidden_successions(successions, previous)
+        rest_violations = int((succession_counts > 0).sum())
+        for i in np.flatnonzero(succession_counts):
+            compliance['violations'].append(
+                f"❌ {nurses[i]}: {succession_counts[i]} forbidden shift successions "
+                f"(rest < {self.MIN_REST_BETWEEN_SHIFTS}h)")
+        
+        # 5. Check complete weekends (both days or neither) where the contract asks for them
+        contracts = {c['id']: c for c in scenario_config.get('contracts', [])}
+        contract_of = {n['id']: n.get('contract') for n in scenario_config.get('nurses', [])}
+        complete_weekends = np.array([contracts.get(contract_of.get(n), {}).get('completeWeekends', 0) == 1
+                                      for n in nurses], dtype=bool)
+        incomplete = ((roster_index.weekends() == 1).sum(axis=1) > 0) & complete_weekends
+        if incomplete.any():
+            compliance['warnings'].append(f"⚠️ {int(incomplete.sum())} nurses with incomplete weekends")
+        
+        # 6. INRC-II minimum staffing, left uncovered only where the Malaysian limits forced it
+        understaffing = solution.get('understaffing', [])
+        compliance['inrc2_valid'] = not understaffing
+        for slot in understaffing:
+            compliance['violations'].append(
+                f"❌ {self.DAY_NAMES[slot['day']]} {slot['shift']}: {slot['missing']} {slot['skill']} "
+                f"below INRC-II minimum staffing")
+        
         # Calculate compliance score
-        total_violations = hour_violations + night_violations + break_violations
+        total_violations = hour_violations + night_violations + break_violations + rest_violations
         if total_violations > 0:
             compliance['compliance_score'] = max(0, 100 - (total_violations * 15))
             compliance['overall_compliant'] = False
+        if understaffing:
+            compliance['overall_compliant'] = False
         
         # Add warnings for optimization
         if solution['statistics']['weekend_assignments'] > len(assignments) * 0.3:
@@ -569,7 +1668,8 @@ class FinalMalaysianNurseRoster:
                 print(f"     {strength}")
         
         # Save detailed report
-        os.makedirs("output", exist_ok=True)
+        os.makedirs(self.OUTPUT_DIR, exist_ok=True)
+        report_path = os.path.join(self.OUTPUT_DIR, f"final_malaysian_solution_{solution['scenario_id']}.json")
         
         report_data = {
             'solution': solution,
@@ -584,13 +1684,29 @@ class FinalMalaysianNurseRoster:
             }
         }
         
-        with open(f"output/final_malaysian_solution_{solution['scenario_id']}.json", 'w') as f:
+        with open(report_path, 'w') as f:
             json.dump(report_data, f, indent=2)
         
-        print(f"\n💾 Detailed report saved: output/final_malaysian_solution_{solution['scenario_id']}.json")
+        print(f"\n💾 Detailed report saved: {report_path}")
         
         return report_data
 
+def _solve_subset(datasets_path: str, scenario_data: Dict, settings: Dict,
+                  solve_kwargs: Dict) -> Tuple[Optional[Dict], List[Dict]]:
+    """Solve one skill block or nurse class (`_solve_decomposed`, `_solve_aggregated`) in a pool worker
+    
+    The worker's system gets the parent's `settings` (see `FinalMalaysianNurseRoster.settings`);
+    its telemetry is collected in memory and returned with the solution for the parent to forward.
+    """
+    system = FinalMalaysianNurseRoster(datasets_path, instrumentation=SolverInstrumentation())
+    for name, value in settings.items():
+        setattr(system, name, value)
+    system.scenarios[scenario_data['scenario_id']] = scenario_data
+    with contextlib.redirect_stdout(io.StringIO()):
+        solution = system._solve_with_full_compliance(scenario_data['scenario_id'], **solve_kwargs)
+    return solution, system.instrumentation.records
+
+
 def main():
     """Main execution - FINAL COMPLETE SYSTEM"""
     print("🏥🇲🇾 FINAL COMPLETE MALAYSIAN NURSE ROSTERING SYSTEM")
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Constructive heuristic for the 7-day x 2-shift ward roster.
+
+Builds a roster in milliseconds with NumPy only (no OR-Tools), under the
+same rules as lambda_rostering.build_model: at most one shift per day,
+40-45 hours and 4-5 shifts a week (lowered by leave days), no night -> day
+turnaround, and per-day, per-shift coverage with uncovered positions
+reported as slack. Used for instant previews ("mode": "fast") and as the
+hint that seeds the CP-SAT search.
+
+Passes:
+  0. Every nurse gets a target weekly (day, night) pattern, e.g. (5, 0) or
+     (1, 3), by hill climbing on how well the pattern totals cover the
+     week's day and night demand (a 12h night costs 1.5 day shifts of hours).
+  1. Day by day, every cell's minimum demand is filled with the cheapest
+     available nurses (preferred days off, preferred shift type) that are
+     below their target for that shift, preferring nurses with few spare
+     days left.
+  2. Nurses get their remaining target shifts one at a time, cheapest first,
+     where uncovered and below-optimal cells are cheapest. A nurse whose
+     target cannot be placed is completed to any feasible pattern.
+  3. Shifts are moved from overstaffed into uncovered cells where the
+     nurse's week stays feasible.
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from roster_rules import (
+    DAY,
+    DAY_NAMES,
+    DAYS,
+    MAX_SHIFTS_PER_WEEK,
+    MAX_WEEK_HOURS,
+    MIN_SHIFTS_PER_WEEK,
+    MIN_WEEK_HOURS,
+    NIGHT,
+    PENALTY_BELOW_OPTIMAL,
+    PENALTY_UNASSIGNED,
+    REWARD_PREF_SHIFT,
+    ROSTER_KEYS,
+    SHIFT_HOURS,
+    SHIFT_HOURS_ARRAY,
+    SHIFTS,
+    assignment_costs,
+    demand_matrix,
+    optimal_matrix,
+)
+
+
+def _weekly_bounds(leave_days: int):
+    """(min hours, min shifts) for a nurse with `leave_days` days of leave, as in build_model."""
+    return (
+        max(0, MIN_WEEK_HOURS - leave_days * SHIFT_HOURS["day"]),
+        max(0, MIN_SHIFTS_PER_WEEK - leave_days),
+    )
+
+
+def _pattern_tables():
+    """
+    complete[L, a, b]: a nurse with L leave days and `a` day / `b` night shifts
+    meets the weekly bounds. extendable[L, a, b]: some (a', b') >= (a, b) does.
+    """
+    size = len(DAYS) + 1
+    complete = np.zeros((size, size, size), dtype=bool)
+    for leave_days in range(size):
+        min_hours, min_shifts = _weekly_bounds(leave_days)
+        for a in range(size):
+            for b in range(size - a):
+                hours = a * SHIFT_HOURS["day"] + b * SHIFT_HOURS["night"]
+                complete[leave_days, a, b] = (
+                    min_hours <= hours <= MAX_WEEK_HOURS
+                    and min_shifts <= a + b <= MAX_SHIFTS_PER_WEEK
+                    and a + b <= len(DAYS) - leave_days
+                )
+    # Suffix "any" over both count axes
+    extendable = np.flip(
+        np.logical_or.accumulate(
+            np.logical_or.accumulate(np.flip(complete, axis=(1, 2)), axis=1), axis=2
+        ),
+        axis=(1, 2),
+    )
+    return complete, extendable
+
+
+COMPLETE, EXTENDABLE = _pattern_tables()
+
+
+def _coverage_value(supply, minimum: int, optimal: int):
+    """Objective value of `supply` shifts against a week's minimum and optimal demand."""
+    covered = np.minimum(supply, minimum)
+    extra = np.clip(supply - minimum, 0, optimal - minimum)
+    return PENALTY_UNASSIGNED * covered + PENALTY_BELOW_OPTIMAL * extra
+
+
+def _plan_patterns(leave_days: np.ndarray, pref_shift: np.ndarray, demand: np.ndarray,
+                   optimal: np.ndarray) -> np.ndarray:
+    """
+    Target (day, night) shift counts per nurse: start from each nurse's
+    preferred-shift pattern, then apply the best single-nurse pattern change
+    while it improves coverage of the weekly totals plus preference rewards.
+    """
+    patterns = np.argwhere(COMPLETE.any(axis=0))  # every (a, b) complete for some leave count
+    allowed = COMPLETE[leave_days][:, patterns[:, 0], patterns[:, 1]]  # (nurses, patterns)
+    # Preference value of every pattern per nurse, then a small bonus for more shifts
+    preference = -REWARD_PREF_SHIFT * patterns[:, pref_shift].T
+    start = np.where(allowed, preference * 10 + patterns.sum(axis=1), np.iinfo(np.int64).min)
+    chosen = np.argmax(start, axis=1)
+    if not len(chosen):
+        return np.zeros((0, len(SHIFTS)), dtype=np.int64)
+
+    totals = [demand[:, s].sum() for s in (DAY, NIGHT)], [optimal[:, s].sum() for s in (DAY, NIGHT)]
+    rows = np.arange(len(chosen))
+    for _ in range(len(chosen) * len(patterns)):
+        supply = patterns[chosen].sum(axis=0)
+        # Supply with each nurse's pattern swapped for each candidate: (nurses, patterns, shift)
+        swapped = supply - patterns[chosen][:, None, :] + patterns[None, :, :]
+        value = sum(
+            _coverage_value(swapped[:, :, s], totals[0][k], totals[1][k])
+            for k, s in enumerate((DAY, NIGHT))
+        ) + preference
+        gain = value - value[rows, chosen][:, None]
+        gain[~allowed] = np.iinfo(np.int64).min
+        i, p = np.unravel_index(np.argmax(gain), gain.shape)
+        if gain[i, p] <= 0:
+            break
+        chosen[i] = p
+    return patterns[chosen]
+
+
+def construct_roster(
+    nurse_profiles: List[Dict],
+    N: Optional[int] = None,
+    demand=None,
+    demand_optimal=None,
+    unavailable: Optional[Dict[str, List[int]]] = None,
+) -> Dict:
+    """
+    Greedy roster for the build_and_solve inputs. Returns the roster with
+    nurse_hours, slack, below_optimal (with demand_optimal), the objective as
+    build_model scores it, status "FEASIBLE" when every nurse meets the weekly
+    bounds (else "INFEASIBLE" with the offending nurses under "violations")
+    and build_time.
+    """
+    start = time.perf_counter()
+    nurses = [n["nurse_id"] for n in nurse_profiles]
+    num_nurses = len(nurses)
+    pref_days_off = np.zeros((num_nurses, len(DAYS)), dtype=bool)
+    pref_shift = np.zeros(num_nurses, dtype=np.int64)
+    for i, n in enumerate(nurse_profiles):
+        pref_days_off[i, [d for d in n.get("preferred_days_off", []) if d in DAYS]] = True
+        pref_shift[i] = DAY if int(n.get("preferred_shift_type", 0)) == 0 else NIGHT
+    leave = np.zeros((num_nurses, len(DAYS)), dtype=bool)
+    for i, nid in enumerate(nurses):
+        leave[i, [d for d in (unavailable or {}).get(nid, []) if d in DAYS]] = True
+
+    demand = demand_matrix(N, demand)
+    optimal = optimal_matrix(demand, demand_optimal)
+
+    # Assignment cost per (nurse, day, shift) as in the build_model objective
+    cost = assignment_costs(pref_days_off, pref_shift)
+
+    values = np.zeros((num_nurses, len(DAYS), len(SHIFTS)), dtype=bool)
+    counts = np.zeros((num_nurses, len(SHIFTS)), dtype=np.int64)  # (day, night) shifts so far
+    leave_days = leave.sum(axis=1)
+    target = _plan_patterns(leave_days, pref_shift, demand, optimal)
+    # Available (non-leave) days from day d to the end of the week
+    days_left = np.flip(np.cumsum(np.flip(~leave, axis=1), axis=1), axis=1)
+
+    def can_take(d: int, s: int) -> np.ndarray:
+        """Nurses that can work shift s on day d given the assignments so far."""
+        free = ~leave[:, d] & ~values[:, d].any(axis=1)
+        if s == DAY and d > 0:
+            free &= ~values[:, d - 1, NIGHT]
+        if s == NIGHT and d < len(DAYS) - 1:
+            free &= ~values[:, d + 1, DAY]
+        return free & (counts[:, s] < target[:, s])
+
+    def fits(i: int, d: int, s: int, planned: bool = True) -> bool:
+        """
+        can_take for a single nurse; with planned=False any shift that keeps a
+        feasible weekly pattern reachable is allowed, not just the target.
+        """
+        if leave[i, d] or values[i, d].any():
+            return False
+        if s == DAY and d > 0 and values[i, d - 1, NIGHT]:
+            return False
+        if s == NIGHT and d < len(DAYS) - 1 and values[i, d + 1, DAY]:
+            return False
+        if planned:
+            return bool(counts[i, s] < target[i, s])
+        return bool(EXTENDABLE[leave_days[i], counts[i, DAY] + (s == DAY), counts[i, NIGHT] + (s == NIGHT)])
+
+    def assign(i: int, d: int, s: int):
+        values[i, d, s] = True
+        counts[i, s] += 1
+
+    # Pass 1: minimum coverage, day by day
+    for d in DAYS:
+        for s in (DAY, NIGHT):
+            candidates = np.flatnonzero(can_take(d, s))
+            if not len(candidates):
+                continue
+            spare = days_left[candidates, d] - (target[candidates] - counts[candidates]).sum(axis=1)
+            order = np.lexsort((candidates, counts[candidates].sum(axis=1), spare, cost[candidates, d, s]))
+            for i in candidates[order[: int(demand[d, s])]]:
+                assign(i, d, s)
+
+    # Pass 2: complete every nurse to the target, else to any feasible weekly pattern
+    for i in range(num_nurses):
+        planned = True
+        while planned or not COMPLETE[leave_days[i], counts[i, DAY], counts[i, NIGHT]]:
+            if planned and (counts[i] >= target[i]).all():
+                break
+            coverage = values.sum(axis=0)
+            gain = np.where(coverage < demand, PENALTY_UNASSIGNED, 0) + np.where(
+                (coverage >= demand) & (coverage < optimal), PENALTY_BELOW_OPTIMAL, 0
+            )
+            best = None
+            for d in DAYS:
+                for s in (DAY, NIGHT):
+                    if not fits(i, d, s, planned):
+                        continue
+                    option = (int(cost[i, d, s] - gain[d, s]), d, s)
+                    if best is None or option < best:
+                        best = option
+            if best is None:
+                if not planned:
+                    break
+                planned = False
+                continue
+            assign(i, best[1], best[2])
+
+    # Pass 3: move shifts from overstaffed cells into uncovered ones
+    coverage = values.sum(axis=0)
+    for d, s in zip(*np.nonzero(coverage < demand)):
+        for i in np.flatnonzero(~leave[:, d] & ~values[:, d].any(axis=1)):
+            if coverage[d, s] >= demand[d, s]:
+                break
+            best = None
+            for d_from, s_from in zip(*np.nonzero(values[i] & (coverage > demand))):
+                values[i, d_from, s_from] = False
+                counts[i, s_from] -= 1
+                if fits(i, d, s, planned=False) and COMPLETE[leave_days[i], counts[i, DAY] + (s == DAY), counts[i, NIGHT] + (s == NIGHT)]:
+                    lost = PENALTY_BELOW_OPTIMAL if coverage[d_from, s_from] <= optimal[d_from, s_from] else 0
+                    option = (int(cost[i, d, s] - cost[i, d_from, s_from] + lost), d_from, s_from)
+                    if best is None or option < best:
+                        best = option
+                values[i, d_from, s_from] = True
+                counts[i, s_from] += 1
+            if best is not None and best[0] < PENALTY_UNASSIGNED:
+                values[i, best[1], best[2]] = False
+                counts[i, best[2]] -= 1
+                coverage[best[1], best[2]] -= 1
+                assign(i, d, s)
+                coverage[d, s] += 1
+
+    hours = values.reshape(num_nurses, -1) @ np.tile(SHIFT_HOURS_ARRAY, len(DAYS))
+    complete = COMPLETE[leave_days, counts[:, DAY], counts[:, NIGHT]]
+    coverage = values.sum(axis=0)
+    shortfall = np.maximum(demand - coverage, 0)
+    below_optimal = np.maximum(optimal - np.maximum(coverage, demand), 0)
+    objective = (
+        int((cost * values).sum())
+        + PENALTY_UNASSIGNED * int(shortfall.sum())
+        + PENALTY_BELOW_OPTIMAL * int(below_optimal.sum())
+    )
+
+    result = {
+        "roster": {
+            DAY_NAMES[d]: {
+                key: [nurses[i] for i in np.flatnonzero(values[:, d, s])]
+                for s, key in enumerate(ROSTER_KEYS)
+            }
+            for d in DAYS
+        },
+        "nurse_hours": {nid: int(h) for nid, h in zip(nurses, hours)},
+        "slack": {f"{shift}_{d}": int(shortfall[d, s]) for s, shift in enumerate(SHIFTS) for d in DAYS},
+    }
+    if demand_optimal is not None:
+        result["below_optimal"] = {
+            f"{shift}_{d}": int(below_optimal[d, s]) for s, shift in enumerate(SHIFTS) for d in DAYS
+        }
+    result.update(
+        {
+            "objective": objective,
+            "status": "FEASIBLE" if complete.all() else "INFEASIBLE",
+            "violations": [
+                {"nurse_id": nurses[i], "hours": int(hours[i]), "shifts": int(counts[i].sum())}
+                for i in np.flatnonzero(~complete)
+            ],
+            "build_time": time.perf_counter() - start,
+        }
+    )
+    return result
+
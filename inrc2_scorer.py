@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Vectorized INRC-II roster scorer.
+
+Scores multi-week rosters of an INRC-II instance under the competition's
+hard and soft constraints, independently of any solver model:
+
+    hard  understaffing          nurses below the minimum per (day, shift, skill)
+          successions            forbidden shift-type successions, from history on
+          missing_skill          assignments to a skill the nurse does not have
+          multiple_assignments   more than one assignment per nurse and day
+    soft  optimal_coverage     30  nurses below the optimal level
+          consecutive_shift    15  consecutive assignments to one shift type (min/max)
+          consecutive_work     30  consecutive working days (min/max)
+          consecutive_off      30  consecutive days off (min/max)
+          preferences          10  assignments on shift-off requests
+          complete_weekends    30  weekends worked on one day only
+          total_assignments    20  horizon total outside the contract range
+          working_weekends     30  working weekends above the contract maximum
+
+Runs continue from the history record: a run in progress at the start of the
+horizon counts its history days (only excess days inside the horizon are
+penalised for maxima), and a run still in progress at the end of the horizon
+is not penalised for being short. The totals are only scored when the roster
+spans the scenario's full numberOfWeeks.
+
+Rosters are int8 arrays of shift codes per (nurse, day), OFF on days off,
+optionally with a parallel array of skill codes. Batches of rosters stack on
+a leading axis and are scored in one pass, so the scorer doubles as a
+fitness function. Rosters without skills (e.g. the full system's output)
+get a greedy skill allocation per (day, shift) that fills the least
+flexible nurses first.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from scenario_store import CompiledScenario
+
+OFF = -1
+SOLUTION_DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+WEEKEND_DAYS = (5, 6)
+
+HARD_CONSTRAINTS = ["understaffing", "successions", "missing_skill", "multiple_assignments"]
+SOFT_WEIGHTS = {
+    "optimal_coverage": 30,
+    "consecutive_shift": 15,
+    "consecutive_work": 30,
+    "consecutive_off": 30,
+    "preferences": 10,
+    "complete_weekends": 30,
+    "total_assignments": 20,
+    "working_weekends": 30,
+}
+
+
+def _runs(on: np.ndarray, carried: np.ndarray, minimum: np.ndarray, maximum: np.ndarray) -> np.ndarray:
+    """
+    Min/max violations (in days) of consecutive runs of `on` (..., nurse, day).
+    `carried` is the run length in progress before day 0, `minimum` and
+    `maximum` are per nurse; all broadcast against the leading axes.
+    """
+    days = np.arange(on.shape[-1])
+    last_break = np.maximum.accumulate(np.where(on, -1, days), axis=-1)
+    carried = np.broadcast_to(np.asarray(carried)[..., None], on.shape)
+    position = np.where(on, days - last_break + np.where(last_break < 0, carried, 0), 0)
+
+    minimum = np.asarray(minimum)[..., None]
+    maximum = np.asarray(maximum)[..., None]
+    # Maximum: every day of a run beyond the limit that lies inside the horizon
+    excess = (position > maximum).sum(axis=-1)
+    # Minimum: runs that end inside the horizon, including a carried run ending before day 0
+    ends = on[..., :-1] & ~on[..., 1:]
+    short = np.where(ends, np.maximum(minimum - position[..., :-1], 0), 0).sum(axis=-1)
+    carried_end = (carried[..., 0] > 0) & ~on[..., 0]
+    short = short + np.where(carried_end, np.maximum(minimum[..., 0] - carried[..., 0], 0), 0)
+    return excess + short
+
+
+class Inrc2Scorer:
+    """INRC-II hard/soft evaluation of rosters for one (history, week sequence) of an instance."""
+
+    def __init__(self, scenario: CompiledScenario, week_ids: Sequence[str], history_id: str = "0"):
+        self.scenario = scenario
+        self.week_ids = list(week_ids)
+        self.nurses = scenario.nurses
+        self.shifts = scenario.shifts
+        self.skills = scenario.skills
+        num_nurses, num_shifts = len(self.nurses), len(self.shifts)
+        weeks = [scenario.week_index[w] for w in self.week_ids]
+        self.num_days = 7 * len(weeks)
+
+        # Demand and requests over the horizon: (day, shift, skill), (nurse, day, shift)
+        self.minimum = np.concatenate([scenario.demand_minimum[w] for w in weeks]).astype(np.int64)
+        self.optimal = np.concatenate([scenario.demand_optimal[w] for w in weeks]).astype(np.int64)
+        self.shift_off = np.concatenate([scenario.shift_off[w] for w in weeks], axis=1)
+        self.nurse_skills = np.asarray(scenario.nurse_skills, dtype=bool)
+
+        config = scenario.config
+        shift_types = {s["id"]: s for s in config.get("shiftTypes", [])}
+        self.shift_min = np.array([shift_types[s].get("minimumNumberOfConsecutiveAssignments", 0)
+                                   for s in self.shifts])
+        self.shift_max = np.array([shift_types[s].get("maximumNumberOfConsecutiveAssignments", self.num_days)
+                                   for s in self.shifts])
+        # Forbidden successions, with an extra all-False row/column for OFF (-1)
+        self.forbidden = np.zeros((num_shifts + 1, num_shifts + 1), dtype=bool)
+        for rule in config.get("forbiddenShiftTypeSuccessions", []):
+            for shift in rule["succeedingShiftTypes"]:
+                self.forbidden[scenario.shift_index[rule["precedingShiftType"]], scenario.shift_index[shift]] = True
+
+        contracts = [scenario.contracts[n["contract"]] for n in config["nurses"]]
+
+        def contract_field(name: str, default: int = 0) -> np.ndarray:
+            return np.array([c.get(name, default) for c in contracts], dtype=np.int64)
+
+        self.assignments_min = contract_field("minimumNumberOfAssignments")
+        self.assignments_max = contract_field("maximumNumberOfAssignments", self.num_days)
+        self.work_min = contract_field("minimumNumberOfConsecutiveWorkingDays")
+        self.work_max = contract_field("maximumNumberOfConsecutiveWorkingDays", self.num_days)
+        self.off_min = contract_field("minimumNumberOfConsecutiveDaysOff")
+        self.off_max = contract_field("maximumNumberOfConsecutiveDaysOff", self.num_days)
+        self.weekends_max = contract_field("maximumNumberOfWorkingWeekends", len(weeks))
+        self.complete_weekends = contract_field("completeWeekends").astype(bool)
+        self.full_horizon = len(weeks) >= config.get("numberOfWeeks", len(weeks))
+
+        history = {h["nurse"]: h for h in scenario.history(history_id)["nurseHistory"]}
+        records = [history.get(n, {}) for n in self.nurses]
+        self.last_shift = np.array([scenario.shift_index.get(h.get("lastAssignedShiftType"), OFF)
+                                    for h in records], dtype=np.int64)
+        self.history_shift_run = np.array([h.get("numberOfConsecutiveAssignments", 0) for h in records])
+        self.history_work_run = np.array([h.get("numberOfConsecutiveWorkingDays", 0) for h in records])
+        self.history_off_run = np.array([h.get("numberOfConsecutiveDaysOff", 0) for h in records])
+        self.history_assignments = np.array([h.get("numberOfAssignments", 0) for h in records])
+        self.history_weekends = np.array([h.get("numberOfWorkingWeekends", 0) for h in records])
+
+        # Skill sets for the greedy allocation, least flexible first
+        skill_sets, self.skill_set_of = np.unique(self.nurse_skills, axis=0, return_inverse=True)
+        self.skill_set_of = self.skill_set_of.reshape(-1)
+        self.skill_sets = skill_sets
+        self.skill_set_order = np.argsort(skill_sets.sum(axis=1), kind="stable")
+        self.skill_order = np.argsort(self.nurse_skills.sum(axis=0), kind="stable")  # scarce skills first
+
+    def encode(self, weekly_assignments: List[List[Dict]]) -> Tuple[np.ndarray, Optional[np.ndarray], int]:
+        """
+        (shift codes, skill codes or None, duplicate count) from one list of
+        assignment dicts per week. Entries take "nurse", "day" (Monday-first
+        index or "Mon".."Sun"), "shift" or "shiftType" and optionally "skill".
+        """
+        codes = np.full((len(self.nurses), self.num_days), OFF, dtype=np.int8)
+        skills = np.full_like(codes, OFF)
+        has_skills = True
+        duplicates = 0
+        for week, assignments in enumerate(weekly_assignments):
+            for a in assignments:
+                i = self.scenario.nurse_index[a["nurse"]]
+                day = a["day"] if isinstance(a["day"], int) else SOLUTION_DAYS.index(a["day"][:3])
+                d = 7 * week + day
+                duplicates += int(codes[i, d] != OFF)
+                codes[i, d] = self.scenario.shift_index[a.get("shift", a.get("shiftType"))]
+                if a.get("skill") is None:
+                    has_skills = False
+                else:
+                    skills[i, d] = self.scenario.skill_index[a["skill"]]
+        return codes, skills if has_skills else None, duplicates
+
+    def allocate_skills(self, codes: np.ndarray) -> np.ndarray:
+        """
+        (..., day, shift, skill) staffing counts for rosters without skills:
+        every (day, shift) fills minimum then optimal demand, scarce skills
+        first, from the least flexible qualified nurses.
+        """
+        on = codes[..., None] == np.arange(len(self.shifts))  # (..., nurse, day, shift)
+        # Working nurses per skill set: (..., set, day, shift)
+        available = np.stack([on[..., self.skill_set_of == k, :, :].sum(axis=-3)
+                              for k in range(len(self.skill_sets))], axis=-3)
+        staffed = np.zeros(codes.shape[:-2] + self.minimum.shape, dtype=np.int64)
+        for level in (self.minimum, self.optimal):
+            for skill in self.skill_order:
+                need = np.maximum(level[:, :, skill] - staffed[..., skill], 0)
+                for k in self.skill_set_order:
+                    if not self.skill_sets[k, skill]:
+                        continue
+                    take = np.minimum(available[..., k, :, :], need)
+                    available[..., k, :, :] -= take
+                    staffed[..., skill] += take
+                    need = need - take
+        return staffed
+
+    def score_batch(self, codes: np.ndarray, skills: Optional[np.ndarray] = None,
+                    duplicates: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Score rosters (..., nurse, day). Returns per-roster "hard" and "soft"
+        violation counts by constraint, the weighted "penalty" (soft only)
+        and "feasible" (no hard violations).
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        working = codes != OFF
+        batch = codes.shape[:-2]
+        on = codes[..., None] == np.arange(len(self.shifts))  # (..., nurse, day, shift)
+        hard, soft = {}, {}
+
+        # Coverage
+        if skills is None:
+            staffed = self.allocate_skills(codes)
+            hard["missing_skill"] = np.zeros(batch, dtype=np.int64)
+        else:
+            skills = np.asarray(skills, dtype=np.int64)
+            on_skill = working[..., None] & (skills[..., None] == np.arange(len(self.skills)))
+            staffed = np.einsum("...nds,...ndk->...dsk", on.astype(np.int64), on_skill.astype(np.int64))
+            qualified = self.nurse_skills[np.arange(len(self.nurses))[:, None], np.maximum(skills, 0)]
+            hard["missing_skill"] = (working & ~qualified).sum(axis=(-2, -1))
+        hard["understaffing"] = np.maximum(self.minimum - staffed, 0).sum(axis=(-3, -2, -1))
+        soft["optimal_coverage"] = np.maximum(self.optimal - np.maximum(staffed, self.minimum), 0).sum(
+            axis=(-3, -2, -1))
+
+        # Successions, starting from the history's last shift
+        previous = np.broadcast_to(self.last_shift[:, None], batch + (len(self.nurses), 1))
+        sequence = np.concatenate([previous, codes], axis=-1)
+        hard["successions"] = self.forbidden[sequence[..., :-1], sequence[..., 1:]].sum(axis=(-2, -1))
+        hard["multiple_assignments"] = (np.zeros(batch, dtype=np.int64) if duplicates is None
+                                        else np.asarray(duplicates, dtype=np.int64))
+
+        # Consecutive runs: per shift type, working days, days off
+        soft["consecutive_shift"] = sum(
+            _runs(codes == s, np.where(self.last_shift == s, self.history_shift_run, 0),
+                  self.shift_min[s], self.shift_max[s]).sum(axis=-1)
+            for s in range(len(self.shifts))
+        )
+        soft["consecutive_work"] = _runs(working, self.history_work_run, self.work_min, self.work_max).sum(axis=-1)
+        soft["consecutive_off"] = _runs(~working, self.history_off_run, self.off_min, self.off_max).sum(axis=-1)
+
+        # Shift-off requests
+        soft["preferences"] = (on & self.shift_off).sum(axis=(-3, -2, -1))
+
+        # Weekends
+        weekend = working.reshape(batch + (len(self.nurses), -1, 7))[..., list(WEEKEND_DAYS)]
+        worked_days = weekend.sum(axis=-1)  # (..., nurse, week)
+        soft["complete_weekends"] = ((worked_days == 1) & self.complete_weekends[:, None]).sum(axis=(-2, -1))
+
+        # Horizon totals
+        if self.full_horizon:
+            total = self.history_assignments + working.sum(axis=-1)
+            soft["total_assignments"] = (np.maximum(self.assignments_min - total, 0)
+                                         + np.maximum(total - self.assignments_max, 0)).sum(axis=-1)
+            weekends = self.history_weekends + (worked_days > 0).sum(axis=-1)
+            soft["working_weekends"] = np.maximum(weekends - self.weekends_max, 0).sum(axis=-1)
+        else:
+            soft["total_assignments"] = np.zeros(batch, dtype=np.int64)
+            soft["working_weekends"] = np.zeros(batch, dtype=np.int64)
+
+        penalty = sum(SOFT_WEIGHTS[name] * soft[name] for name in SOFT_WEIGHTS)
+        feasible = sum(hard[name] for name in HARD_CONSTRAINTS) == 0
+        return {"hard": hard, "soft": soft, "penalty": penalty, "feasible": feasible}
+
+    def score(self, weekly_assignments: List[List[Dict]]) -> Dict:
+        """Score one roster given as weekly assignment lists; plain ints, penalty and feasibility."""
+        codes, skills, duplicates = self.encode(weekly_assignments)
+        result = self.score_batch(codes, skills, duplicates)
+        return {
+            "penalty": int(result["penalty"]),
+            "feasible": bool(result["feasible"]),
+            "hard": {k: int(v) for k, v in result["hard"].items()},
+            "soft": {k: int(v) for k, v in result["soft"].items()},
+            "weighted": {k: int(SOFT_WEIGHTS[k] * result["soft"][k]) for k in SOFT_WEIGHTS},
+        }
+
+
+def read_solution_folder(path: str, scenario_id: str) -> Tuple[str, List[str], List[List[Dict]]]:
+    """
+    (history id, week ids, weekly assignments) of a Solution_H_<h>-WD_<a-b-...>
+    folder of INRC-II Sol-<scenario>-<wd>-<week>.json files.
+    """
+    history_part, weeks_part = os.path.basename(os.path.normpath(path))[len("Solution_H_"):].split("-WD_")
+    week_ids = weeks_part.split("-")
+    weekly_assignments = []
+    for week_index, wd in enumerate(week_ids):
+        with open(os.path.join(path, f"Sol-{scenario_id}-{wd}-{week_index}.json"), "r") as f:
+            weekly_assignments.append(json.load(f)["assignments"])
+    return history_part, [f"{scenario_id}-{wd}" for wd in week_ids], weekly_assignments
+
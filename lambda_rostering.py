@@ -10,7 +10,17 @@ Expected event JSON:
     ...
   ],
   "N": 4,           # nurses required per day
-  "max_seconds": 20 # optional solver time limit
+  "demand": [[2, 2], ...],  # optional 7 x 2 (day, night) demand, Sunday first; replaces N
+  "demand_optimal": [[3, 2], ...],  # optional 7 x 2 optimal staffing (soft, above demand)
+  "forecast": {"weeks_ahead": 1},  # optional: demand from demand_forecast, N as base
+  "max_seconds": 20, # optional solver time limit
+  "mode": "fast"    # optional: greedy roster in milliseconds, no CP-SAT solve
+}
+
+Repair an existing roster after leave approval or a demand change (no full re-solve):
+{
+  "nurse_profiles": [...], "N": 4,
+  "repair": {"roster": {...}, "unavailable": {"n001": [2, 3]}, "max_seconds": 1.0}
 }
 
 Output JSON (returned by handler):
@@ -22,171 +32,781 @@ Output JSON (returned by handler):
 
 from ortools.sat.python import cp_model
 import json
-from typing import List, Dict
-
-DAYS = list(range(7))
-DAY_NAMES = [
-    "Sunday",
-    "Monday",
-    "Tuesday",
-    "Wednesday",
-    "Thursday",
-    "Friday",
-    "Saturday",
-]
-
-# Model choices: day = 8h, night = 12h (allows combos to meet 40-45 & 4-5 shifts)
-SHIFTS = ["day", "night"]
-SHIFT_HOURS = {"day": 8, "night": 12}
-
-# Hard constraint bounds
-MIN_WEEK_HOURS = 40
-MAX_WEEK_HOURS = 45
-MIN_SHIFTS_PER_WEEK = 4
-MAX_SHIFTS_PER_WEEK = 5
-
-# Soft constraint weights (tune these)
-PENALTY_DAYOFF = 100  # large penalty for assigning on preferred day off
-REWARD_PREF_SHIFT = -10  # reward (negative penalty) for assigning preferred shift type
-PENALTY_UNASSIGNED = 200  # penalty if demand cannot be met (slack)
-
-
-def build_and_solve(nurse_profiles: List[Dict], N: int, time_limit: int = 20):
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from demand_forecast import DEFAULT_DATA_PATH, forecast_demand
+from greedy_roster import construct_roster
+from lns import improve_roster
+from roster_cache import RosterCache, canonical_key
+from roster_rules import (
+    DAY,
+    DAY_NAMES,
+    DAYS,
+    MAX_SHIFTS_PER_WEEK,
+    MAX_WEEK_HOURS,
+    MIN_SHIFTS_PER_WEEK,
+    MIN_WEEK_HOURS,
+    NIGHT,
+    PENALTY_BELOW_OPTIMAL,
+    PENALTY_UNASSIGNED,
+    ROSTER_KEYS,
+    SHIFT_HOURS,
+    SHIFT_HOURS_ARRAY,
+    SHIFTS,
+    assignment_costs,
+    demand_matrix,
+    optimal_matrix,
+    roster_to_array,
+)
+from shift_automaton import SequenceRules, add_sequence_constraint
+from solver_config import SolverConfig, SolverProfiles, available_cpus
+from solver_progress import JsonLinesSink, SolverInstrumentation
+from symmetry import add_lex_ordering, equivalence_classes, sort_rows
+
+# Early-stop policy for handler events without "early_stop": stop once the
+# roster is within 1% of the bound or has not improved for 3 seconds
+DEFAULT_EARLY_STOP = {"relative_gap": 0.01, "stagnation_seconds": 3.0, "target_objective": None}
+
+# Tuned per-ward-size solver profiles (tuning.py); unset = default settings
+SOLVER_PROFILES_PATH = os.environ.get("ROSTER_SOLVER_PROFILES")
+
+# Hard shift sequences: no night -> day on the next day (no quick turnaround)
+SEQUENCE_RULES = SequenceRules(SHIFTS, {"night": ["day"]})
+
+PENALTY_CHANGE = 50  # per assignment changed by repair_roster (below PENALTY_UNASSIGNED)
+
+# Roster repair: the local neighbourhood is re-solved first, the whole week only if needed
+REPAIR_TIME_LIMIT = 1.0  # seconds per repair solve
+REPAIR_DAY_MARGIN = 1  # days either side of an affected day that are also freed
+
+
+def build_model(
+    nurse_profiles: List[Dict],
+    N: Optional[int] = None,
+    demand=None,
+    demand_optimal=None,
+    unavailable: Optional[Dict[str, List[int]]] = None,
+    break_symmetry: bool = False,
+) -> Dict:
     """
-    Build CP model and solve. Returns roster mapping day->shifts->list of nurse_ids.
+    Build the CP model with variables held in a (nurse x day x shift) index tensor.
+    Constraints are emitted over array slices with LinearExpr.Sum/WeightedSum
+    instead of per-tuple dict lookups and nested generator sums.
+    Staffing demand is `demand` if given, else N split per day (see demand_matrix).
+    `demand_optimal` adds a softer optimal level on top (see optimal_matrix).
+    Slack variables exist only for cells with positive demand.
+    `unavailable` maps nurse_id -> days off (e.g. approved leave): those days
+    are forced off and each lowers the nurse's weekly minimums by one day shift.
+    With break_symmetry, nurses with identical preferences and unavailable
+    days get lexicographically ordered rows (see symmetry.add_lex_ordering).
     """
     # Preprocess nurses
     nurses = [n["nurse_id"] for n in nurse_profiles]
-    pref_days_off = {
-        n["nurse_id"]: set(n.get("preferred_days_off", [])) for n in nurse_profiles
-    }
-    pref_shift = {
-        n["nurse_id"]: int(n.get("preferred_shift_type", 0)) for n in nurse_profiles
-    }
+    num_nurses = len(nurses)
+    pref_days_off = np.zeros((num_nurses, len(DAYS)), dtype=bool)
+    pref_shift = np.zeros(num_nurses, dtype=np.int64)
+    for i, n in enumerate(nurse_profiles):
+        days_off = [d for d in n.get("preferred_days_off", []) if d in DAYS]
+        pref_days_off[i, days_off] = True
+        pref_shift[i] = int(n.get("preferred_shift_type", 0))
+    leave = np.zeros((num_nurses, len(DAYS)), dtype=bool)
+    for i, nid in enumerate(nurses):
+        leave[i, [d for d in (unavailable or {}).get(nid, []) if d in DAYS]] = True
 
-    # Demand per day: split N equally between day and night
-    night_req = N // 2
-    day_req = N - night_req  # day gets extra if N odd
+    demand = demand_matrix(N, demand)
+    optimal = optimal_matrix(demand, demand_optimal)
 
     # Model
     model = cp_model.CpModel()
 
-    # Decision variables: assign[(nurse, day, shift)]
-    assign = {}
-    for nid in nurses:
+    # Decision variables: x[nurse, day, shift]
+    x = np.empty((num_nurses, len(DAYS), len(SHIFTS)), dtype=object)
+    for i, nid in enumerate(nurses):
         for d in DAYS:
-            for s in SHIFTS:
-                assign[(nid, d, s)] = model.NewBoolVar(f"x_{nid}_{d}_{s}")
+            for s, shift in enumerate(SHIFTS):
+                x[i, d, s] = model.NewBoolVar(f"x_{nid}_{d}_{shift}")
+
+    hours_per_slot = np.tile(SHIFT_HOURS_ARRAY, len(DAYS))
+    for i in range(num_nurses):
+        row = x[i].ravel().tolist()
 
-    # Hard: at most one shift per nurse per day
-    for nid in nurses:
+        # Hard: at most one shift per nurse per day
         for d in DAYS:
-            model.Add(sum(assign[(nid, d, s)] for s in SHIFTS) <= 1)
+            model.AddAtMostOne(x[i, d].tolist())
 
-    # Hard: weekly hours between MIN_WEEK_HOURS and MAX_WEEK_HOURS
-    nurse_hours = {}
-    for nid in nurses:
-        total_hours_expr = sum(
-            assign[(nid, d, s)] * SHIFT_HOURS[s] for d in DAYS for s in SHIFTS
+        # Hard: no shifts on unavailable days, which count towards the minimums
+        leave_days = int(leave[i].sum())
+        for d in np.flatnonzero(leave[i]):
+            for var in x[i, d]:
+                model.Add(var == 0)
+
+        # Hard: weekly hours between MIN_WEEK_HOURS and MAX_WEEK_HOURS
+        model.AddLinearConstraint(
+            cp_model.LinearExpr.WeightedSum(row, hours_per_slot.tolist()),
+            max(0, MIN_WEEK_HOURS - leave_days * SHIFT_HOURS["day"]),
+            MAX_WEEK_HOURS,
         )
-        # integer variable to track hours
-        hvar = model.NewIntVar(0, MAX_WEEK_HOURS, f"hours_{nid}")
-        model.Add(hvar == total_hours_expr)
-        model.Add(hvar >= MIN_WEEK_HOURS)
-        model.Add(hvar <= MAX_WEEK_HOURS)
-        nurse_hours[nid] = hvar
-
-    # Hard: number of shifts per nurse between MIN_SHIFTS_PER_WEEK and MAX_SHIFTS_PER_WEEK
-    for nid in nurses:
-        total_shifts_expr = sum(assign[(nid, d, s)] for d in DAYS for s in SHIFTS)
-        s_var = model.NewIntVar(0, MAX_SHIFTS_PER_WEEK, f"shifts_{nid}")
-        model.Add(s_var == total_shifts_expr)
-        model.Add(s_var >= MIN_SHIFTS_PER_WEEK)
-        model.Add(s_var <= MAX_SHIFTS_PER_WEEK)
-
-    # Hard: forbid night -> day on next day (no quick turnaround)
-    # If nurse works night on day d, cannot work day on day d+1
-    for nid in nurses:
-        for d in range(6):
-            model.Add(assign[(nid, d, "night")] + assign[(nid, d + 1, "day")] <= 1)
-
-    # Staffing demand per day/shift (hard as possible; allow slack with heavy penalty)
-    # Create slack vars if exact coverage impossible
-    slack_vars = {}
-    for d in DAYS:
-        # day
-        day_quals = [assign[(n, d, "day")] for n in nurses]
-        slack_day = model.NewIntVar(0, len(nurses), f"slack_day_{d}")
-        slack_vars[("day", d)] = slack_day
-        model.Add(sum(day_quals) + slack_day >= day_req)
-
-        # night
-        night_quals = [assign[(n, d, "night")] for n in nurses]
-        slack_night = model.NewIntVar(0, len(nurses), f"slack_night_{d}")
-        slack_vars[("night", d)] = slack_night
-        model.Add(sum(night_quals) + slack_night >= night_req)
-
-    # Objective: minimize penalties (day-off violations, slack, prefer shift types)
-    obj_terms = []
-
-    # Penalty for assigning on preferred days off
-    for nid in nurses:
-        for d in DAYS:
-            if d in pref_days_off.get(nid, set()):
-                for s in SHIFTS:
-                    obj_terms.append(assign[(nid, d, s)] * PENALTY_DAYOFF)
 
-    # Reward for assigning preferred shift type
-    for nid in nurses:
-        preferred = pref_shift.get(nid, 0)  # 0=day,1=night
-        for d in DAYS:
-            if preferred == 0:
-                obj_terms.append(assign[(nid, d, "day")] * REWARD_PREF_SHIFT)
-            else:
-                obj_terms.append(assign[(nid, d, "night")] * REWARD_PREF_SHIFT)
+        # Hard: number of shifts per nurse between MIN_SHIFTS_PER_WEEK and MAX_SHIFTS_PER_WEEK
+        model.AddLinearConstraint(
+            cp_model.LinearExpr.Sum(row),
+            max(0, MIN_SHIFTS_PER_WEEK - leave_days),
+            MAX_SHIFTS_PER_WEEK,
+        )
 
-    # Penalize slack heavily (uncovered positions)
-    for key, sval in slack_vars.items():
-        obj_terms.append(sval * PENALTY_UNASSIGNED)
+        # Hard: SEQUENCE_RULES over the week, one automaton per nurse
+        add_sequence_constraint(model, SEQUENCE_RULES, x[i].tolist(), name=f"sequence_{nurses[i]}")
 
-    model.Minimize(sum(obj_terms))
+    # Symmetry: interchangeable nurses only differ by a permutation of rows
+    classes = []
+    if break_symmetry:
+        classes = equivalence_classes(
+            [
+                (pref_days_off[i].tobytes(), int(pref_shift[i]), leave[i].tobytes())
+                for i in range(num_nurses)
+            ]
+        )
+        add_lex_ordering(model, [x[i].ravel().tolist() for i in range(num_nurses)], classes)
 
-    # Solve
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = max(1, int(time_limit))
-    solver.parameters.num_search_workers = 8
+    # Staffing demand per day/shift (hard as possible; allow slack with heavy penalty).
+    # Cells without demand get no slack and no constraint; slack_optimal covers
+    # the gap between minimum and optimal at the lighter penalty.
+    slack = np.full((len(DAYS), len(SHIFTS)), None, dtype=object)
+    slack_optimal = np.full((len(DAYS), len(SHIFTS)), None, dtype=object)
+    for d, s in zip(*np.nonzero(optimal)):
+        shift = SHIFTS[s]
+        covered = cp_model.LinearExpr.Sum(x[:, d, s].tolist())
+        if demand[d, s] > 0:
+            slack[d, s] = model.NewIntVar(0, int(demand[d, s]), f"slack_{shift}_{d}")
+            covered = covered + slack[d, s]
+            model.Add(covered >= int(demand[d, s]))
+        if optimal[d, s] > demand[d, s]:
+            slack_optimal[d, s] = model.NewIntVar(
+                0, int(optimal[d, s] - demand[d, s]), f"slack_optimal_{shift}_{d}"
+            )
+            model.Add(covered + slack_optimal[d, s] >= int(optimal[d, s]))
+
+    # Objective: minimize penalties (day-off violations, slack, prefer shift types).
+    # The per-assignment terms are folded into one cost tensor, so the objective
+    # is a single WeightedSum over the assignments with a nonzero cost and the slacks
+    cost = assignment_costs(pref_days_off, np.where(pref_shift == 0, DAY, NIGHT))
+    costed = np.nonzero(cost)
+    obj_vars = x[costed].tolist()
+    obj_coeffs = cost[costed].tolist()
+
+    # Penalize slack heavily (uncovered positions), optimal shortfall lightly
+    for variables, penalty in ((slack, PENALTY_UNASSIGNED), (slack_optimal, PENALTY_BELOW_OPTIMAL)):
+        slack_list = [v for v in variables.ravel() if v is not None]
+        obj_vars += slack_list
+        obj_coeffs += [penalty] * len(slack_list)
+
+    objective = cp_model.LinearExpr.WeightedSum(obj_vars, obj_coeffs)
+    model.Minimize(objective)
+
+    return {
+        "model": model,
+        "objective": objective,
+        "x": x,
+        "slack": slack,
+        "slack_optimal": slack_optimal,
+        "nurses": nurses,
+        "demand": demand,
+        "optimal": optimal,
+        "symmetry_classes": classes,
+    }
+
+
+def add_roster_hint(built: Dict, roster: Dict):
+    """
+    Seed AddHint on the assignment tensor from an existing roster
+    (day_name -> {day_shift: [...], night_shift: [...]}). Nurses that do not
+    appear anywhere in the roster are left unhinted. Rows of interchangeable
+    nurses are permuted into the model's symmetry-breaking order first.
+    """
+    hinted = roster_to_array(roster, built["nurses"])
+    order = sort_rows(hinted, built["symmetry_classes"])
+    hinted = hinted[order]
+    known = hinted.any(axis=(1, 2))
+
+    model, x = built["model"], built["x"]
+    for i in np.flatnonzero(known):
+        for var, value in zip(x[i].ravel(), hinted[i].ravel()):
+            model.AddHint(var, bool(value))
+
+
+def build_and_solve(
+    nurse_profiles: List[Dict],
+    N: Optional[int] = None,
+    time_limit: int = 20,
+    hint_roster: Optional[Dict] = None,
+    num_workers: Optional[int] = None,
+    instrumentation: Optional[SolverInstrumentation] = None,
+    early_stop: Optional[Dict] = None,
+    lns_seconds: float = 0,
+    demand=None,
+    demand_optimal=None,
+    break_symmetry: bool = False,
+    greedy_hint: bool = True,
+    solver_config: Optional[SolverConfig] = None,
+    solver_profiles: Optional[SolverProfiles] = None,
+):
+    """
+    Build CP model and solve. Returns roster mapping day->shifts->list of nurse_ids.
+    If hint_roster is given, it is used as the solver's starting point;
+    otherwise, with greedy_hint, the greedy_roster.construct_roster roster is.
+    Phase timings, model size and the incumbent timeline are emitted as
+    structured records through `instrumentation`. `early_stop` is a policy
+    dict (relative_gap, stagnation_seconds, target_objective) ending the
+    search before time_limit; the result's "stop_reason" says which rule fired.
+    With lns_seconds > 0, the CP-SAT roster is then improved by adaptive large
+    neighbourhood search (lns.improve_roster) for up to that many seconds.
+    `demand` is a per-day, per-shift matrix used instead of splitting N;
+    `demand_optimal` is an optional optimal level above it, whose shortfall is
+    reported under "below_optimal" and penalised by PENALTY_BELOW_OPTIMAL.
+    break_symmetry lex-orders nurses with identical profiles (see build_model).
+    `solver_config` sets search workers, subsolvers and seeds (see
+    solver_config.py; default: a portfolio over the available CPUs);
+    num_workers overrides its worker count. Without a solver_config,
+    `solver_profiles` supplies the tuned settings for the ward's size, and
+    its tuned time limit caps time_limit.
+    """
+    instrumentation = instrumentation or SolverInstrumentation()
+    if solver_config is None and solver_profiles is not None:
+        solver_config = solver_profiles.config(len(nurse_profiles))
+        tuned_limit = solver_profiles.time_limit(len(nurse_profiles))
+        if tuned_limit:
+            time_limit = min(time_limit, tuned_limit)
+    solver_config = solver_config or SolverConfig()
+    if num_workers:
+        solver_config = solver_config.with_workers(num_workers)
 
-    status = solver.Solve(model)
+    build_start = time.perf_counter()
+    built = build_model(
+        nurse_profiles, N, demand, demand_optimal, break_symmetry=break_symmetry
+    )
+    if hint_roster:
+        add_roster_hint(built, hint_roster)
+    elif greedy_hint:
+        with instrumentation.phase("greedy"):
+            seed = construct_roster(nurse_profiles, N, demand, demand_optimal)
+        add_roster_hint(built, seed["roster"])
+    build_time = time.perf_counter() - build_start
+    instrumentation.emit("phase", phase="build", seconds=build_time)
+
+    model, x, nurses = built["model"], built["x"], built["nurses"]
+    instrumentation.model_stats(model, nurses=len(nurses))
+
+    # Solve
+    recorder = instrumentation.recorder(early_stop=early_stop)
+    solve_start = time.perf_counter()
+    with recorder.watching():
+        solver, status = solver_config.solve(model, max(1, int(time_limit)), recorder)
+    solve_time = time.perf_counter() - solve_start
+    stop_reason = recorder.final_stop_reason(status)
+    instrumentation.emit("phase", phase="solve", seconds=solve_time)
+    instrumentation.solve_summary(solver, status, stop_reason=stop_reason)
 
     if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
         return {
             "error": "No feasible solution found",
             "status": solver.StatusName(status),
+            "stop_reason": stop_reason,
+            "build_time": build_time,
+            "solve_time": solve_time,
         }
 
-    # Build roster output: day_name -> {day_shift: [...], night_shift: [...]}
-    roster = {DAY_NAMES[d]: {"day_shift": [], "night_shift": []} for d in DAYS}
+    # Read the assignment tensor back in one pass
+    values = np.array([solver.BooleanValue(v) for v in x.ravel()], dtype=bool).reshape(
+        x.shape
+    )
+    objective = solver.ObjectiveValue()
+    incumbents = list(recorder.incumbents)
+
+    lns = None
+    if lns_seconds > 0 and status != cp_model.OPTIMAL:
+        lns_start = time.perf_counter()
+        keys = [(nurses[i], d, SHIFTS[s]) for i, d, s in np.ndindex(x.shape)]
+        lns = improve_roster(
+            model,
+            dict(zip(keys, x.ravel())),
+            dict(zip(keys, values.ravel().tolist())),
+            objective,
+            lns_seconds,
+            solver_config=solver_config,
+            instrumentation=instrumentation,
+        )
+        values = np.array([lns["assignment"][k] for k in keys], dtype=bool).reshape(x.shape)
+        objective = lns["objective"]
+        incumbents += [
+            dict(inc, wall_time=inc["wall_time"] + solve_time) for inc in lns["incumbents"]
+        ]
+        solve_time += time.perf_counter() - lns_start
+        instrumentation.emit("phase", phase="lns", seconds=lns["lns_time"])
+
+    extract_start = time.perf_counter()
 
-    for d in DAYS:
-        for nid in nurses:
-            if solver.BooleanValue(assign[(nid, d, "day")]):
-                roster[DAY_NAMES[d]]["day_shift"].append(nid)
-            if solver.BooleanValue(assign[(nid, d, "night")]):
-                roster[DAY_NAMES[d]]["night_shift"].append(nid)
+    # Build roster output: day_name -> {day_shift: [...], night_shift: [...]}
+    roster = {
+        DAY_NAMES[d]: {
+            key: [nurses[i] for i in np.flatnonzero(values[:, d, s])]
+            for s, key in enumerate(ROSTER_KEYS)
+        }
+        for d in DAYS
+    }
 
     # Provide some diagnostics
-    nurse_hours_out = {nid: int(solver.Value(nurse_hours[nid])) for nid in nurses}
-    slack_out = {f"{k[0]}_{k[1]}": int(solver.Value(v)) for k, v in slack_vars.items()}
+    hours = values.reshape(len(nurses), -1) @ np.tile(SHIFT_HOURS_ARRAY, len(DAYS))
+    nurse_hours_out = {nid: int(h) for nid, h in zip(nurses, hours)}
+    # Uncovered positions; equal to the slack variables at any optimum of slack
+    coverage = values.sum(axis=0)
+    shortfall = np.maximum(built["demand"] - coverage, 0)
+    slack_out = {
+        f"{shift}_{d}": int(shortfall[d, s]) for s, shift in enumerate(SHIFTS) for d in DAYS
+    }
+    below_optimal = np.maximum(built["optimal"] - np.maximum(coverage, built["demand"]), 0)
+    instrumentation.emit("phase", phase="extract", seconds=time.perf_counter() - extract_start)
 
     return {
         "roster": roster,
         "nurse_hours": nurse_hours_out,
         "slack": slack_out,
-        "objective": solver.ObjectiveValue(),
+        **(
+            {
+                "below_optimal": {
+                    f"{shift}_{d}": int(below_optimal[d, s])
+                    for s, shift in enumerate(SHIFTS)
+                    for d in DAYS
+                }
+            }
+            if demand_optimal is not None
+            else {}
+        ),
+        "objective": objective,
+        "best_bound": solver.BestObjectiveBound(),
         "status": solver.StatusName(status),
+        "stop_reason": stop_reason,
+        "build_time": build_time,
+        "solve_time": solve_time,
+        "incumbents": incumbents,
+        **({"lns_iterations": lns["iterations"]} if lns else {}),
+    }
+
+
+def roster_diff(before: np.ndarray, after: np.ndarray, nurses: List[str]) -> List[Dict]:
+    """Changed (nurse, day) cells as {nurse_id, day, from, to}; from/to is a roster key or None."""
+    diff = []
+    for i, d in zip(*np.nonzero((before != after).any(axis=2))):
+        shift_from, shift_to = np.flatnonzero(before[i, d]), np.flatnonzero(after[i, d])
+        diff.append(
+            {
+                "nurse_id": nurses[i],
+                "day": DAY_NAMES[d],
+                "from": ROSTER_KEYS[shift_from[0]] if len(shift_from) else None,
+                "to": ROSTER_KEYS[shift_to[0]] if len(shift_to) else None,
+            }
+        )
+    return diff
+
+
+def repair_roster(
+    nurse_profiles: List[Dict],
+    roster: Dict,
+    N: Optional[int] = None,
+    demand=None,
+    demand_optimal=None,
+    unavailable: Optional[Dict[str, List[int]]] = None,
+    time_limit: float = REPAIR_TIME_LIMIT,
+    num_workers: Optional[int] = None,
+    instrumentation: Optional[SolverInstrumentation] = None,
+    solver_config: Optional[SolverConfig] = None,
+):
+    """
+    Re-roster after a change instead of solving the week from scratch.
+    `roster` is the current roster (as returned by build_and_solve); the delta
+    is `unavailable` (nurse_id -> days, e.g. approved leave) and/or a new N /
+    demand. Affected cells are the unavailable nurses' days plus every day
+    whose coverage is now below demand.
+
+    The "local" scope frees the unavailable nurses and every nurse on the
+    affected days (+/- REPAIR_DAY_MARGIN) and pins all other assignments. If
+    that is infeasible or leaves demand uncovered, the whole week is freed
+    ("full" scope). Both add PENALTY_CHANGE per changed assignment to the
+    usual objective, so the result is the closest good roster. Returns the
+    roster, its diff against the input and the scope used. `solver_config`
+    and num_workers are as in build_and_solve.
+    """
+    instrumentation = instrumentation or SolverInstrumentation()
+    solver_config = solver_config or SolverConfig()
+    if num_workers:
+        solver_config = solver_config.with_workers(num_workers)
+    start = time.perf_counter()
+
+    build_start = time.perf_counter()
+    # The change penalty tells nurses apart, so no symmetry breaking here
+    built = build_model(nurse_profiles, N, demand, demand_optimal, unavailable)
+    nurses, x = built["nurses"], built["x"]
+    before = roster_to_array(roster, nurses)
+    add_roster_hint(built, roster)
+    instrumentation.emit("phase", phase="build", seconds=time.perf_counter() - build_start)
+
+    # Affected cells: leave days and days now short of demand
+    leave = np.zeros((len(nurses), len(DAYS)), dtype=bool)
+    for i, nid in enumerate(nurses):
+        leave[i, [d for d in (unavailable or {}).get(nid, []) if d in DAYS]] = True
+    short_days = (before.sum(axis=0) < built["demand"]).any(axis=1)
+    affected_days = leave.any(axis=0) | short_days
+    window = affected_days.copy()
+    for shift in range(1, REPAIR_DAY_MARGIN + 1):
+        window[:-shift] |= affected_days[shift:]
+        window[shift:] |= affected_days[:-shift]
+    local_free = np.zeros(before.shape, dtype=bool)
+    local_free[leave.any(axis=1)] = True
+    local_free[:, window] = True
+
+    # Hamming distance to the input roster over the assignment tensor
+    flat_x, flat_before = x.ravel().tolist(), before.ravel().tolist()
+    changes = [1 - var if was else var for var, was in zip(flat_x, flat_before)]
+    change_weights = [PENALTY_CHANGE] * len(changes)
+
+    best = None
+    scopes = [("local", local_free), ("full", np.ones(before.shape, dtype=bool))]
+    if local_free.all() or not affected_days.any():
+        scopes = scopes[1:]
+    for scope, free in scopes:
+        remaining = time_limit - (time.perf_counter() - start)
+        if best is not None and remaining <= 0.05:
+            break
+        model = built["model"].Clone()
+        for var, was, is_free in zip(flat_x, flat_before, free.ravel().tolist()):
+            if not is_free:
+                model.Add(model.GetBoolVarFromProtoIndex(var.Index()) == int(was))
+        model.Minimize(
+            built["objective"] + cp_model.LinearExpr.WeightedSum(changes, change_weights)
+        )
+
+        with instrumentation.phase("solve", scope=scope):
+            solver, status = solver_config.solve(model, max(0.05, remaining))
+        instrumentation.solve_summary(solver, status, scope=scope)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            continue
+
+        after = np.array([solver.BooleanValue(v) for v in flat_x], dtype=bool).reshape(x.shape)
+        uncovered = int(np.maximum(built["demand"] - after.sum(axis=0), 0).sum())
+        if best is None or solver.ObjectiveValue() < best["objective"]:
+            best = {
+                "scope": scope,
+                "values": after,
+                "objective": solver.ObjectiveValue(),
+                "status": solver.StatusName(status),
+                "uncovered": uncovered,
+            }
+        if uncovered == 0:
+            break
+
+    repair_time = time.perf_counter() - start
+    if best is None:
+        instrumentation.emit("repair", scope=None, changes=None, seconds=repair_time)
+        return {"error": "No feasible repair found", "repair_time": repair_time}
+
+    values = best["values"]
+    diff = roster_diff(before, values, nurses)
+    instrumentation.emit(
+        "repair",
+        scope=best["scope"],
+        changes=len(diff),
+        uncovered=best["uncovered"],
+        seconds=repair_time,
+    )
+    shortfall = np.maximum(built["demand"] - values.sum(axis=0), 0)
+    hours = values.reshape(len(nurses), -1) @ np.tile(SHIFT_HOURS_ARRAY, len(DAYS))
+    return {
+        "roster": {
+            DAY_NAMES[d]: {
+                key: [nurses[i] for i in np.flatnonzero(values[:, d, s])]
+                for s, key in enumerate(ROSTER_KEYS)
+            }
+            for d in DAYS
+        },
+        "diff": diff,
+        "changes": len(diff),
+        "scope": best["scope"],
+        "nurse_hours": {nid: int(h) for nid, h in zip(nurses, hours)},
+        "slack": {
+            f"{shift}_{d}": int(shortfall[d, s]) for s, shift in enumerate(SHIFTS) for d in DAYS
+        },
+        "objective": best["objective"],
+        "status": best["status"],
+        "repair_time": repair_time,
+    }
+
+
+_roster_cache = None
+
+
+def get_roster_cache() -> RosterCache:
+    """Open the solution cache once per container and reuse it across invocations."""
+    global _roster_cache
+    if _roster_cache is None:
+        _roster_cache = RosterCache()
+    return _roster_cache
+
+
+_solver_profiles = None
+
+
+def get_solver_profiles() -> Optional[SolverProfiles]:
+    """Load the SOLVER_PROFILES_PATH profiles once per container; None if unset."""
+    global _solver_profiles
+    if _solver_profiles is None and SOLVER_PROFILES_PATH:
+        _solver_profiles = SolverProfiles.load(SOLVER_PROFILES_PATH)
+    return _solver_profiles
+
+
+def cached_build_and_solve(
+    nurse_profiles: List[Dict], N: Optional[int] = None, time_limit: int = 20, **solve_options
+):
+    """
+    build_and_solve behind the persistent solution cache. Exact matches of the
+    inputs and solve options with a cached OPTIMAL roster are returned without
+    solving; otherwise the closest cached roster seeds the solver hints. The
+    result's "cache" field is "hit", "warm_start" or "miss".
+    Remaining keyword arguments are passed through to build_and_solve.
+    """
+    cache = get_roster_cache()
+    demand = solve_options.get("demand")
+    demand_key = N if demand is None else demand_matrix(demand=demand).tolist()
+    if solve_options.get("demand_optimal") is not None:
+        minimum = demand_matrix(N, demand)
+        demand_key = {
+            "minimum": minimum.tolist(),
+            "optimal": optimal_matrix(minimum, solve_options["demand_optimal"]).tolist(),
+        }
+    solver_config = solve_options.get("solver_config")
+    solver_profiles = solve_options.get("solver_profiles")
+    options = {
+        "time_limit": time_limit,
+        "lns_seconds": solve_options.get("lns_seconds", 0),
+        "break_symmetry": bool(solve_options.get("break_symmetry", False)),
+        "early_stop": solve_options.get("early_stop"),
+        "num_workers": solve_options.get("num_workers"),
+        "solver": solver_config.as_dict() if solver_config is not None else None,
+        "solver_profile": (
+            solver_profiles.profile(len(nurse_profiles)) if solver_profiles is not None else None
+        ),
+    }
+    key = canonical_key(nurse_profiles, demand_key, options)
+    cached = cache.get(key)
+    if cached is not None:
+        cached["cache"] = "hit"
+        return cached
+
+    nurse_ids = [n["nurse_id"] for n in nurse_profiles]
+    nearest = cache.nearest(nurse_ids)
+    result = build_and_solve(
+        nurse_profiles,
+        N,
+        time_limit=time_limit,
+        hint_roster=nearest["roster"] if nearest else None,
+        **solve_options,
+    )
+    if "error" not in result:
+        cache.put(key, nurse_ids, result)
+    result["cache"] = "warm_start" if nearest else "miss"
+    return result
+
+
+def _solve_ward(
+    ward: Dict,
+    num_workers: int,
+    default_time_limit: int,
+    use_cache: bool,
+    default_early_stop: Optional[Dict] = None,
+    default_solver: Optional[Dict] = None,
+    default_telemetry: bool = True,
+):
+    """Solve one ward of a batch event; runs inside a pool worker process."""
+    start = time.perf_counter()
+    try:
+        nurse_profiles = ward["nurse_profiles"]
+        N = int(ward["N"]) if ward.get("N") is not None else None
+        demand = (
+            demand_matrix(demand=ward["demand"]).tolist()
+            if ward.get("demand") is not None
+            else None
+        )
+        if N is None and demand is None:
+            raise KeyError("N or demand")
+        demand_optimal = (
+            demand_matrix(demand=ward["demand_optimal"]).tolist()
+            if ward.get("demand_optimal") is not None
+            else None
+        )
+        time_limit = int(ward.get("max_seconds") or default_time_limit)
+        early_stop = ward.get("early_stop", default_early_stop)
+        lns_seconds = float(ward.get("lns_seconds") or 0)
+        break_symmetry = bool(ward.get("break_symmetry", False))
+        greedy_hint = bool(ward.get("greedy_hint", True))
+        mode = str(ward.get("mode") or "solve")
+        solver = ward.get("solver", default_solver)
+        solver_config = SolverConfig.from_dict(solver) if solver is not None else None
+        telemetry = bool(ward.get("telemetry", default_telemetry))
+    except Exception as e:
+        result = {"error": f"Invalid ward format: {e}"}
+    else:
+        instrumentation = SolverInstrumentation(
+            sink=JsonLinesSink() if telemetry else None, ward_id=str(ward.get("ward_id", ""))
+        )
+        result = run_roster(
+            nurse_profiles,
+            N,
+            time_limit,
+            use_cache,
+            instrumentation,
+            num_workers=num_workers,
+            early_stop=early_stop,
+            lns_seconds=lns_seconds,
+            demand=demand,
+            demand_optimal=demand_optimal,
+            break_symmetry=break_symmetry,
+            greedy_hint=greedy_hint,
+            mode=mode,
+            solver_config=solver_config,
+            solver_profiles=get_solver_profiles(),
+        )
+    result["wall_time"] = time.perf_counter() - start
+    result["num_workers"] = num_workers
+    return result
+
+
+def solve_wards(
+    wards: List[Dict],
+    total_workers: Optional[int] = None,
+    time_limit: int = 20,
+    use_cache: bool = True,
+    early_stop: Optional[Dict] = None,
+    solver: Optional[Dict] = None,
+    telemetry: bool = True,
+) -> Dict:
+    """
+    Solve independent ward rosters in one invocation. Wards run in a process
+    pool of min(len(wards), total_workers) processes and the CP-SAT search
+    workers are split evenly between them; total_workers defaults to the
+    CPUs available to the container (solver_config.available_cpus). Where
+    process pools are unavailable (AWS Lambda has no /dev/shm) the wards are
+    solved one after another with all workers each. `solver` is the default
+    solver config dict of wards without their own "solver"; `telemetry` the
+    default of wards without their own "telemetry".
+    """
+    start = time.perf_counter()
+    total_workers = total_workers or available_cpus()
+    ward_ids = [str(w.get("ward_id", i)) for i, w in enumerate(wards)]
+    num_processes = max(1, min(len(wards), total_workers))
+    workers_per_ward = max(1, total_workers // num_processes)
+
+    try:
+        with ProcessPoolExecutor(max_workers=num_processes) as pool:
+            futures = [
+                pool.submit(
+                    _solve_ward,
+                    w,
+                    workers_per_ward,
+                    time_limit,
+                    use_cache,
+                    early_stop,
+                    solver,
+                    telemetry,
+                )
+                for w in wards
+            ]
+            results = [f.result() for f in futures]
+        mode = "process_pool"
+    except (OSError, NotImplementedError):
+        results = [
+            _solve_ward(
+                w, total_workers, time_limit, use_cache, early_stop, solver, telemetry
+            )
+            for w in wards
+        ]
+        mode = "sequential"
+
+    return {
+        "wards": dict(zip(ward_ids, results)),
+        "mode": mode,
+        "num_processes": num_processes if mode == "process_pool" else 1,
+        "total_time": time.perf_counter() - start,
     }
 
 
+def forecast_event_demand(
+    forecast: Dict,
+    N: Optional[int],
+    demand,
+    instrumentation: SolverInstrumentation,
+) -> Dict:
+    """
+    Handle an event's "forecast" key: forecast next week's demand locally with
+    demand_forecast, on top of N/"demand" as the base staffing level.
+    """
+    base = demand_matrix(N, demand) if N is not None or demand is not None else None
+    with instrumentation.phase("forecast"):
+        return forecast_demand(
+            path=forecast.get("path") or DEFAULT_DATA_PATH,
+            weeks_ahead=int(forecast.get("weeks_ahead", 1)),
+            base=base,
+            country=forecast.get("country"),
+            site_types=forecast.get("site_types"),
+        )
+
+
+def run_roster(
+    nurse_profiles: List[Dict],
+    N: Optional[int],
+    time_limit: int,
+    use_cache: bool,
+    instrumentation: SolverInstrumentation,
+    mode: str = "solve",
+    **solve_options,
+) -> Dict:
+    """
+    Solve one roster (through the cache if enabled) and emit a result record.
+    mode "fast" returns the greedy_roster.construct_roster roster instead,
+    without CP-SAT or the cache.
+    """
+    if mode == "fast":
+        with instrumentation.phase("greedy"):
+            result = construct_roster(
+                nurse_profiles,
+                N,
+                demand=solve_options.get("demand"),
+                demand_optimal=solve_options.get("demand_optimal"),
+            )
+    else:
+        solve = cached_build_and_solve if use_cache else build_and_solve
+        result = solve(
+            nurse_profiles,
+            N,
+            time_limit=time_limit,
+            instrumentation=instrumentation,
+            **solve_options,
+        )
+    instrumentation.emit(
+        "result",
+        status=result.get("status"),
+        error=result.get("error"),
+        objective=result.get("objective"),
+        stop_reason=result.get("stop_reason"),
+        cache=result.get("cache"),
+        nurses=len(nurse_profiles),
+        uncovered=sum(result.get("slack", {}).values()),
+    )
+    return result
+
+
 # AWS Lambda handler
 def lambda_handler(event, context):
     """
@@ -194,10 +814,61 @@ def lambda_handler(event, context):
     {
       "nurse_profiles": [ {"nurse_id":"n001","preferred_days_off":[0,6],"preferred_shift_type":0}, ... ],
       "N": 4,
-      "max_seconds": 20
+      "max_seconds": 20,
+      "use_cache": true,
+      "telemetry": true,
+      "early_stop": {"relative_gap": 0.01, "stagnation_seconds": 3, "target_objective": null},
+      "lns_seconds": 0,
+      "break_symmetry": false,
+      "greedy_hint": true,
+      "mode": "solve",
+      "demand": [[2, 2], [2, 2], [2, 2], [2, 2], [2, 2], [2, 2], [2, 2]],
+      "demand_optimal": [[3, 2], [3, 2], [3, 2], [3, 2], [3, 2], [2, 2], [2, 2]],
+      "forecast": {"path": "weekly_nurse_requirements.npz", "weeks_ahead": 1,
+                   "country": null, "site_types": null}
     }
     If event is empty or missing keys, run a built-in example.
+    Set "use_cache" to false to bypass the persistent solution cache.
+    Telemetry records (see solver_progress) are written to the Lambda log as
+    JSON lines; set "telemetry" to false to turn them off.
+    "early_stop" defaults to DEFAULT_EARLY_STOP; pass {} to always run to max_seconds.
+    "lns_seconds" > 0 adds an LNS improvement phase after the CP-SAT solve.
+    "break_symmetry" lex-orders nurses with identical profiles; it helps on
+    tight wards where proving optimality dominates, not on easy ones.
+    "solver" configures CP-SAT (see solver_config.SolverConfig), e.g.
+    {"num_workers": 2, "subsolvers": ["default_lp", "core"], "seeds": 4};
+    by default the tuned profile for the ward size is used if the
+    ROSTER_SOLVER_PROFILES file (see tuning.py) is set, else the portfolio
+    runs on every CPU available to the container.
+    "mode": "fast" returns a greedy roster (greedy_roster.construct_roster)
+    in milliseconds for previews; the default "solve" runs CP-SAT, hinted
+    with that greedy roster unless "greedy_hint" is false or a cached roster
+    is closer.
+    "demand" gives per-day (Sunday first), per-shift (day, night) staffing and
+    replaces N. "forecast" computes that matrix in-process with
+    demand_forecast.forecast_demand, adding the forecast to N (or "demand")
+    as the base level; the forecast details are returned under "forecast".
+    "demand_optimal" is a softer per-day, per-shift target above the demand,
+    like the INRC-II optimal requirement; shortfall is under "below_optimal".
+    "repair" takes the current roster and "unavailable" (nurse_id -> days,
+    Sunday = 0) and returns a minimally changed roster with its "diff"
+    (see repair_roster); N/"demand" give the new staffing demand.
+
+    Batch format (several independent wards in one invocation):
+    {
+      "wards": [ {"ward_id":"icu","nurse_profiles":[...],"N":4,"max_seconds":20,"lns_seconds":0}, ... ],
+      "max_workers": 8,
+      "max_seconds": 20,
+      "solver": {"subsolvers": ["default_lp", "core"]}
+    }
+    "max_workers" defaults to the container's available CPUs; "solver" is the
+    default solver config of wards without their own. The batch summary is a
+    "batch" telemetry record; "telemetry": false turns it and the wards'
+    records off.
     """
+    if event and isinstance(event, dict) and event.get("wards"):
+        return batch_handler(event)
+
     try:
         nurse_profiles = (
             event.get("nurse_profiles") if event and isinstance(event, dict) else None
@@ -210,11 +881,58 @@ def lambda_handler(event, context):
         time_limit = (
             int(event.get("max_seconds")) if event and event.get("max_seconds") else 20
         )
+        use_cache = bool(event.get("use_cache", True)) if event else True
+        telemetry = bool(event.get("telemetry", True)) if event else True
+        early_stop = event.get("early_stop", DEFAULT_EARLY_STOP) if event else DEFAULT_EARLY_STOP
+        lns_seconds = float(event.get("lns_seconds") or 0) if event else 0.0
+        break_symmetry = bool(event.get("break_symmetry", False)) if event else False
+        greedy_hint = bool(event.get("greedy_hint", True)) if event else True
+        solver_config = (
+            SolverConfig.from_dict(event["solver"])
+            if event and event.get("solver") is not None
+            else None
+        )
+        mode = str(event.get("mode") or "solve") if event else "solve"
+        demand = (
+            demand_matrix(demand=event["demand"]).tolist()
+            if event and event.get("demand") is not None
+            else None
+        )
+        demand_optimal = (
+            demand_matrix(demand=event["demand_optimal"]).tolist()
+            if event and event.get("demand_optimal") is not None
+            else None
+        )
+        forecast = event.get("forecast") if event else None
+        repair = event.get("repair") if event else None
+        if repair is not None:
+            repair_roster_in = dict(repair["roster"])
+            unavailable = {
+                str(nid): [int(d) for d in days]
+                for nid, days in (repair.get("unavailable") or {}).items()
+            }
+            repair_time_limit = float(repair.get("max_seconds") or REPAIR_TIME_LIMIT)
     except Exception as e:
         return {"error": f"Invalid event format: {e}"}
 
+    if repair is not None:
+        if not nurse_profiles or (N is None and demand is None):
+            return {"error": "Invalid event format: repair needs nurse_profiles and N or demand"}
+        instrumentation = SolverInstrumentation(sink=JsonLinesSink() if telemetry else None)
+        return repair_roster(
+            nurse_profiles,
+            repair_roster_in,
+            N,
+            demand=demand,
+            demand_optimal=demand_optimal,
+            unavailable=unavailable,
+            time_limit=repair_time_limit,
+            instrumentation=instrumentation,
+            solver_config=solver_config,
+        )
+
     # Example fallback if not provided
-    if not nurse_profiles or N is None:
+    if not nurse_profiles or (N is None and demand is None and forecast is None):
         # small example: 5 nurses, N=4 (2 per shift)
         nurse_profiles = [
             {
@@ -246,10 +964,62 @@ def lambda_handler(event, context):
         N = 4
         time_limit = 10
 
-    result = build_and_solve(nurse_profiles, N, time_limit=time_limit)
-    # Print JSON (Lambda logs)
-    print(json.dumps(result, indent=2))
-    # Return JSON
+    instrumentation = SolverInstrumentation(sink=JsonLinesSink() if telemetry else None)
+
+    forecast_result = None
+    if forecast is not None:
+        try:
+            forecast_result = forecast_event_demand(forecast, N, demand, instrumentation)
+        except Exception as e:
+            return {"error": f"Demand forecast failed: {e}"}
+        demand = forecast_result["demand"]
+
+    result = run_roster(
+        nurse_profiles,
+        N,
+        time_limit,
+        use_cache,
+        instrumentation,
+        early_stop=early_stop,
+        lns_seconds=lns_seconds,
+        demand=demand,
+        demand_optimal=demand_optimal,
+        break_symmetry=break_symmetry,
+        greedy_hint=greedy_hint,
+        mode=mode,
+        solver_config=solver_config,
+        solver_profiles=get_solver_profiles(),
+    )
+    if forecast_result is not None:
+        result["forecast"] = forecast_result
+    return result
+
+
+def batch_handler(event: Dict) -> Dict:
+    """Handle a {"wards": [...]} batch event with solve_wards."""
+    try:
+        total_workers = int(event["max_workers"]) if event.get("max_workers") else None
+        time_limit = int(event.get("max_seconds") or 20)
+        use_cache = bool(event.get("use_cache", True))
+        early_stop = event.get("early_stop", DEFAULT_EARLY_STOP)
+        solver = event.get("solver")
+        telemetry = bool(event.get("telemetry", True))
+    except Exception as e:
+        return {"error": f"Invalid event format: {e}"}
+
+    result = solve_wards(
+        event["wards"],
+        total_workers=total_workers,
+        time_limit=time_limit,
+        use_cache=use_cache,
+        early_stop=early_stop,
+        solver=solver,
+        telemetry=telemetry,
+    )
+    instrumentation = SolverInstrumentation(sink=JsonLinesSink() if telemetry else None)
+    instrumentation.emit(
+        "batch", wards=len(result["wards"]), **{k: v for k, v in result.items() if k != "wards"}
+    )
     return result
 
 
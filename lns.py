@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Adaptive large neighbourhood search (LNS) over a solved CP-SAT roster model.
+
+improve_roster starts from a feasible assignment of the model's (nurse, day,
+shift) Boolean variables and repeatedly:
+
+1. picks a neighbourhood operator by roulette over adaptive weights
+   - "days":   a window of consecutive days is freed for every nurse
+   - "nurses": a random subset of nurses is freed on every day
+   - "shift":  one shift type is freed for every nurse on every day
+2. pins every other assignment variable to its current value on a clone of
+   the model, hints the freed ones, and re-solves with a short time limit
+3. accepts the result if it is no worse than the incumbent
+
+Operators that improve the incumbent gain weight. Neighbourhood sizes grow
+when a sub-model is solved to optimality without improving (too small to
+escape) and shrink when it runs out of time (too large to solve).
+"""
+
+import random
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from ortools.sat.python import cp_model
+
+from solver_config import SolverConfig
+from solver_progress import SolverInstrumentation
+
+Key = Tuple[Hashable, int, Hashable]  # (nurse, day, shift)
+
+OPERATORS = ["days", "nurses", "shift"]
+DEFAULT_SUB_TIME_LIMIT = 2.0  # seconds per sub-model solve
+INITIAL_SIZE = 0.2  # share of nurses / days freed at first
+MIN_SIZE, MAX_SIZE = 0.05, 0.6
+SIZE_GROWTH, SIZE_SHRINK = 1.25, 0.8
+WEIGHT_DECAY = 0.3  # weight of the newest reward in each operator's weight
+REWARD_IMPROVED, REWARD_ACCEPTED, REWARD_REJECTED = 1.0, 0.3, 0.0
+MIN_WEIGHT = 0.05
+
+
+def _neighbourhood(operator: str, size: float, nurses: List, days: List, shifts: List,
+                   rng: random.Random) -> set:
+    """Keys freed by one operator application."""
+    if operator == "days":
+        width = max(1, round(size * len(days)))
+        start = rng.randrange(len(days) - width + 1)
+        window = set(days[start:start + width])
+        return {(n, d, s) for n in nurses for d in window for s in shifts}
+    if operator == "nurses":
+        chosen = rng.sample(nurses, max(1, round(size * len(nurses))))
+        return {(n, d, s) for n in chosen for d in days for s in shifts}
+    shift = rng.choice(shifts)
+    return {(n, d, shift) for n in nurses for d in days}
+
+
+def improve_roster(
+    model: cp_model.CpModel,
+    variables: Dict[Key, cp_model.IntVar],
+    incumbent: Dict[Key, int],
+    objective: float,
+    time_budget: float,
+    sub_time_limit: float = DEFAULT_SUB_TIME_LIMIT,
+    num_workers: Optional[int] = None,
+    seed: int = 0,
+    solver_config: Optional[SolverConfig] = None,
+    instrumentation: Optional[SolverInstrumentation] = None,
+    **labels,
+) -> Dict:
+    """
+    Improve a feasible `incumbent` (key -> 0/1 for `variables`) of `model` with
+    adaptive LNS for at most `time_budget` seconds. `objective` is the
+    incumbent's objective value. Returns the best assignment found together
+    with its objective and per-operator statistics. Improvements are emitted
+    as incumbent records (source="lns") and the run as one "lns" record.
+    Sub-models are solved once each with `solver_config` (one worker if not
+    given), reseeded every iteration; `num_workers` overrides its workers.
+    """
+    instrumentation = instrumentation or SolverInstrumentation()
+    solver_config = solver_config or SolverConfig(num_workers=1)
+    if num_workers is not None:
+        solver_config = solver_config.with_workers(num_workers)
+    start = time.perf_counter()
+    rng = random.Random(seed)
+
+    nurses = sorted({k[0] for k in variables}, key=str)
+    days = sorted({k[1] for k in variables})
+    shifts = sorted({k[2] for k in variables}, key=str)
+    stats = {
+        op: {"weight": 1.0, "size": INITIAL_SIZE, "calls": 0, "improvements": 0}
+        for op in OPERATORS
+    }
+
+    current = {k: int(incumbent.get(k, 0)) for k in variables}
+    initial_objective = objective
+    iterations = 0
+    incumbents = []
+
+    while True:
+        remaining = time_budget - (time.perf_counter() - start)
+        if remaining <= 0.05:
+            break
+        iterations += 1
+        operator = rng.choices(OPERATORS, weights=[stats[op]["weight"] for op in OPERATORS])[0]
+        op_stats = stats[operator]
+        op_stats["calls"] += 1
+        free = _neighbourhood(operator, op_stats["size"], nurses, days, shifts, rng)
+
+        sub = model.Clone()
+        sub.ClearHints()
+        for key, var in variables.items():
+            sub_var = sub.GetBoolVarFromProtoIndex(var.Index())
+            if key in free:
+                sub.AddHint(sub_var, current[key])
+            else:
+                sub.Add(sub_var == current[key])
+
+        solver = solver_config.apply(cp_model.CpSolver(), min(sub_time_limit, remaining),
+                                     seed_offset=rng.randrange(1 << 30))
+        status = solver.Solve(sub)
+
+        reward = REWARD_REJECTED
+        # Pinned variables are presolved into a float offset; round off its noise
+        sub_objective = (round(solver.ObjectiveValue(), 6)
+                         if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None)
+        if sub_objective is not None and sub_objective <= objective:
+            improved = sub_objective < objective
+            objective = sub_objective
+            for key in free:
+                current[key] = int(solver.BooleanValue(sub.GetBoolVarFromProtoIndex(variables[key].Index())))
+            if improved:
+                op_stats["improvements"] += 1
+                reward = REWARD_IMPROVED
+                incumbent_record = {
+                    "wall_time": time.perf_counter() - start,
+                    "objective": objective,
+                    "bound": None,
+                }
+                incumbents.append(incumbent_record)
+                instrumentation.emit("incumbent", source="lns", operator=operator,
+                                     **labels, **incumbent_record)
+            else:
+                reward = REWARD_ACCEPTED
+
+        # Adapt: solved to optimality without gain -> neighbourhood too small
+        if reward < REWARD_IMPROVED:
+            if status == cp_model.OPTIMAL:
+                op_stats["size"] = min(MAX_SIZE, op_stats["size"] * SIZE_GROWTH)
+            else:
+                op_stats["size"] = max(MIN_SIZE, op_stats["size"] * SIZE_SHRINK)
+        op_stats["weight"] = max(
+            MIN_WEIGHT, (1 - WEIGHT_DECAY) * op_stats["weight"] + WEIGHT_DECAY * reward
+        )
+
+    lns_time = time.perf_counter() - start
+    instrumentation.emit(
+        "lns",
+        iterations=iterations,
+        initial_objective=initial_objective,
+        objective=objective,
+        seconds=lns_time,
+        operators=stats,
+        **labels,
+    )
+    return {
+        "assignment": current,
+        "objective": objective,
+        "initial_objective": initial_objective,
+        "iterations": iterations,
+        "lns_time": lns_time,
+        "operators": stats,
+        "incumbents": incumbents,
+    }
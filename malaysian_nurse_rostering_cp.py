@@ -20,200 +20,113 @@ Output JSON (returned by handler):
 }
 """
 
-from ortools.sat.python import cp_model
 import json
-from typing import List, Dict
 import os
-from supabase import create_client, Client
-
-# Setup Supabase client
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
+import time
+from typing import Dict, List
+
+# The CP model is shared with the standalone handler so both entrypoints
+# build rosters with the same array-indexed builder.
+from lambda_rostering import (
+    DEFAULT_EARLY_STOP,
+    batch_handler,
+    demand_matrix,
+    forecast_event_demand,
+    get_solver_profiles,
+    run_roster,
+)
+from solver_config import SolverConfig
+from solver_progress import JsonLinesSink, SolverInstrumentation
 
 shift_map = {"day": 0, "night": 1, "flexible": -1}
 
+# Preference cache: rows are kept across warm invocations and refreshed
+# incrementally by "updatedAt"; a periodic full reload drops deleted rows.
+PREFERENCE_TABLE = "nurse_preferences"
+PREFERENCE_COLUMNS = "userId,dayOffs,preferredShift,updatedAt"
+PREFERENCE_PAGE_SIZE = 1000
+PREFERENCE_TTL_SECONDS = float(os.environ.get("PREFERENCE_TTL_SECONDS", 300))
+PREFERENCE_FULL_REFRESH_SECONDS = float(
+    os.environ.get("PREFERENCE_FULL_REFRESH_SECONDS", 3600)
+)
+
+_supabase_client = None
+_preference_cache = {"rows": {}, "high_water": None, "checked_at": 0.0, "loaded_at": 0.0}
+
+
+def get_supabase_client():
+    """Create the Supabase client on first use and reuse it across warm invocations."""
+    global _supabase_client
+    if _supabase_client is None:
+        from supabase import create_client
+
+        supabase_url = os.environ.get("SUPABASE_URL")
+        supabase_key = os.environ.get("SUPABASE_KEY")
+        _supabase_client = create_client(supabase_url, supabase_key)
+    return _supabase_client
+
+
+def set_supabase_client(client):
+    """Install a client (e.g. a local stand-in) and reset the preference cache."""
+    global _supabase_client
+    _supabase_client = client
+    _preference_cache.update(rows={}, high_water=None, checked_at=0.0, loaded_at=0.0)
+
+
+def _fetch_preference_rows(since=None) -> List[Dict]:
+    """Page through the preference rows, optionally only those updated at/after `since`."""
+    rows = []
+    start = 0
+    while True:
+        query = get_supabase_client().table(PREFERENCE_TABLE).select(PREFERENCE_COLUMNS)
+        if since is not None:
+            query = query.gte("updatedAt", since)
+        response = (
+            query.order("updatedAt")
+            .range(start, start + PREFERENCE_PAGE_SIZE - 1)
+            .execute()
+        )
+        rows.extend(response.data)
+        if len(response.data) < PREFERENCE_PAGE_SIZE:
+            return rows
+        start += PREFERENCE_PAGE_SIZE
+
 
 def fetch_nurse_preferences():
-    """Pull nurse preferences from Supabase table 'nurse_preferences'."""
-    response = supabase.table("nurse_preferences").select("*").execute()
+    """
+    Pull nurse preferences from Supabase table 'nurse_preferences'.
+    Within PREFERENCE_TTL_SECONDS the cached rows are returned without a query;
+    after that only rows updated since the last seen "updatedAt" are fetched.
+    """
+    cache = _preference_cache
+    now = time.time()
+    if now - cache["loaded_at"] >= PREFERENCE_FULL_REFRESH_SECONDS:
+        cache["rows"] = {row["userId"]: row for row in _fetch_preference_rows()}
+        cache["loaded_at"] = cache["checked_at"] = now
+    elif now - cache["checked_at"] >= PREFERENCE_TTL_SECONDS:
+        for row in _fetch_preference_rows(since=cache["high_water"]):
+            cache["rows"][row["userId"]] = row
+        cache["checked_at"] = now
+    if cache["rows"]:
+        cache["high_water"] = max(
+            (row["updatedAt"] for row in cache["rows"].values() if row.get("updatedAt")),
+            default=cache["high_water"],
+        )
+
     nurses = []
-    for row in response.data:
+    for row in cache["rows"].values():
         nurses.append(
             {
                 "nurse_id": row["userId"],
-                "preferred_days_off": row.get("dayOffs", []),
+                "preferred_days_off": row.get("dayOffs") or [],
                 "preferred_shift_type": shift_map.get(
-                    row.get("preferredShift", "flexible"), -1
+                    row.get("preferredShift") or "flexible", -1
                 ),
             }
         )
     return nurses
 
 
-DAYS = list(range(7))
-DAY_NAMES = [
-    "Sunday",
-    "Monday",
-    "Tuesday",
-    "Wednesday",
-    "Thursday",
-    "Friday",
-    "Saturday",
-]
-
-# Model choices: day = 8h, night = 12h (allows combos to meet 40-45 & 4-5 shifts)
-SHIFTS = ["day", "night"]
-SHIFT_HOURS = {"day": 8, "night": 12}
-
-# Hard constraint bounds
-MIN_WEEK_HOURS = 40
-MAX_WEEK_HOURS = 45
-MIN_SHIFTS_PER_WEEK = 4
-MAX_SHIFTS_PER_WEEK = 5
-
-# Soft constraint weights (tune these)
-PENALTY_DAYOFF = 100  # large penalty for assigning on preferred day off
-REWARD_PREF_SHIFT = -10  # reward (negative penalty) for assigning preferred shift type
-PENALTY_UNASSIGNED = 200  # penalty if demand cannot be met (slack)
-
-
-def build_and_solve(nurse_profiles: List[Dict], N: int, time_limit: int = 20):
-    """
-    Build CP model and solve. Returns roster mapping day->shifts->list of nurse_ids.
-    """
-    # Preprocess nurses
-    nurses = [n["nurse_id"] for n in nurse_profiles]
-    pref_days_off = {
-        n["nurse_id"]: set(n.get("preferred_days_off", [])) for n in nurse_profiles
-    }
-    pref_shift = {
-        n["nurse_id"]: int(n.get("preferred_shift_type", 0)) for n in nurse_profiles
-    }
-
-    # Demand per day: split N equally between day and night
-    night_req = N // 2
-    day_req = N - night_req  # day gets extra if N odd
-
-    # Model
-    model = cp_model.CpModel()
-
-    # Decision variables: assign[(nurse, day, shift)]
-    assign = {}
-    for nid in nurses:
-        for d in DAYS:
-            for s in SHIFTS:
-                assign[(nid, d, s)] = model.NewBoolVar(f"x_{nid}_{d}_{s}")
-
-    # Hard: at most one shift per nurse per day
-    for nid in nurses:
-        for d in DAYS:
-            model.Add(sum(assign[(nid, d, s)] for s in SHIFTS) <= 1)
-
-    # Hard: weekly hours between MIN_WEEK_HOURS and MAX_WEEK_HOURS
-    nurse_hours = {}
-    for nid in nurses:
-        total_hours_expr = sum(
-            assign[(nid, d, s)] * SHIFT_HOURS[s] for d in DAYS for s in SHIFTS
-        )
-        # integer variable to track hours
-        hvar = model.NewIntVar(0, MAX_WEEK_HOURS, f"hours_{nid}")
-        model.Add(hvar == total_hours_expr)
-        model.Add(hvar >= MIN_WEEK_HOURS)
-        model.Add(hvar <= MAX_WEEK_HOURS)
-        nurse_hours[nid] = hvar
-
-    # Hard: number of shifts per nurse between MIN_SHIFTS_PER_WEEK and MAX_SHIFTS_PER_WEEK
-    for nid in nurses:
-        total_shifts_expr = sum(assign[(nid, d, s)] for d in DAYS for s in SHIFTS)
-        s_var = model.NewIntVar(0, MAX_SHIFTS_PER_WEEK, f"shifts_{nid}")
-        model.Add(s_var == total_shifts_expr)
-        model.Add(s_var >= MIN_SHIFTS_PER_WEEK)
-        model.Add(s_var <= MAX_SHIFTS_PER_WEEK)
-
-    # Hard: forbid night -> day on next day (no quick turnaround)
-    # If nurse works night on day d, cannot work day on day d+1
-    for nid in nurses:
-        for d in range(6):
-            model.Add(assign[(nid, d, "night")] + assign[(nid, d + 1, "day")] <= 1)
-
-    # Staffing demand per day/shift (hard as possible; allow slack with heavy penalty)
-    # Create slack vars if exact coverage impossible
-    slack_vars = {}
-    for d in DAYS:
-        # day
-        day_quals = [assign[(n, d, "day")] for n in nurses]
-        slack_day = model.NewIntVar(0, len(nurses), f"slack_day_{d}")
-        slack_vars[("day", d)] = slack_day
-        model.Add(sum(day_quals) + slack_day >= day_req)
-
-        # night
-        night_quals = [assign[(n, d, "night")] for n in nurses]
-        slack_night = model.NewIntVar(0, len(nurses), f"slack_night_{d}")
-        slack_vars[("night", d)] = slack_night
-        model.Add(sum(night_quals) + slack_night >= night_req)
-
-    # Objective: minimize penalties (day-off violations, slack, prefer shift types)
-    obj_terms = []
-
-    # Penalty for assigning on preferred days off
-    for nid in nurses:
-        for d in DAYS:
-            if d in pref_days_off.get(nid, set()):
-                for s in SHIFTS:
-                    obj_terms.append(assign[(nid, d, s)] * PENALTY_DAYOFF)
-
-    # Reward for assigning preferred shift type
-    for nid in nurses:
-        preferred = pref_shift.get(nid, 0)  # 0=day,1=night
-        for d in DAYS:
-            if preferred == 0:
-                obj_terms.append(assign[(nid, d, "day")] * REWARD_PREF_SHIFT)
-            else:
-                obj_terms.append(assign[(nid, d, "night")] * REWARD_PREF_SHIFT)
-
-    # Penalize slack heavily (uncovered positions)
-    for key, sval in slack_vars.items():
-        obj_terms.append(sval * PENALTY_UNASSIGNED)
-
-    model.Minimize(sum(obj_terms))
-
-    # Solve
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = max(1, int(time_limit))
-    solver.parameters.num_search_workers = 8
-
-    status = solver.Solve(model)
-
-    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        return {
-            "error": "No feasible solution found",
-            "status": solver.StatusName(status),
-        }
-
-    # Build roster output: day_name -> {day_shift: [...], night_shift: [...]}
-    roster = {DAY_NAMES[d]: {"day_shift": [], "night_shift": []} for d in DAYS}
-
-    for d in DAYS:
-        for nid in nurses:
-            if solver.BooleanValue(assign[(nid, d, "day")]):
-                roster[DAY_NAMES[d]]["day_shift"].append(nid)
-            if solver.BooleanValue(assign[(nid, d, "night")]):
-                roster[DAY_NAMES[d]]["night_shift"].append(nid)
-
-    # Provide some diagnostics
-    nurse_hours_out = {nid: int(solver.Value(nurse_hours[nid])) for nid in nurses}
-    slack_out = {f"{k[0]}_{k[1]}": int(solver.Value(v)) for k, v in slack_vars.items()}
-
-    return {
-        "roster": roster,
-        "nurse_hours": nurse_hours_out,
-        "slack": slack_out,
-        "objective": solver.ObjectiveValue(),
-        "status": solver.StatusName(status),
-    }
-
-
 # AWS Lambda handler
 def lambda_handler(event, context):
     """
@@ -221,10 +134,29 @@ def lambda_handler(event, context):
     {
       "nurse_profiles": [ {"nurse_id":"n001","preferred_days_off":[0,6],"preferred_shift_type":0}, ... ],
       "N": 4,
-      "max_seconds": 20
+      "max_seconds": 20,
+      "use_cache": true,
+      "telemetry": true
     }
     If event is empty or missing keys, run a built-in example.
+    Set "use_cache" to false to bypass the persistent solution cache.
+    Set "telemetry" to false to stop writing JSON-line telemetry records.
+    "early_stop" defaults to DEFAULT_EARLY_STOP; pass {} to always run to max_seconds.
+    "lns_seconds" > 0 adds an LNS improvement phase after the CP-SAT solve.
+    "break_symmetry" lex-orders nurses with identical preferences.
+    "solver" configures CP-SAT (see solver_config.SolverConfig); without it
+    the tuned profile for the ward size from ROSTER_SOLVER_PROFILES is used,
+    as in lambda_rostering.lambda_handler.
+    "mode": "fast" returns a greedy roster without solving; "greedy_hint"
+    (default true) seeds the solve with it.
+    "demand" (7 x 2 matrix), "demand_optimal" and "forecast" work as in
+    lambda_rostering.lambda_handler.
+    A {"wards": [...]} event solves several wards in one invocation
+    (see lambda_rostering.lambda_handler for the batch format).
     """
+    if event and isinstance(event, dict) and event.get("wards"):
+        return batch_handler(event)
+
     try:
         nurse_profiles = (
             event.get("nurse_profiles") if event and isinstance(event, dict) else None
@@ -235,19 +167,95 @@ def lambda_handler(event, context):
             event.get("max_seconds") if event and isinstance(event, dict) else None
         )
         time_limit = int(max_seconds_val) if max_seconds_val is not None else 20
+        use_cache = (
+            bool(event.get("use_cache", True))
+            if event and isinstance(event, dict)
+            else True
+        )
+        telemetry = (
+            bool(event.get("telemetry", True))
+            if event and isinstance(event, dict)
+            else True
+        )
+        early_stop = (
+            event.get("early_stop", DEFAULT_EARLY_STOP)
+            if event and isinstance(event, dict)
+            else DEFAULT_EARLY_STOP
+        )
+        lns_seconds = (
+            float(event.get("lns_seconds") or 0)
+            if event and isinstance(event, dict)
+            else 0.0
+        )
+        break_symmetry = (
+            bool(event.get("break_symmetry", False))
+            if event and isinstance(event, dict)
+            else False
+        )
+        greedy_hint = (
+            bool(event.get("greedy_hint", True))
+            if event and isinstance(event, dict)
+            else True
+        )
+        solver_config = (
+            SolverConfig.from_dict(event["solver"])
+            if event and isinstance(event, dict) and event.get("solver") is not None
+            else None
+        )
+        mode = (
+            str(event.get("mode") or "solve")
+            if event and isinstance(event, dict)
+            else "solve"
+        )
+        demand = (
+            demand_matrix(demand=event["demand"]).tolist()
+            if event and isinstance(event, dict) and event.get("demand") is not None
+            else None
+        )
+        demand_optimal = (
+            demand_matrix(demand=event["demand_optimal"]).tolist()
+            if event and isinstance(event, dict) and event.get("demand_optimal") is not None
+            else None
+        )
+        forecast = event.get("forecast") if event and isinstance(event, dict) else None
     except Exception as e:
         return {"error": f"Invalid event format: {e}"}
 
+    instrumentation = SolverInstrumentation(sink=JsonLinesSink() if telemetry else None)
+
     # Example fallback if not provided
-    if not nurse_profiles or N is None:
-        nurse_profiles = fetch_nurse_preferences()
+    if not nurse_profiles or (N is None and demand is None and forecast is None):
+        with instrumentation.phase("load", source="supabase"):
+            nurse_profiles = fetch_nurse_preferences()
         N = 4
         time_limit = 10
 
-    result = build_and_solve(nurse_profiles, N, time_limit=time_limit)
-    # Print JSON (Lambda logs)
-    print(json.dumps(result, indent=2))
-    # Return JSON
+    forecast_result = None
+    if forecast is not None:
+        try:
+            forecast_result = forecast_event_demand(forecast, N, demand, instrumentation)
+        except Exception as e:
+            return {"error": f"Demand forecast failed: {e}"}
+        demand = forecast_result["demand"]
+
+    result = run_roster(
+        nurse_profiles,
+        N,
+        time_limit,
+        use_cache,
+        instrumentation,
+        early_stop=early_stop,
+        lns_seconds=lns_seconds,
+        break_symmetry=break_symmetry,
+        greedy_hint=greedy_hint,
+        mode=mode,
+        demand=demand,
+        demand_optimal=demand_optimal,
+        solver_config=solver_config,
+        solver_profiles=get_solver_profiles(),
+    )
+    if forecast_result is not None:
+        result["forecast"] = forecast_result
     return result
 
 
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Persistent roster solution cache for the Lambda rostering handlers.
+
+Solved rosters are stored in a SQLite file (on Lambda, /tmp survives warm
+invocations) keyed by a canonical hash of the solver inputs:
+
+- exact hit: same nurse profiles, demand and solve options (time limit,
+  LNS, symmetry breaking, early stop, solver settings) and the cached roster
+  was proven OPTIMAL -> cached result is returned as is
+- near match: most recent entry sharing the most nurses, whatever its
+  status -> its roster is used as an AddHint warm start, so incremental
+  edits (one nurse's day-off change, one nurse added) start from a nearly
+  feasible roster
+
+A FEASIBLE roster from a short or early-stopped solve is never an exact
+hit: a longer solve may still improve on it.
+
+Location is taken from ROSTER_CACHE_PATH (default /tmp/roster_cache.sqlite3).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+# Bump when the CP model changes so stale rosters are not served as exact hits
+# (2: optimal staffing levels, sequence automaton, combined objective costs)
+CACHE_VERSION = 2
+DEFAULT_CACHE_PATH = "/tmp/roster_cache.sqlite3"
+
+# Near matches must share at least this fraction of nurses to be used as hints
+MIN_NEAR_MATCH_OVERLAP = 0.5
+NEAR_MATCH_CANDIDATES = 50
+
+
+def canonical_profiles(nurse_profiles: List[Dict]) -> List[Dict]:
+    """Normalise nurse profiles so equal inputs hash equally regardless of order."""
+    return sorted(
+        (
+            {
+                "nurse_id": str(n["nurse_id"]),
+                "preferred_days_off": sorted(int(d) for d in n.get("preferred_days_off", [])),
+                "preferred_shift_type": int(n.get("preferred_shift_type", 0)),
+            }
+            for n in nurse_profiles
+        ),
+        key=lambda n: n["nurse_id"],
+    )
+
+
+def canonical_key(nurse_profiles: List[Dict], demand, options: Optional[Dict] = None) -> str:
+    """SHA-256 over the canonical profiles, the demand, the solve options and the cache version."""
+    payload = json.dumps(
+        {
+            "version": CACHE_VERSION,
+            "profiles": canonical_profiles(nurse_profiles),
+            "demand": demand,
+            "options": options or {},
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RosterCache:
+    """SQLite-backed store of solved rosters."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("ROSTER_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rosters (
+                key TEXT PRIMARY KEY,
+                nurse_ids TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for an exact key if it was solved to optimality, or None."""
+        row = self.conn.execute(
+            "SELECT result FROM rosters WHERE key = ?", (key,)
+        ).fetchone()
+        if not row:
+            return None
+        result = json.loads(row[0])
+        return result if result.get("status") == "OPTIMAL" else None
+
+    def nearest(self, nurse_ids: List[str]) -> Optional[Dict]:
+        """Return the recent cached result sharing the most nurses, or None."""
+        wanted = set(nurse_ids)
+        if not wanted:
+            return None
+
+        best, best_overlap = None, MIN_NEAR_MATCH_OVERLAP
+        rows = self.conn.execute(
+            "SELECT nurse_ids, result FROM rosters ORDER BY created_at DESC LIMIT ?",
+            (NEAR_MATCH_CANDIDATES,),
+        )
+        for ids_json, result_json in rows:
+            cached = set(json.loads(ids_json))
+            overlap = len(wanted & cached) / len(wanted | cached)
+            if overlap > best_overlap or (best is None and overlap == best_overlap):
+                best, best_overlap = result_json, overlap
+        return json.loads(best) if best else None
+
+    def put(self, key: str, nurse_ids: List[str], result: Dict):
+        """Store a solved result under its key; non-optimal ones only serve as near matches."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO rosters (key, nurse_ids, result, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, json.dumps(sorted(nurse_ids)), json.dumps(result), time.time()),
+        )
+        self.conn.commit()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Compact roster representation for statistics and compliance checks.
+
+A roster is held as an int8 (nurse x day) array of shift codes: the index of
+the shift in the shift list, or OFF on days off. It is built in one pass over
+the solution's assignment dicts, and every validator below is a whole-array
+NumPy expression, so checking a roster costs O(nurses x days) however many
+candidate rosters are validated.
+
+Days may span several weeks (nurse x 7k); weekends are Saturday and Sunday of
+every Monday-first week.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+OFF = -1
+WEEKEND_DAYS = (5, 6)  # Saturday, Sunday in a Monday-first week
+
+
+class RosterIndex:
+    """Shift code per (nurse, day) with vectorized per-nurse validators."""
+
+    def __init__(self, codes: np.ndarray, nurses: Sequence[str], shifts: Sequence[str]):
+        self.codes = np.asarray(codes, dtype=np.int8)
+        self.nurses = list(nurses)
+        self.shifts = list(shifts)
+        self.nurse_index = {n: i for i, n in enumerate(self.nurses)}
+        self.shift_index = {s: i for i, s in enumerate(self.shifts)}
+
+    @classmethod
+    def from_assignments(cls, assignments: List[Dict], nurses: Sequence[str], shifts: Sequence[str],
+                         num_days: int = 7) -> "RosterIndex":
+        """Index of {"nurse", "day", "shift"} assignment dicts; unknown nurses or shifts are skipped."""
+        index = cls(np.full((len(nurses), num_days), OFF, dtype=np.int8), nurses, shifts)
+        rows, days, codes = [], [], []
+        for a in assignments:
+            i, s = index.nurse_index.get(a["nurse"]), index.shift_index.get(a["shift"])
+            if i is not None and s is not None:
+                rows.append(i)
+                days.append(a["day"])
+                codes.append(s)
+        index.codes[rows, days] = codes
+        return index
+
+    def shift_code(self, shift: Optional[str]) -> int:
+        """Code of a shift name; OFF for None, "None" or an unknown shift."""
+        return self.shift_index.get(shift, OFF)
+
+    @property
+    def working(self) -> np.ndarray:
+        return self.codes != OFF
+
+    def shift_counts(self) -> np.ndarray:
+        """(nurse, shift) number of assignments."""
+        return (self.codes[:, :, None] == np.arange(len(self.shifts))).sum(axis=1)
+
+    def per_shift(self, values: Dict[str, float]) -> np.ndarray:
+        """A {shift: value} table (e.g. hours or breaks) as an array in shift-code order."""
+        return np.array([values.get(s, 0) for s in self.shifts])
+
+    def nurse_totals(self, values: Dict[str, float]) -> np.ndarray:
+        """Per-nurse sum of a {shift: value} table over the nurse's assignments."""
+        return self.shift_counts() @ self.per_shift(values)
+
+    def max_consecutive(self, shift: Optional[str] = None, carried: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Longest run per nurse of consecutive days on `shift` (any shift if None).
+        `carried` adds a run already in progress before the first day.
+        """
+        on = self.working if shift is None else self.codes == self.shift_code(shift)
+        days = np.arange(on.shape[1])
+        last_break = np.maximum.accumulate(np.where(on, -1, days), axis=1)
+        runs = np.where(on, days - last_break, 0)
+        if carried is not None:
+            runs = runs + np.where(on & (last_break < 0), np.asarray(carried)[:, None], 0)
+        return runs.max(axis=1, initial=0)
+
+    def forbidden_successions(self, successions: Dict[str, List[str]],
+                              previous: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Per-nurse count of day-to-day successions in `successions`
+        (preceding shift -> forbidden succeeding shifts). `previous` holds
+        each nurse's shift code on the day before the first day.
+        """
+        forbidden = np.zeros((len(self.shifts) + 1, len(self.shifts) + 1), dtype=bool)  # row/col OFF = -1
+        for preceding, succeeding in successions.items():
+            for shift in succeeding:
+                if preceding in self.shift_index and shift in self.shift_index:
+                    forbidden[self.shift_index[preceding], self.shift_index[shift]] = True
+        codes = self.codes.astype(np.int64)
+        if previous is not None:
+            codes = np.concatenate([np.asarray(previous, dtype=np.int64)[:, None], codes], axis=1)
+        return forbidden[codes[:, :-1], codes[:, 1:]].sum(axis=1)
+
+    def weekends(self, weekend_days: Sequence[int] = WEEKEND_DAYS) -> np.ndarray:
+        """(nurse, weekend) number of weekend days worked in each 7-day week."""
+        weeks = self.codes.shape[1] // 7
+        working = self.working[:, :weeks * 7].reshape(len(self.nurses), weeks, 7)
+        return working[:, :, list(weekend_days)].sum(axis=2)
+
+    def statistics(self, shift_hours: Dict[str, int]) -> Dict:
+        """Solution statistics (hours, assignments, weekend/night/12h work) from the index."""
+        counts = self.shift_counts()
+        per_nurse = counts @ self.per_shift(shift_hours)
+        totals = counts.sum(axis=0)
+        twelve_hour = self.per_shift(shift_hours) >= 12
+        total_hours = int(per_nurse.sum())
+        return {
+            "total_hours": total_hours,
+            "total_assignments": int(totals.sum()),
+            "avg_hours_per_nurse": total_hours / len(self.nurses) if self.nurses else 0,
+            "nurse_hours": {n: int(h) for n, h in zip(self.nurses, per_nurse)},
+            "shift_distribution": {s: int(c) for s, c in zip(self.shifts, totals) if c},
+            "weekend_assignments": int(self.weekends().sum()),
+            "night_assignments": int(totals[self.shift_index["Night"]]) if "Night" in self.shift_index else 0,
+            "twelve_hour_assignments": int(totals[twelve_hour].sum()),
+        }
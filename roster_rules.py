@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Shared rules of the 7-day x 2-shift ward roster: days, shifts, hard bounds,
+soft weights and demand matrices.
+
+Used by the CP-SAT model (lambda_rostering) and the constructive heuristic
+(greedy_roster); NumPy only, so it loads without OR-Tools.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DAYS = list(range(7))
+DAY_NAMES = [
+    "Sunday",
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+]
+
+# Model choices: day = 8h, night = 12h (allows combos to meet 40-45 & 4-5 shifts)
+SHIFTS = ["day", "night"]
+SHIFT_HOURS = {"day": 8, "night": 12}
+ROSTER_KEYS = ["day_shift", "night_shift"]  # roster output key per entry of SHIFTS
+SHIFT_HOURS_ARRAY = np.array([SHIFT_HOURS[s] for s in SHIFTS], dtype=np.int64)
+DAY, NIGHT = SHIFTS.index("day"), SHIFTS.index("night")
+
+# Hard constraint bounds
+MIN_WEEK_HOURS = 40
+MAX_WEEK_HOURS = 45
+MIN_SHIFTS_PER_WEEK = 4
+MAX_SHIFTS_PER_WEEK = 5
+
+# Soft constraint weights (tune these)
+PENALTY_DAYOFF = 100  # large penalty for assigning on preferred day off
+REWARD_PREF_SHIFT = -10  # reward (negative penalty) for assigning preferred shift type
+PENALTY_UNASSIGNED = 200  # penalty if demand cannot be met (slack)
+PENALTY_BELOW_OPTIMAL = 30  # per nurse short of optimal staffing (INRC-II weight)
+
+
+def demand_matrix(N: Optional[int] = None, demand=None) -> np.ndarray:
+    """
+    (day x shift) staffing demand. An explicit `demand` is a 7 x len(SHIFTS)
+    matrix in DAY_NAMES/SHIFTS order (e.g. from demand_forecast); otherwise N
+    is split between day and night on every day, day taking the extra nurse.
+    """
+    if demand is not None:
+        matrix = np.asarray(demand, dtype=np.int64)
+        if matrix.shape != (len(DAYS), len(SHIFTS)):
+            raise ValueError(f"demand must be {len(DAYS)}x{len(SHIFTS)}, got {matrix.shape}")
+        return matrix
+    night_req = N // 2
+    day_req = N - night_req  # day gets extra if N odd
+    return np.tile(np.array([day_req, night_req], dtype=np.int64), (len(DAYS), 1))
+
+
+def optimal_matrix(minimum: np.ndarray, demand_optimal=None) -> np.ndarray:
+    """
+    (day x shift) optimal staffing, as in the INRC-II requirementOn* fields.
+    Cells below the minimum (or all cells, without `demand_optimal`) are
+    raised to the minimum, so they carry no optimal-coverage term.
+    """
+    if demand_optimal is None:
+        return minimum
+    return np.maximum(demand_matrix(demand=demand_optimal), minimum)
+
+
+def assignment_costs(pref_days_off: np.ndarray, pref_shift: np.ndarray) -> np.ndarray:
+    """
+    (nurse x day x shift) objective coefficient of each assignment: the
+    preferred-day-off penalty plus the preferred-shift reward. `pref_shift`
+    holds each nurse's preferred SHIFTS index.
+    """
+    num_nurses = len(pref_days_off)
+    cost = np.repeat(np.where(pref_days_off, PENALTY_DAYOFF, 0)[:, :, None], len(SHIFTS), axis=2)
+    cost[np.arange(num_nurses), :, pref_shift] += REWARD_PREF_SHIFT
+    return cost.astype(np.int64)
+
+
+def roster_to_array(roster: Dict, nurses: List[str]) -> np.ndarray:
+    """(nurse x day x shift) bool array of a roster dict; unknown nurse ids are ignored."""
+    index = {nid: i for i, nid in enumerate(nurses)}
+    values = np.zeros((len(nurses), len(DAYS), len(SHIFTS)), dtype=bool)
+    for d in DAYS:
+        for s, key in enumerate(ROSTER_KEYS):
+            for nid in roster.get(DAY_NAMES[d], {}).get(key, []):
+                if nid in index:
+                    values[index[nid], d, s] = True
+    return values
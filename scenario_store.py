@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Compiled, memory-mappable store of INRC-II scenario instances.
+
+Each instance (Sc-<id>.json plus all WD-<id>-<k>.json and H0-<id>-<k>.json
+files) is parsed once and written as integer-coded NumPy arrays:
+
+    <store>/<suite>/index.json              scenario id -> weeks, histories, source mtime
+    <store>/<suite>/<scenario_id>/meta.json  scenario config and id tables
+    .../nurse_skills.npy    bool  (nurses, skills)
+    .../demand_minimum.npy  int16 (weeks, days, shifts, skills)
+    .../demand_optimal.npy  int16 (weeks, days, shifts, skills)
+    .../shift_off.npy       bool  (weeks, nurses, days, shifts)  "Any" = every shift
+    .../nurse_history.npy   int32 (histories, nurses, HISTORY_FIELDS)
+
+Later opens read the small meta file and memory-map the arrays, so loading
+an instance costs no JSON parsing of week or history files. An instance is
+recompiled when its Sc file or source folder is newer than the compiled
+copy, or when STORE_VERSION changes.
+
+Location is taken from SCENARIO_STORE_PATH (default output/scenario_store).
+"""
+
+import json
+import os
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+
+STORE_VERSION = 1
+DEFAULT_STORE_PATH = os.path.join("output", "scenario_store")
+
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+HISTORY_FIELDS = [
+    "numberOfAssignments",
+    "numberOfWorkingWeekends",
+    "lastAssignedShiftType",  # index into shifts, -1 for "None"
+    "numberOfConsecutiveAssignments",
+    "numberOfConsecutiveWorkingDays",
+    "numberOfConsecutiveDaysOff",
+]
+ARRAYS = ["nurse_skills", "demand_minimum", "demand_optimal", "shift_off", "nurse_history"]
+
+
+def _file_index(name: str) -> int:
+    return int(name.rsplit("-", 1)[1].replace(".json", ""))
+
+
+class CompiledScenario:
+    """Read-only view of one compiled instance; arrays are memory-mapped."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        self.scenario_id = meta["scenario_id"]
+        self.config = meta["config"]
+        self.nurses: List[str] = meta["nurses"]
+        self.skills: List[str] = meta["skills"]
+        self.shifts: List[str] = meta["shifts"]
+        self.week_ids: List[str] = meta["week_ids"]
+        self.history_ids: List[str] = meta["history_ids"]
+        self.history_weeks: List[int] = meta["history_weeks"]
+
+        self.nurse_index = {n: i for i, n in enumerate(self.nurses)}
+        self.skill_index = {s: i for i, s in enumerate(self.skills)}
+        self.shift_index = {s: i for i, s in enumerate(self.shifts)}
+        self.week_index = {w: i for i, w in enumerate(self.week_ids)}
+        self.contracts = {c["id"]: c for c in self.config.get("contracts", [])}
+
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+
+    def __reduce__(self):
+        # Pickle by path so pool workers re-map the files instead of copying arrays
+        return (CompiledScenario, (self.path,))
+
+    def history(self, history_id: str) -> Dict:
+        """INRC-II history record (as in H0-<id>-<k>.json) for a history id."""
+        h = self.history_ids.index(history_id)
+        values = np.asarray(self.nurse_history[h])
+        last = HISTORY_FIELDS.index("lastAssignedShiftType")
+        nurse_history = []
+        for i, nurse in enumerate(self.nurses):
+            record = {"nurse": nurse}
+            for field, value in zip(HISTORY_FIELDS, values[i].tolist()):
+                record[field] = value
+            record["lastAssignedShiftType"] = "None" if values[i, last] < 0 else self.shifts[values[i, last]]
+            nurse_history.append(record)
+        return {"week": self.history_weeks[h], "scenario": self.scenario_id, "nurseHistory": nurse_history}
+
+
+class ScenarioStore:
+    """Compiles the instances of one dataset folder on first use and opens them afterwards."""
+
+    def __init__(self, datasets_path: str, store_path: Optional[str] = None):
+        self.datasets_path = datasets_path
+        root = store_path or os.environ.get("SCENARIO_STORE_PATH", DEFAULT_STORE_PATH)
+        suite = os.path.basename(os.path.normpath(os.path.abspath(datasets_path)))
+        self.root = os.path.join(root, suite)
+        self.index_file = os.path.join(self.root, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file, "r") as f:
+                self.index = json.load(f)
+        self._open: Dict[str, CompiledScenario] = {}
+
+    def source_dir(self, scenario_id: str) -> Optional[str]:
+        """<datasets_path>/<scenario_id>/ or the flat datasets_path, whichever holds Sc-<id>.json."""
+        for path in (os.path.join(self.datasets_path, scenario_id), self.datasets_path):
+            if os.path.exists(os.path.join(path, f"Sc-{scenario_id}.json")):
+                return path
+        return None
+
+    def open(self, scenario_id: str) -> Optional[CompiledScenario]:
+        """Compiled instance, compiling it first if missing or stale; None if not found."""
+        if scenario_id in self._open:
+            return self._open[scenario_id]
+        source = self.source_dir(scenario_id)
+        if source is None:
+            return None
+
+        entry = self.index.get(scenario_id)
+        source_mtime = self._source_mtime(scenario_id, source)
+        if (entry is None or entry["version"] != STORE_VERSION
+                or entry["source_mtime"] < source_mtime
+                or not os.path.exists(os.path.join(self.root, scenario_id, "meta.json"))):
+            self.compile(scenario_id, source)
+
+        compiled = CompiledScenario(os.path.join(self.root, scenario_id))
+        self._open[scenario_id] = compiled
+        return compiled
+
+    @staticmethod
+    def _source_mtime(scenario_id: str, source: str) -> float:
+        # The folder mtime changes when week/history files are added or removed
+        return max(os.path.getmtime(os.path.join(source, f"Sc-{scenario_id}.json")),
+                   os.path.getmtime(source))
+
+    def compile(self, scenario_id: str, source: Optional[str] = None):
+        """Parse the JSON files of one instance and write its compiled form."""
+        source = source or self.source_dir(scenario_id)
+        with open(os.path.join(source, f"Sc-{scenario_id}.json"), "r") as f:
+            config = json.load(f)
+
+        names = os.listdir(source)
+        week_files = sorted((n for n in names if n.startswith(f"WD-{scenario_id}-")), key=_file_index)
+        history_files = sorted((n for n in names if n.startswith(f"H0-{scenario_id}-")), key=_file_index)
+
+        nurses = [n["id"] for n in config.get("nurses", [])]
+        skills = list(config.get("skills", []))
+        shifts = [s["id"] for s in config.get("shiftTypes", [])]
+        nurse_index = {n: i for i, n in enumerate(nurses)}
+        skill_index = {s: i for i, s in enumerate(skills)}
+        shift_index = {s: i for i, s in enumerate(shifts)}
+        days = len(WEEKDAY_NAMES)
+
+        nurse_skills = np.zeros((len(nurses), len(skills)), dtype=bool)
+        for i, nurse_data in enumerate(config.get("nurses", [])):
+            for skill in nurse_data.get("skills", []):
+                nurse_skills[i, skill_index[skill]] = True
+
+        demand_minimum = np.zeros((len(week_files), days, len(shifts), len(skills)), dtype=np.int16)
+        demand_optimal = np.zeros_like(demand_minimum)
+        shift_off = np.zeros((len(week_files), len(nurses), days, len(shifts)), dtype=bool)
+        for w, name in enumerate(week_files):
+            with open(os.path.join(source, name), "r") as f:
+                week = json.load(f)
+            for req in week.get("requirements", []):
+                s, k = shift_index.get(req.get("shiftType")), skill_index.get(req.get("skill"))
+                if s is None or k is None:
+                    continue
+                for d, day_name in enumerate(WEEKDAY_NAMES):
+                    requirement = req.get(f"requirementOn{day_name}", {})
+                    demand_minimum[w, d, s, k] = requirement.get("minimum", 0)
+                    demand_optimal[w, d, s, k] = requirement.get("optimal", 0)
+            for request in week.get("shiftOffRequests", []):
+                i = nurse_index.get(request.get("nurse"))
+                if i is None or request.get("day") not in WEEKDAY_NAMES:
+                    continue
+                d = WEEKDAY_NAMES.index(request["day"])
+                if request.get("shiftType") == "Any":
+                    shift_off[w, i, d, :] = True
+                elif request.get("shiftType") in shift_index:
+                    shift_off[w, i, d, shift_index[request["shiftType"]]] = True
+
+        nurse_history = np.zeros((len(history_files), len(nurses), len(HISTORY_FIELDS)), dtype=np.int32)
+        nurse_history[:, :, HISTORY_FIELDS.index("lastAssignedShiftType")] = -1
+        history_weeks = []
+        for h, name in enumerate(history_files):
+            with open(os.path.join(source, name), "r") as f:
+                data = json.load(f)
+            history_weeks.append(data.get("week", 0))
+            for record in data.get("nurseHistory", []):
+                i = nurse_index.get(record.get("nurse"))
+                if i is None:
+                    continue
+                for field_index, field in enumerate(HISTORY_FIELDS):
+                    value = record.get(field, 0)
+                    if field == "lastAssignedShiftType":
+                        value = shift_index.get(value, -1)
+                    nurse_history[h, i, field_index] = value
+
+        meta = {
+            "scenario_id": scenario_id,
+            "config": config,
+            "nurses": nurses,
+            "skills": skills,
+            "shifts": shifts,
+            "week_ids": [name.replace("WD-", "").replace(".json", "") for name in week_files],
+            "history_ids": [str(_file_index(name)) for name in history_files],
+            "history_weeks": history_weeks,
+        }
+
+        # Write next to the target and swap in, so readers never see half a compile
+        target = os.path.join(self.root, scenario_id)
+        staging = f"{target}.tmp{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        arrays = {
+            "nurse_skills": nurse_skills,
+            "demand_minimum": demand_minimum,
+            "demand_optimal": demand_optimal,
+            "shift_off": shift_off,
+            "nurse_history": nurse_history,
+        }
+        for name in ARRAYS:
+            np.save(os.path.join(staging, f"{name}.npy"), arrays[name])
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+
+        self.index[scenario_id] = {
+            "version": STORE_VERSION,
+            "source_mtime": self._source_mtime(scenario_id, source),
+            "weeks": meta["week_ids"],
+            "histories": meta["history_ids"],
+        }
+        index_tmp = f"{self.index_file}.tmp{os.getpid()}"
+        with open(index_tmp, "w") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(index_tmp, self.index_file)
+        self._open.pop(scenario_id, None)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Shift-sequence rules compiled into CP-SAT automata.
+
+Day-to-day rules (forbidden successions, minimum and maximum runs of a
+shift type, of working days and of days off) are usually posted as one
+clause per (day, pair) or one sum per sliding window, so the model grows
+with days x window x rules. SequenceRules compiles a contract's rules once
+and add_sequence_constraint posts them per nurse as at most two
+AddAutomaton constraints:
+
+- the shift automaton reads per-day shift codes (OFF = 0, shift i = i + 1)
+  and tracks the last code and its run length: forbidden successions and
+  runs of one shift type
+- the work automaton reads per-day working flags (0 = off, 1 = working) and
+  tracks the current run of working days or days off
+
+Keeping the two apart keeps each to a few dozen states; their product would
+multiply them, and CP-SAT expands every (day, transition) of an automaton
+into literals. Runs are capped at the largest value any rule looks at. The
+start states come from the run in progress before the first day (e.g. an
+INRC-II history record); every state is accepting.
+
+Hard rules remove transitions. Soft run limits price them instead: a
+transition costs the days by which the run it ends falls short of its
+minimum and the day it adds beyond a maximum, per kind of run (COSTS). Each
+label of an automaton is a (symbol, costs) pair, so the label chosen on a
+day fixes both the day's symbol and its cost variables. Runs still in
+progress after the last day are not priced as short, as in INRC-II.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from ortools.sat.python import cp_model
+
+OFF = 0  # shift code of a day off; shift i of the rule's shift list is i + 1
+COSTS = ("shift", "work", "off")  # soft run kinds: one shift type, working days, days off
+
+Run = Tuple[int, int]  # (last symbol, its run length)
+State = Tuple[Run, Run]  # (shift automaton state, work automaton state)
+Costs = Tuple[int, int, int]  # days of violation per kind in COSTS
+Limits = Tuple[int, Optional[int]]  # (minimum, maximum or None) run length
+Automaton = Tuple[int, List[int], List[Tuple[int, int, int]], List[Tuple[int, Costs]]]
+NO_COST: Costs = (0, 0, 0)
+
+
+def _short(limits: Optional[Limits], run: int) -> int:
+    """Days a finished run of `run` days falls short of its soft minimum."""
+    return max(0, limits[0] - run) if limits and run > 0 else 0
+
+
+def _excess(limits: Optional[Limits], run: int) -> int:
+    """1 if the day ending a run of `run` days lies beyond its soft maximum."""
+    return int(bool(limits) and limits[1] is not None and run > limits[1])
+
+
+def _cap(*bounds: Optional[int]) -> int:
+    """Largest run length a rule distinguishes; longer runs share its state."""
+    return max([b for b in bounds if b is not None], default=0)
+
+
+def _compile(start: Run, symbols: int, step: Callable[[Run, int], Optional[Tuple[Run, Costs]]]) -> Automaton:
+    """
+    (start index, final states, transition triples, labels) of the states
+    reachable from `start`. Label i is a (symbol, costs) pair; the first
+    labels are the free symbols, label == symbol, so automata without soft
+    costs label their transitions by symbol.
+    """
+    labels = {(symbol, NO_COST): symbol for symbol in range(symbols)}
+    index = {start: 0}
+    transitions, frontier = [], [start]
+    while frontier:
+        state = frontier.pop()
+        for symbol in range(symbols):
+            moved = step(state, symbol)
+            if moved is None:
+                continue
+            target, costs = moved
+            if target not in index:
+                index[target] = len(index)
+                frontier.append(target)
+            label = labels.setdefault((symbol, costs), len(labels))
+            transitions.append((index[state], label, index[target]))
+    return 0, list(range(len(index))), transitions, list(labels)
+
+
+class SequenceRules:
+    """Day-to-day rules of one contract over a list of shift names."""
+
+    def __init__(
+        self,
+        shifts: Sequence[str],
+        forbidden_successions: Optional[Dict[str, Sequence[str]]] = None,
+        max_consecutive: Optional[Dict[str, int]] = None,
+        max_working_days: Optional[int] = None,
+        max_days_off: Optional[int] = None,
+        consecutive_limits: Optional[Dict[str, Limits]] = None,
+        working_days_limits: Optional[Limits] = None,
+        days_off_limits: Optional[Limits] = None,
+    ):
+        self.shifts = list(shifts)
+        self.code = {shift: i + 1 for i, shift in enumerate(self.shifts)}
+        self.forbidden = {
+            (self.code[preceding], self.code[shift])
+            for preceding, succeeding in (forbidden_successions or {}).items()
+            for shift in succeeding
+            if preceding in self.code and shift in self.code
+        }
+        # Hard maxima
+        self.max_run = {self.code[s]: m for s, m in (max_consecutive or {}).items() if s in self.code}
+        self.max_working_days = max_working_days
+        self.max_days_off = max_days_off
+        # Soft (minimum, maximum) run lengths
+        self.run_limits = {self.code[s]: l for s, l in (consecutive_limits or {}).items() if s in self.code}
+        self.working_days_limits = working_days_limits
+        self.days_off_limits = days_off_limits
+
+        self.run_cap = {
+            code: _cap(self.max_run.get(code), *self.run_limits.get(code, ()))
+            for code in range(1, len(self.shifts) + 1)
+        }
+        self.working_cap = _cap(max_working_days, *(working_days_limits or ()))
+        self.off_cap = _cap(max_days_off, *(days_off_limits or ()))
+        # Without any rule on working days or days off the work automaton is left out
+        self.tracks_work = any(rule is not None for rule in
+                               (max_working_days, max_days_off, working_days_limits, days_off_limits))
+        self._automata = {}
+
+    def start_state(
+        self, last_shift: Optional[str] = None, shift_run: int = 0, working_days: int = 0, days_off: int = 0
+    ) -> State:
+        """State after a run in progress: the last shift (None or unknown = off) and its run lengths."""
+        last = self.code.get(last_shift, OFF)
+        if last == OFF:
+            return (OFF, 0), (0, min(days_off, self.off_cap))
+        return (last, min(shift_run, self.run_cap[last])), (1, min(working_days, self.working_cap))
+
+    def shift_transition(self, state: Run, code: int) -> Optional[Tuple[Run, Costs]]:
+        """Shift automaton: state and soft costs after `code`, or None if a hard rule forbids it."""
+        last, run = state
+        if code == OFF:
+            return (OFF, 0), (_short(self.run_limits.get(last), run), 0, 0)
+        if (last, code) in self.forbidden:
+            return None
+        shift_run = run + 1 if last == code else 1
+        if code in self.max_run and shift_run > self.max_run[code]:
+            return None
+        ended = _short(self.run_limits.get(last), run) if last != code else 0
+        cost = ended + _excess(self.run_limits.get(code), shift_run)
+        return (code, min(shift_run, self.run_cap[code])), (cost, 0, 0)
+
+    def work_transition(self, state: Run, works: int) -> Optional[Tuple[Run, Costs]]:
+        """Work automaton: state and soft costs after a working day (1) or day off (0), or None if forbidden."""
+        worked, run = state
+        length = run + 1 if worked == works else 1
+        if works:
+            if self.max_working_days is not None and length > self.max_working_days:
+                return None
+            ended = _short(self.days_off_limits, run) if not worked else 0
+            return (1, min(length, self.working_cap)), (0, _excess(self.working_days_limits, length), ended)
+        if self.max_days_off is not None and length > self.max_days_off:
+            return None
+        ended = _short(self.working_days_limits, run) if worked else 0
+        return (0, min(length, self.off_cap)), (0, ended, _excess(self.days_off_limits, length))
+
+    def transition(self, state: State, code: int) -> Optional[Tuple[State, Costs]]:
+        """Both automata after working `code` (OFF for a day off): state and summed soft costs, or None."""
+        shift = self.shift_transition(state[0], code)
+        work = self.work_transition(state[1], int(code != OFF))
+        if shift is None or work is None:
+            return None
+        return (shift[0], work[0]), tuple(a + b for a, b in zip(shift[1], work[1]))
+
+    def next_state(self, state: State, code: int) -> Optional[State]:
+        """State after working `code` (OFF for a day off), or None if a hard rule forbids it."""
+        step = self.transition(state, code)
+        return None if step is None else step[0]
+
+    def automata(self, start: State) -> Tuple[Automaton, Optional[Automaton]]:
+        """The shift automaton from start[0] and the work automaton from start[1] (None if not tracked)."""
+        if start not in self._automata:
+            shift = _compile(start[0], len(self.shifts) + 1, self.shift_transition)
+            work = _compile(start[1], 2, self.work_transition) if self.tracks_work else None
+            self._automata[start] = (shift, work)
+        return self._automata[start]
+
+
+def _post_automaton(
+    model: cp_model.CpModel, automaton: Automaton, symbols: List, name: str
+) -> Dict[str, List[cp_model.IntVar]]:
+    """AddAutomaton over `symbols`; returns the per-day cost variables of each kind the labels charge."""
+    start_index, finals, transitions, labels = automaton
+    if all(costs == NO_COST for _, costs in labels):
+        model.AddAutomaton(symbols, start_index, finals, transitions)
+        return {}
+
+    # Each day's label picks its symbol and costs from the label table
+    label_symbols = [symbol for symbol, _ in labels]
+    label_costs = {kind: [costs[k] for _, costs in labels] for k, kind in enumerate(COSTS)}
+    label_costs = {kind: values for kind, values in label_costs.items() if any(values)}
+    day_labels = []
+    costs = {kind: [] for kind in label_costs}
+    for day, symbol in enumerate(symbols):
+        label = model.NewIntVar(0, len(labels) - 1, f"{name}_label_{day}")
+        model.AddElement(label, label_symbols, symbol)
+        for kind, values in label_costs.items():
+            cost = model.NewIntVar(0, max(values), f"{name}_{kind}_cost_{day}")
+            model.AddElement(label, values, cost)
+            costs[kind].append(cost)
+        day_labels.append(label)
+    model.AddAutomaton(day_labels, start_index, finals, transitions)
+    return costs
+
+
+def add_sequence_constraint(
+    model: cp_model.CpModel,
+    rules: SequenceRules,
+    day_vars: Sequence[Sequence],
+    start: Optional[State] = None,
+    name: str = "",
+    working: Optional[Sequence] = None,
+) -> Tuple[List[cp_model.IntVar], Dict[str, List[cp_model.IntVar]]]:
+    """
+    Post `rules` over one nurse's days as the shift automaton and, if the
+    rules look at working days or days off, the work automaton. `day_vars`
+    holds per day the Boolean assignment variables in rules.shifts order, at
+    most one of which may be true (the caller's constraint); `working` the
+    per-day working literals if the caller has them already. Returns the
+    per-day shift-code variables and, for each kind in COSTS that the rules
+    can charge, the per-day soft cost variables in days.
+    """
+    codes = []
+    for day, row in enumerate(day_vars):
+        code = model.NewIntVar(0, len(rules.shifts), f"{name}_code_{day}")
+        model.Add(code == sum(rules.code[shift] * var for shift, var in zip(rules.shifts, row)))
+        codes.append(code)
+    shift_automaton, work_automaton = rules.automata(start or rules.start_state())
+    costs = _post_automaton(model, shift_automaton, codes, f"{name}_shift")
+    if work_automaton is not None:
+        if working is None:
+            working = []
+            for day, row in enumerate(day_vars):
+                works = model.NewBoolVar(f"{name}_works_{day}")
+                model.Add(works == sum(row))
+                working.append(works)
+        costs.update(_post_automaton(model, work_automaton, working, f"{name}_work"))
+    return codes, costs
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+CP-SAT worker allocation, subsolvers and seeds shared by the rostering solvers.
+
+The same code runs on 2-vCPU Lambda functions and 32-core batch hosts, so
+the number of search workers is taken from the CPUs the process may actually
+use: the scheduler affinity mask, capped by a cgroup v2 (cpu.max) or v1
+(cpu.cfs_quota_us) quota. os.cpu_count() reports the host's cores instead,
+which oversubscribes a container.
+
+SolverConfig holds one solver setting:
+
+- num_workers: CP-SAT search workers per solve (None = available_cpus())
+- subsolvers: None for CP-SAT's default portfolio, or a fixed list of
+  subsolver names (e.g. ["default_lp", "max_lp", "core", "quick_restart"])
+- random_seed: seed of a single solve (None = CP-SAT default)
+- seeds: number of independent solves with seeds random_seed, +1, ...; with
+  more than one, they run in a process pool splitting the CPUs between them
+  and the best solution is kept
+- parameters: any other SatParameters fields by name, e.g.
+  {"linearization_level": 2, "search_branching": "PSEUDO_COST_SEARCH"}
+  (enum fields by name or number)
+
+Configs round-trip through plain dicts (from_dict / as_dict), the format
+of event "solver" blocks and tuned profiles. SolverConfig.solve returns a
+CpSolver, or for pooled seeds a SeededSolution with the same accessors, so
+callers read values the same way either way.
+
+SolverProfiles reads the per-size-class settings written by tuning.py:
+
+    {"profiles": {"small": {"max_nurses": 40, "solver": {...}, "time_limit": 4.0}, ...}}
+
+Wards map to the first class whose max_nurses (None = unbounded) they fit.
+"""
+
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from ortools.sat.python import cp_model
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Ward size classes of tuned profiles: name -> largest nurse count (None = unbounded)
+SIZE_CLASSES = {"small": 40, "medium": 80, "large": None}
+
+
+def _cgroup_quota() -> Optional[float]:
+    """CPU quota of this process's cgroup in CPUs, or None if unlimited or unknown."""
+    try:
+        with open("/proc/self/cgroup", "r") as f:
+            unified = [line.rstrip("\n").split(":", 2)[2] for line in f if line.startswith("0::")]
+    except OSError:
+        unified = []
+    # cgroup v2: "<quota> <period>" or "max <period>", in the own cgroup or at the mount root
+    for directory in [os.path.join(CGROUP_ROOT, path.lstrip("/")) for path in unified] + [CGROUP_ROOT]:
+        try:
+            with open(os.path.join(directory, "cpu.max"), "r") as f:
+                quota, period = f.read().split()[:2]
+        except (OSError, ValueError):
+            continue
+        return None if quota == "max" else int(quota) / int(period)
+    # cgroup v1: quota -1 means unlimited
+    for directory in ("cpu", "cpu,cpuacct"):
+        try:
+            with open(os.path.join(CGROUP_ROOT, directory, "cpu.cfs_quota_us"), "r") as f:
+                quota = int(f.read())
+            with open(os.path.join(CGROUP_ROOT, directory, "cpu.cfs_period_us"), "r") as f:
+                period = int(f.read())
+        except (OSError, ValueError):
+            continue
+        return None if quota <= 0 or period <= 0 else quota / period
+    return None
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: the affinity mask, capped by the cgroup CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS / Windows
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_quota()
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+class SolverConfig:
+    """Search workers, subsolver portfolio, seeds and extra SatParameters of a CP-SAT solve."""
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        subsolvers: Optional[List[str]] = None,
+        random_seed: Optional[int] = None,
+        seeds: int = 1,
+        parameters: Optional[Dict] = None,
+    ):
+        self.num_workers = num_workers
+        self.subsolvers = list(subsolvers) if subsolvers else None
+        self.random_seed = random_seed
+        self.seeds = max(1, int(seeds))
+        self.parameters = dict(parameters or {})
+
+    @classmethod
+    def from_dict(cls, config: Optional[Dict]) -> "SolverConfig":
+        """Config from an event/profile dict; unknown keys are SatParameters fields."""
+        config = dict(config or {})
+        return cls(
+            num_workers=config.pop("num_workers", None),
+            subsolvers=config.pop("subsolvers", None),
+            random_seed=config.pop("random_seed", None),
+            seeds=config.pop("seeds", 1),
+            parameters={**config.pop("parameters", {}), **config},
+        )
+
+    def as_dict(self) -> Dict:
+        return {
+            "num_workers": self.num_workers,
+            "subsolvers": self.subsolvers,
+            "random_seed": self.random_seed,
+            "seeds": self.seeds,
+            "parameters": dict(self.parameters),
+        }
+
+    def with_workers(self, num_workers: Optional[int]) -> "SolverConfig":
+        """Copy with another worker count, e.g. a share of the CPUs for one pool process."""
+        config = SolverConfig.from_dict(self.as_dict())
+        config.num_workers = num_workers
+        return config
+
+    @property
+    def workers(self) -> int:
+        """Search workers of one solve, resolving None to the available CPUs."""
+        return max(1, int(self.num_workers or available_cpus()))
+
+    def apply(self, solver: cp_model.CpSolver, time_limit: Optional[float] = None,
+              seed_offset: int = 0) -> cp_model.CpSolver:
+        """Set this config's parameters (and a time limit) on a CpSolver."""
+        for name, value in self.parameters.items():
+            current = getattr(solver.parameters, name)
+            if isinstance(value, (list, tuple)):
+                current.extend(value)
+                continue
+            if hasattr(type(current), "__members__"):  # enum field, given by name or number
+                value = getattr(type(current), value) if isinstance(value, str) else type(current)(value)
+            setattr(solver.parameters, name, value)
+        solver.parameters.num_workers = self.workers
+        if self.subsolvers:
+            solver.parameters.subsolvers.extend(self.subsolvers)
+        if self.random_seed is not None or seed_offset:
+            solver.parameters.random_seed = (self.random_seed or 0) + seed_offset
+        if time_limit is not None:
+            solver.parameters.max_time_in_seconds = time_limit
+        return solver
+
+    def solver(self, time_limit: Optional[float] = None) -> cp_model.CpSolver:
+        """A configured CpSolver for a single solve."""
+        return self.apply(cp_model.CpSolver(), time_limit)
+
+    def solve(self, model: cp_model.CpModel, time_limit: Optional[float] = None,
+              recorder=None) -> Tuple[object, int]:
+        """
+        Solve `model`; returns (solver, status). With seeds > 1 the seeded
+        solves run in a process pool (one after another where pools are
+        unavailable, sharing the time limit) and the solver returned is the
+        best run's SeededSolution. `recorder` (solver_progress) is the solve
+        callback, or for pooled seeds receives the best run's incumbents and
+        stop reason; its early-stop policy applies to every seeded solve.
+        """
+        if self.seeds == 1:
+            solver = self.solver(time_limit)
+            status = solver.Solve(model, recorder) if recorder is not None else solver.Solve(model)
+            return solver, status
+
+        processes = min(self.seeds, available_cpus())
+        rounds = -(-self.seeds // processes)
+        per_process = self.with_workers(max(1, self.workers // processes)).as_dict()
+        model_text = str(model.Proto())
+        policy = {name: getattr(recorder, name, None)
+                  for name in ("relative_gap", "stagnation_seconds", "target_objective")}
+        jobs = [(model_text, per_process, offset, time_limit and time_limit / rounds, policy)
+                for offset in range(self.seeds)]
+        try:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                runs = list(pool.map(_seeded_solve, *zip(*jobs)))
+        except (OSError, NotImplementedError):
+            sequential_limit = time_limit and time_limit / self.seeds
+            runs = [_seeded_solve(text, config, offset, sequential_limit, policy)
+                    for text, config, offset, _, policy in jobs]
+
+        solved = [r for r in runs if r["status"] in (cp_model.OPTIMAL, cp_model.FEASIBLE)]
+        sense = -1 if model.Proto().objective.scaling_factor < 0 else 1
+        best = min(solved, key=lambda r: sense * r["objective"]) if solved else runs[0]
+        if recorder is not None:
+            for incumbent in best["incumbents"]:
+                recorder.incumbents.append(incumbent)
+                if getattr(recorder, "on_incumbent", None) is not None:
+                    recorder.on_incumbent(incumbent)
+            if best["stop_reason"] is not None:
+                recorder.stop_reason = best["stop_reason"]
+        return SeededSolution(best, runs), best["status"]
+
+
+class SeededSolution:
+    """Best run of a pooled multi-seed solve, read through the CpSolver accessors."""
+
+    def __init__(self, run: Dict, runs: List[Dict]):
+        self.run = run
+        self.seeds = [{k: r[k] for k in ("seed", "status", "objective", "wall_time")} for r in runs]
+        self._solution = run["solution"]
+
+    def Value(self, var) -> int:
+        return self._solution[var.Index()]
+
+    def BooleanValue(self, literal) -> bool:
+        index = literal.Index()
+        return bool(self._solution[index]) if index >= 0 else not self._solution[-index - 1]
+
+    def ObjectiveValue(self) -> float:
+        return self.run["objective"]
+
+    def BestObjectiveBound(self) -> float:
+        return self.run["bound"]
+
+    def StatusName(self, status: Optional[int] = None) -> str:
+        return cp_model.CpSolver().StatusName(self.run["status"] if status is None else status)
+
+    def WallTime(self) -> float:
+        return self.run["wall_time"]
+
+    def NumConflicts(self) -> int:
+        return self.run["conflicts"]
+
+    def NumBranches(self) -> int:
+        return self.run["branches"]
+
+
+def _seeded_solve(model_text: str, config: Dict, seed_offset: int, time_limit: Optional[float],
+                  policy: Dict) -> Dict:
+    """One seeded solve of a text-format model; runs inside a pool worker process."""
+    from solver_progress import EarlyStopRecorder
+
+    model = cp_model.CpModel()
+    model.Proto().parse_text_format(model_text)
+    solver = SolverConfig.from_dict(config).apply(cp_model.CpSolver(), time_limit, seed_offset)
+    recorder = EarlyStopRecorder(policy=policy)
+    start = time.perf_counter()
+    with recorder.watching():
+        status = solver.Solve(model, recorder)
+    has_solution = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return {
+        "seed": solver.parameters.random_seed,
+        "status": status,
+        "objective": solver.ObjectiveValue() if has_solution else None,
+        "bound": solver.BestObjectiveBound() if has_solution else None,
+        "wall_time": time.perf_counter() - start,
+        "conflicts": solver.NumConflicts(),
+        "branches": solver.NumBranches(),
+        "solution": list(solver.ResponseProto().solution) if has_solution else [],
+        "incumbents": recorder.incumbents,
+        "stop_reason": recorder.stop_reason,
+    }
+
+
+def size_class(num_nurses: int) -> str:
+    """Name of the SIZE_CLASSES entry for a ward of `num_nurses` nurses."""
+    for name, max_nurses in SIZE_CLASSES.items():
+        if max_nurses is None or num_nurses <= max_nurses:
+            return name
+    return list(SIZE_CLASSES)[-1]
+
+
+class SolverProfiles:
+    """Tuned solver settings per ward size class (the file written by tuning.py)."""
+
+    def __init__(self, profiles: Dict):
+        self.profiles = profiles
+
+    @classmethod
+    def load(cls, path: str) -> "SolverProfiles":
+        with open(path, "r") as f:
+            return cls(json.load(f).get("profiles", {}))
+
+    def profile(self, num_nurses: int) -> Optional[Dict]:
+        """Profile of the smallest class that fits `num_nurses`, or None."""
+        fitting = [p for p in self.profiles.values()
+                   if p.get("max_nurses") is None or num_nurses <= p["max_nurses"]]
+        fitting.sort(key=lambda p: math.inf if p.get("max_nurses") is None else p["max_nurses"])
+        return fitting[0] if fitting else None
+
+    def config(self, num_nurses: int) -> Optional[SolverConfig]:
+        profile = self.profile(num_nurses)
+        return SolverConfig.from_dict(profile["solver"]) if profile else None
+
+    def time_limit(self, num_nurses: int) -> Optional[float]:
+        """Tuned time limit for the ward size: where the winning settings reached their best."""
+        profile = self.profile(num_nurses)
+        return profile.get("time_limit") if profile else None
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+CP-SAT progress instrumentation shared by the rostering solvers.
+
+SolverInstrumentation turns a solve into structured records that can be
+plugged into any metrics sink (a callable taking one dict):
+
+- {"type": "phase", "phase": "load|forecast|build|greedy|solve|lns|extract|report", "seconds": ...}
+- {"type": "model", "variables": ..., "constraints": ..., "objective_terms": ...}
+- {"type": "incumbent", "wall_time": ..., "objective": ..., "bound": ...}
+- {"type": "solve", "status": ..., "stop_reason": ..., "objective": ..., "bound": ...}
+- {"type": "block", "skill": ..., "nurses": ..., "status": ..., "uncovered": ...}
+- {"type": "lns", "iterations": ..., "initial_objective": ..., "objective": ..., "operators": ...}
+- {"type": "repair", "scope": "local|full", "changes": ..., "uncovered": ..., "seconds": ...}
+- {"type": "batch", "wards": ..., "mode": ..., "num_processes": ..., "total_time": ...}
+
+Every record also carries the instrumentation's labels (e.g. scenario_id,
+ward_id) and a Unix timestamp. JsonLinesSink writes one JSON object per
+line, which CloudWatch and most log shippers parse as structured events.
+
+EarlyStopRecorder ends a solve once the incumbent is good enough or has
+stopped improving. Policies are plain dicts:
+
+    {"relative_gap": 0.01, "stagnation_seconds": 5.0, "target_objective": None}
+
+- relative_gap: stop when |objective - bound| <= gap * max(1, |objective|)
+- stagnation_seconds: stop when no better incumbent arrived for this long
+- target_objective: stop as soon as the objective is at or below this value
+"""
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from ortools.sat.python import cp_model
+
+
+class IncumbentRecorder(cp_model.CpSolverSolutionCallback):
+    """Records wall time, objective and best bound for every incumbent."""
+
+    def __init__(self, on_incumbent: Optional[Callable[[Dict], None]] = None):
+        super().__init__()
+        self.incumbents: List[Dict] = []
+        self.on_incumbent = on_incumbent
+
+    def OnSolutionCallback(self):
+        incumbent = {
+            "wall_time": self.WallTime(),
+            "objective": self.ObjectiveValue(),
+            "bound": self.BestObjectiveBound(),
+        }
+        self.incumbents.append(incumbent)
+        if self.on_incumbent is not None:
+            self.on_incumbent(incumbent)
+
+    @property
+    def time_to_first(self) -> Optional[float]:
+        return self.incumbents[0]["wall_time"] if self.incumbents else None
+
+    @property
+    def time_to_best(self) -> Optional[float]:
+        return self.incumbents[-1]["wall_time"] if self.incumbents else None
+
+
+class EarlyStopRecorder(IncumbentRecorder):
+    """IncumbentRecorder that stops the search according to an early-stop policy.
+
+    Gap and target rules are checked on every incumbent. Stagnation cannot be
+    seen from the callback alone (it only fires on improvements), so a
+    watchdog thread runs for the duration of `watching()`.
+    """
+
+    WATCHDOG_POLL_SECONDS = 0.05
+
+    def __init__(self, policy: Optional[Dict] = None,
+                 on_incumbent: Optional[Callable[[Dict], None]] = None):
+        super().__init__(on_incumbent=on_incumbent)
+        policy = policy or {}
+        self.relative_gap = policy.get("relative_gap")
+        self.stagnation_seconds = policy.get("stagnation_seconds")
+        self.target_objective = policy.get("target_objective")
+        self.stop_reason: Optional[str] = None
+        self._last_improvement: Optional[float] = None
+        self._done = threading.Event()
+
+    def OnSolutionCallback(self):
+        super().OnSolutionCallback()
+        self._last_improvement = time.perf_counter()
+        objective, bound = self.incumbents[-1]["objective"], self.incumbents[-1]["bound"]
+        if self.target_objective is not None and objective <= self.target_objective:
+            self._stop("target_objective")
+        elif (self.relative_gap is not None
+              and abs(objective - bound) <= self.relative_gap * max(1.0, abs(objective))):
+            self._stop("relative_gap")
+
+    def _stop(self, reason: str):
+        if self.stop_reason is None:
+            self.stop_reason = reason
+            self.StopSearch()
+
+    def _watch(self):
+        while not self._done.wait(self.WATCHDOG_POLL_SECONDS):
+            if (self._last_improvement is not None
+                    and time.perf_counter() - self._last_improvement >= self.stagnation_seconds):
+                self._stop("stagnation")
+                return
+
+    @contextmanager
+    def watching(self):
+        """Run the stagnation watchdog around a Solve call."""
+        watchdog = None
+        if self.stagnation_seconds is not None:
+            watchdog = threading.Thread(target=self._watch, daemon=True)
+            watchdog.start()
+        try:
+            yield self
+        finally:
+            self._done.set()
+            if watchdog is not None:
+                watchdog.join()
+
+    def final_stop_reason(self, status) -> str:
+        """Why the solve ended: the policy rule that fired, or the solver's own reason."""
+        if self.stop_reason is not None:
+            return self.stop_reason
+        if status == cp_model.OPTIMAL:
+            return "optimal"
+        if status == cp_model.INFEASIBLE:
+            return "infeasible"
+        return "time_limit"
+
+
+class JsonLinesSink:
+    """Metrics sink writing each record as a single JSON line."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def __call__(self, record: Dict):
+        self.stream.write(json.dumps(record, default=str) + "\n")
+        self.stream.flush()
+
+
+class SolverInstrumentation:
+    """Collects structured solver telemetry and forwards it to an optional sink."""
+
+    def __init__(self, sink: Optional[Callable[[Dict], None]] = None, **labels):
+        self.sink = sink
+        self.labels = labels
+        self.records: List[Dict] = []
+
+    def emit(self, record_type: str, **fields) -> Dict:
+        record = {"type": record_type, "timestamp": time.time(), **self.labels, **fields}
+        self.records.append(record)
+        if self.sink is not None:
+            self.sink(record)
+        return record
+
+    def forward(self, records: List[Dict], **fields):
+        """Re-emit records collected by another instrumentation, e.g. in a pool worker."""
+        for record in records:
+            record = {**record, **self.labels, **fields}
+            self.records.append(record)
+            if self.sink is not None:
+                self.sink(record)
+
+    @contextmanager
+    def phase(self, name: str, **fields):
+        """Time a block of work and emit it as a phase record."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.emit("phase", phase=name, seconds=time.perf_counter() - start, **fields)
+
+    def model_stats(self, model: cp_model.CpModel, **fields) -> Dict:
+        proto = model.Proto()
+        return self.emit(
+            "model",
+            variables=len(proto.variables),
+            constraints=len(proto.constraints),
+            objective_terms=len(proto.objective.vars),
+            **fields,
+        )
+
+    def recorder(self, early_stop: Optional[Dict] = None, **fields) -> EarlyStopRecorder:
+        """Solution callback that emits one incumbent record per improvement
+        and applies the given early-stop policy."""
+        return EarlyStopRecorder(
+            policy=early_stop,
+            on_incumbent=lambda inc: self.emit("incumbent", **fields, **inc),
+        )
+
+    def solve_summary(self, solver: cp_model.CpSolver, status, **fields) -> Dict:
+        has_solution = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        return self.emit(
+            "solve",
+            status=solver.StatusName(status),
+            objective=solver.ObjectiveValue() if has_solution else None,
+            bound=solver.BestObjectiveBound() if has_solution else None,
+            wall_time=solver.WallTime(),
+            conflicts=solver.NumConflicts(),
+            branches=solver.NumBranches(),
+            **fields,
+        )
+
+    def timeline(self) -> List[Dict]:
+        """Incumbent records collected so far, in order."""
+        return [r for r in self.records if r["type"] == "incumbent"]
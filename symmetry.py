@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Symmetry breaking for interchangeable nurses in the CP-SAT roster models.
+
+Nurses with identical data (skills, contract, preferences, history, requests)
+can swap whole weekly rows without changing feasibility or objective, so the
+search otherwise revisits every permutation of them. equivalence_classes
+groups such nurses by a caller-supplied signature and add_lex_ordering
+requires their assignment rows to be in non-increasing lexicographic order,
+leaving one representative of every permutation class.
+
+The ordering is a chain of clauses over "prefix still equal" literals rather
+than one weighted sum per pair: 2^k coefficients give a useless LP relaxation.
+It mostly pays off on tight wards where closing the gap is the bottleneck;
+on easy wards it can slow down finding good rosters, so callers keep it
+optional.
+
+Hints and fixed assignments must respect the same order; sort_rows permutes
+an assignment (e.g. a warm-start roster) within each class accordingly.
+"""
+
+from collections import defaultdict
+from typing import Hashable, List, Sequence
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+
+def equivalence_classes(signatures: Sequence[Hashable]) -> List[List[int]]:
+    """Indices grouped by identical signature, in input order; singletons are dropped."""
+    groups = defaultdict(list)
+    for index, signature in enumerate(signatures):
+        groups[signature].append(index)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def _add_lex_geq(model: cp_model.CpModel, first: Sequence, second: Sequence, name: str):
+    """first >=lex second for two equal-length lists of Boolean variables."""
+    equal = None  # literal "first[:k] == second[:k]"; None while k == 0 (always true)
+    for k, (a, b) in enumerate(zip(first, second)):
+        prefix = [] if equal is None else [equal.Not()]
+        model.AddBoolOr(prefix + [a, b.Not()])  # prefix equal -> a >= b
+        if k == len(first) - 1:
+            break
+        # prefix equal and a == b -> still equal after position k
+        next_equal = model.NewBoolVar(f"{name}_eq{k}")
+        model.AddBoolOr(prefix + [next_equal, a.Not(), b.Not()])
+        model.AddBoolOr(prefix + [next_equal, a, b])
+        equal = next_equal
+
+
+def add_lex_ordering(model: cp_model.CpModel, rows: Sequence[Sequence], classes: List[List[int]]) -> int:
+    """
+    Require rows[a] >=lex rows[b] for consecutive members a, b of every class.
+    Each row is a list of Boolean variables, all of the same length. Returns
+    the number of ordered pairs.
+    """
+    added = 0
+    for members in classes:
+        for a, b in zip(members, members[1:]):
+            _add_lex_geq(model, rows[a], rows[b], f"lex_{a}_{b}")
+            added += 1
+    return added
+
+
+def sort_rows(values: np.ndarray, classes: List[List[int]]) -> np.ndarray:
+    """
+    Row permutation (new row -> source row) that puts the 0/1 `values` of
+    every class in the order add_lex_ordering enforces. Rows outside any class
+    stay in place.
+    """
+    order = np.arange(len(values))
+    flat = np.asarray(values, dtype=np.int64).reshape(len(values), -1)
+    for members in classes:
+        order[members] = sorted(members, key=lambda i: tuple(-flat[i]))
+    return order
@@ -0,0 +1,42 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+from benchmark import bound_gap, reference_runs, relative_gap
+from final_complete_system import FinalMalaysianNurseRoster
+from solver_progress import SolverInstrumentation
+
+TEST_DATASETS = os.path.join(os.path.dirname(__file__), "..", "dataset", "testdatasets_json")
+
+
+@pytest.fixture
+def system(tmp_path):
+    system = FinalMalaysianNurseRoster(TEST_DATASETS, instrumentation=SolverInstrumentation(),
+                                       output_dir=str(tmp_path), store_path=str(tmp_path / "store"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert system._load_scenario("n005w4")
+    return system
+
+
+def test_reference_rosters_are_scored_under_inrc2_rules(system):
+    runs = {run["reference"]: run for run in reference_runs(TEST_DATASETS, "n005w4")}
+    run = runs["Solution_H_0-WD_1-2-3-3"]
+
+    evaluation = system.evaluate_rolling_horizon(
+        "n005w4", run["weekly_assignments"], run["week_demand_ids"], history_id=run["history_id"])
+
+    assert evaluation["feasible"]
+    assert evaluation["objective"] == 1695
+
+
+def test_reference_gap_is_relative_to_the_reference():
+    assert relative_gap(1500, 1000) == 0.5
+    assert relative_gap(500, 1000) == -0.5
+    assert relative_gap(None, 1000) is None
+
+
+def test_bound_gap_is_relative_to_the_objective():
+    assert bound_gap(1000, 500) == 0.5
+    assert bound_gap(1000, None) is None
@@ -0,0 +1,77 @@
+import numpy as np
+
+from cleaning_data import COLUMNS, staffing_table, write_columnar
+from demand_forecast import NUM_DAYS, fit_forecast, forecast_demand, load_weekly_nurses, weekly_to_demand
+
+
+def _write_weekly_csv(path, values, first_year=2020):
+    lines = ["Week,Total_Nurses"]
+    for i, value in enumerate(values):
+        lines.append(f"{first_year + i // 52}-{i % 52 + 1:02d},{value}")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def _write_surveillance_csv(path):
+    lines = [",".join(COLUMNS)]
+    for country, site_type, positives in [("Malaysia", "Sentinel", 400), ("Malaysia", "Non-sentinel", 800),
+                                          ("Singapore", "Sentinel", 1200)]:
+        for week in range(1, 7):
+            day = np.datetime64("2024-01-01") + 7 * (week - 1)
+            lines.append(f"{country},{site_type},2024-{week:02d},{day},{10 * positives},{positives * week}")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_columnar_table_round_trips_into_load_weekly_nurses(tmp_path):
+    csv = tmp_path / "flunet.csv"
+    _write_surveillance_csv(csv)
+
+    written = write_columnar(staffing_table(str(csv)), str(tmp_path / "weekly.npz"))
+
+    for options in [{}, {"country": "Malaysia"}, {"country": "Malaysia", "site_types": ["Sentinel"]}]:
+        weeks, series = load_weekly_nurses(written, **options)
+        expected_weeks, expected = load_weekly_nurses(str(csv), **options)
+        assert (weeks == expected_weeks).all()
+        np.testing.assert_allclose(series, expected, rtol=1e-6)
+    assert len(weeks) == 6 and (series > 0).all()
+
+
+def test_forecast_demand_is_a_day_by_shift_matrix_on_top_of_the_base(tmp_path):
+    csv = tmp_path / "weekly.csv"
+    _write_weekly_csv(csv, [14] * 10)
+    base = np.full((NUM_DAYS, 2), 4)
+
+    result = forecast_demand(str(csv), weeks_ahead=1, base=base)
+
+    demand = np.array(result["demand"])
+    assert demand.shape == (NUM_DAYS, 2)
+    assert demand.dtype.kind == "i"
+    # A flat series of 14 forecasts 14; 14 * 1/2 per shift added to every day
+    assert result["weekly_nurses"] == 14
+    assert (demand == base + 7).all()
+    assert result["week_start"] == "2020-03-09"  # ISO week 2020-10 starts 2020-03-02
+
+
+def test_seasonal_series_uses_holt_winters_and_stays_non_negative():
+    weeks = np.arange(3 * 52)
+    series = 20 + 10 * np.sin(2 * np.pi * weeks / 52)
+    fit = fit_forecast(series, horizon=4)
+    assert fit["method"] == "holt_winters"
+    assert fit["forecast"].shape == (4,)
+    assert (fit["forecast"] >= 0).all()
+
+
+def test_weekly_to_demand_spreads_by_day_profile_and_shift_share():
+    profile = [0, 1, 1, 1, 1, 1, 0]
+    demand = weekly_to_demand(3, day_profile=profile, shift_share=(2 / 3, 1 / 3))
+    assert demand.tolist() == [[0, 0]] + [[2, 1]] * 5 + [[0, 0]]
+
+
+def test_weekly_to_demand_adds_the_forecast_rounded_once():
+    profile = np.array([1, 2, 2, 2, 2, 2, 1]) / 12
+    for weekly in (0.87, 10.3, 14.0):
+        extra = weekly_to_demand(weekly, day_profile=profile)
+        exact = weekly * np.outer(profile, (0.5, 0.5))
+        assert extra.sum() == np.ceil(weekly)
+        assert (np.abs(extra - exact) < 1).all()
+    # 0.87 nurses on the default profile (0.435 per cell, 6.09 in all) adds 7 nurses, not 14
+    assert weekly_to_demand(0.87).sum() == 7
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pytest
+
+from inrc2_scorer import Inrc2Scorer, _runs, read_solution_folder
+from scenario_store import ScenarioStore
+
+TEST_DATASETS = os.path.join(os.path.dirname(__file__), "..", "dataset", "testdatasets_json")
+REFERENCE = os.path.join(TEST_DATASETS, "n005w4", "Solution_H_0-WD_1-2-3-3")
+
+
+@pytest.fixture(scope="module")
+def scenario(tmp_path_factory):
+    store = ScenarioStore(TEST_DATASETS, str(tmp_path_factory.mktemp("store")))
+    return store.open("n005w4")
+
+
+def test_reference_solution_matches_its_published_cost(scenario):
+    history_id, week_ids, weekly = read_solution_folder(REFERENCE, "n005w4")
+    assert (history_id, week_ids) == ("0", ["n005w4-1", "n005w4-2", "n005w4-3", "n005w4-3"])
+
+    result = Inrc2Scorer(scenario, week_ids, history_id).score(weekly)
+
+    assert result["feasible"]
+    assert result["penalty"] == 1695
+    assert result["weighted"] == {
+        "optimal_coverage": 240, "consecutive_shift": 195, "consecutive_work": 270,
+        "consecutive_off": 330, "preferences": 70, "complete_weekends": 60,
+        "total_assignments": 320, "working_weekends": 210,
+    }
+
+
+def test_dropping_an_assignment_is_reported_as_understaffing(scenario):
+    history_id, week_ids, weekly = read_solution_folder(REFERENCE, "n005w4")
+    scorer = Inrc2Scorer(scenario, week_ids, history_id)
+    codes, skills, duplicates = scorer.encode(weekly)
+    # Without skills the allocation is greedy; emptying a whole day leaves its minimum uncovered
+    codes[:, 0] = -1
+    result = scorer.score_batch(codes, None, duplicates)
+    assert not result["feasible"]
+    assert result["hard"]["understaffing"] == scenario.demand_minimum[scenario.week_index["n005w4-1"]][0].sum()
+
+
+def test_runs_penalise_excess_days_and_short_finished_runs():
+    on = np.array([[1, 1, 1, 1, 0, 1, 0, 1]], dtype=bool)
+    # run of 4 (1 over max 3), run of 1 (1 short of min 2); the final run is in progress
+    assert _runs(on, np.array([0]), np.array([2]), np.array([3])).tolist() == [2]
+    # a carried run of 2 makes the first run 6 long: 3 days over
+    assert _runs(on, np.array([2]), np.array([2]), np.array([3])).tolist() == [4]
+    # a carried run that ends before day 0 is still checked against the minimum
+    off_first = np.array([[0, 1, 1, 0, 0, 0, 0, 0]], dtype=bool)
+    assert _runs(off_first, np.array([1]), np.array([2]), np.array([9])).tolist() == [1]
@@ -0,0 +1,68 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+from final_complete_system import FinalMalaysianNurseRoster
+from inrc2_scorer import Inrc2Scorer
+from solver_progress import SolverInstrumentation
+
+TEST_DATASETS = os.path.join(os.path.dirname(__file__), "..", "dataset", "testdatasets_json")
+WEEK = "n005w4-1"
+
+
+@pytest.fixture
+def system(tmp_path):
+    system = FinalMalaysianNurseRoster(TEST_DATASETS, instrumentation=SolverInstrumentation(),
+                                       output_dir=str(tmp_path), store_path=str(tmp_path / "store"))
+    system.EARLY_STOP = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert system._load_scenario("n005w4")
+    return system
+
+
+def _solve_and_score(system):
+    store = system.scenarios["n005w4"]["store"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        solution = system._solve_with_full_compliance("n005w4", demand_id=WEEK, history=store.history("0"),
+                                                      time_limit=10)
+    score = Inrc2Scorer(store, [WEEK], "0").score([solution["assignments"]])
+    return solution, score
+
+
+def test_minimum_staffing_is_hard_when_the_malaysian_limits_allow_it(system):
+    system.MAX_HOURS_PER_WEEK = 60
+    system.MAX_CONSECUTIVE_NIGHTS = 7
+    solution, score = _solve_and_score(system)
+    assert solution["inrc2_valid"]
+    assert solution["understaffing"] == []
+    assert score["hard"]["understaffing"] == 0
+
+
+def test_understaffing_forced_by_the_malaysian_limits_is_reported(system):
+    solution, score = _solve_and_score(system)
+    assert not solution["inrc2_valid"]
+    missing = sum(slot["missing"] for slot in solution["understaffing"])
+    assert missing == solution["uncovered"] == score["hard"]["understaffing"] > 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        compliance = system._validate_full_compliance(system._add_break_scheduling(solution))
+    assert not compliance["inrc2_valid"]
+    assert any("below INRC-II minimum staffing" in v for v in compliance["violations"])
+
+
+def test_a_week_too_hard_to_prove_gets_a_roster_within_its_time_limit(tmp_path):
+    # n021w4's first week is neither solved nor proven infeasible in a few seconds
+    system = FinalMalaysianNurseRoster(TEST_DATASETS, instrumentation=SolverInstrumentation(),
+                                       output_dir=str(tmp_path), store_path=str(tmp_path / "store"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert system._load_scenario("n021w4")
+        store = system.scenarios["n021w4"]["store"]
+        solution = system._solve_with_full_compliance("n021w4", demand_id=store.week_ids[0],
+                                                      history=store.history("0"), time_limit=6)
+    assert solution is not None
+    assert solution["uncovered"] == sum(slot["missing"] for slot in solution["understaffing"])
+    assert solution["inrc2_valid"] == (solution["uncovered"] == 0)
+    # The fewest-missing probe counts as solve time, before the final solve's incumbents
+    assert 0 < solution["understaffing_time"] < solution["solve_time"]
+    assert solution["incumbents"][0]["wall_time"] >= solution["understaffing_time"]
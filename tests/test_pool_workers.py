@@ -0,0 +1,46 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+from final_complete_system import FinalMalaysianNurseRoster, _solve_subset
+from solver_progress import SolverInstrumentation
+
+TEST_DATASETS = os.path.join(os.path.dirname(__file__), "..", "dataset", "testdatasets_json")
+
+
+@pytest.fixture
+def system(tmp_path):
+    system = FinalMalaysianNurseRoster(TEST_DATASETS, instrumentation=SolverInstrumentation(),
+                                       output_dir=str(tmp_path), store_path=str(tmp_path / "store"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert system._load_scenario("n005w4")
+    return system
+
+
+def test_worker_uses_the_parent_settings_and_returns_its_telemetry(system):
+    scenario_data = system.scenarios["n005w4"]
+    store = scenario_data["store"]
+    kwargs = dict(demand_id=store.week_ids[0], history=store.history("0"), fixed={},
+                  nurse_subset=store.nurses[:2], skill_subset=["Nurse"], time_limit=5)
+
+    system.PENALTY_UNCOVERED_BLOCK = 50
+    solution, records = _solve_subset(system.datasets_path, scenario_data, system.settings(), kwargs)
+    system.PENALTY_UNCOVERED_BLOCK = 51
+    heavier, _ = _solve_subset(system.datasets_path, scenario_data, system.settings(), kwargs)
+
+    # Nobody works, so every minimum Nurse slot is uncovered and priced at the parent's penalty
+    assert solution["uncovered"] > 0
+    assert heavier["objective"] - solution["objective"] == solution["uncovered"]
+    assert {"model", "solve"} <= {r["type"] for r in records}
+
+
+def test_decomposed_solve_forwards_block_telemetry(system):
+    store = system.scenarios["n005w4"]["store"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        solution = system._solve_decomposed("n005w4", demand_id=store.week_ids[0],
+                                            history=store.history("0"), time_limit=4, max_workers=1)
+    assert solution
+    blocks = {r["block"] for r in system.instrumentation.records if r["type"] == "solve" and "block" in r}
+    assert blocks == {b["skill"] for b in solution["decomposition"]["blocks"]}
@@ -0,0 +1,43 @@
+import lambda_rostering
+from roster_cache import RosterCache, canonical_key
+
+PROFILES = [
+    {"nurse_id": "n001", "preferred_days_off": [0, 6], "preferred_shift_type": 0},
+    {"nurse_id": "n002", "preferred_days_off": [1, 2], "preferred_shift_type": 0},
+    {"nurse_id": "n003", "preferred_days_off": [3, 4], "preferred_shift_type": 1},
+    {"nurse_id": "n004", "preferred_days_off": [5, 6], "preferred_shift_type": 1},
+    {"nurse_id": "n005", "preferred_days_off": [2, 3], "preferred_shift_type": 0},
+]
+
+
+def test_key_ignores_profile_order_but_not_options():
+    reordered = [dict(p, preferred_days_off=p["preferred_days_off"][::-1]) for p in reversed(PROFILES)]
+    assert canonical_key(PROFILES, 4) == canonical_key(reordered, 4)
+    assert canonical_key(PROFILES, 4) != canonical_key(PROFILES, 5)
+    assert canonical_key(PROFILES, 4, {"time_limit": 1}) != canonical_key(PROFILES, 4, {"time_limit": 20})
+
+
+def test_only_optimal_results_are_exact_hits(tmp_path):
+    cache = RosterCache(str(tmp_path / "cache.sqlite3"))
+    ids = [p["nurse_id"] for p in PROFILES]
+    cache.put("feasible", ids, {"status": "FEASIBLE", "roster": {}})
+    cache.put("optimal", ids, {"status": "OPTIMAL", "roster": {}})
+    assert cache.get("feasible") is None
+    assert cache.get("optimal")["status"] == "OPTIMAL"
+    assert cache.get("missing") is None
+    # Non-optimal entries still seed warm starts
+    assert cache.nearest(ids[:4]) is not None
+    assert cache.nearest(["x1", "x2"]) is None
+
+
+def test_cached_build_and_solve_miss_then_hit(tmp_path, monkeypatch):
+    monkeypatch.setattr(lambda_rostering, "_roster_cache", RosterCache(str(tmp_path / "cache.sqlite3")))
+    first = lambda_rostering.cached_build_and_solve(PROFILES, 4, time_limit=10, greedy_hint=False)
+    assert first["status"] == "OPTIMAL"
+    assert first["cache"] == "miss"
+    second = lambda_rostering.cached_build_and_solve(PROFILES, 4, time_limit=10, greedy_hint=False)
+    assert second["cache"] == "hit"
+    assert second["roster"] == first["roster"]
+    # Different solve options are a different key; the cached roster only warm-starts
+    third = lambda_rostering.cached_build_and_solve(PROFILES, 4, time_limit=5, greedy_hint=False)
+    assert third["cache"] == "warm_start"
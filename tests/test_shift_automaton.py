@@ -0,0 +1,95 @@
+import itertools
+
+import numpy as np
+import pytest
+from ortools.sat.python import cp_model
+
+from inrc2_scorer import _runs
+from shift_automaton import OFF, SequenceRules, add_sequence_constraint
+
+SHIFTS = ["Early", "Late", "Night"]
+DAYS = 5
+
+
+def _rules(**hard):
+    return SequenceRules(
+        SHIFTS, consecutive_limits={"Early": (2, 3), "Late": (1, 2), "Night": (3, 4)},
+        working_days_limits=(2, 4), days_off_limits=(2, 3), **hard)
+
+
+def _walk(rules, start, codes):
+    """Summed costs along `codes`, or None if a hard rule forbids the sequence."""
+    state, total = start, np.zeros(3, dtype=int)
+    for code in codes:
+        step = rules.transition(state, code)
+        if step is None:
+            return None
+        state, costs = step
+        total += costs
+    return total.tolist()
+
+
+def _scored(codes, last, shift_run, working_days, days_off):
+    """The same costs from inrc2_scorer's run semantics."""
+    codes = np.array(codes)
+    working = codes != OFF
+    shift = sum(int(_runs(codes == code, shift_run if last == code else 0, minimum, maximum))
+                for code, (minimum, maximum) in zip((1, 2, 3), [(2, 3), (1, 2), (3, 4)]))
+    return [shift, int(_runs(working, working_days, 2, 4)), int(_runs(~working, days_off, 2, 3))]
+
+
+HISTORIES = [(OFF, 0, 0, 0), (OFF, 0, 0, 1), (OFF, 0, 0, 5), (1, 1, 1, 0), (1, 4, 6, 0), (3, 2, 3, 0), (2, 1, 4, 0)]
+
+
+@pytest.mark.parametrize("last, shift_run, working_days, days_off", HISTORIES)
+def test_automaton_costs_match_the_scorer(last, shift_run, working_days, days_off):
+    rules = _rules()
+    start = rules.start_state(SHIFTS[last - 1] if last else None, shift_run, working_days, days_off)
+    for codes in itertools.product(range(len(SHIFTS) + 1), repeat=DAYS):
+        assert _walk(rules, start, codes) == _scored(codes, last, shift_run, working_days, days_off), codes
+
+
+def test_hard_rules_remove_transitions():
+    rules = _rules(forbidden_successions={"Night": ["Early"]}, max_consecutive={"Night": 2})
+    start = rules.start_state()
+
+    assert _walk(rules, start, [3, 1]) is None
+    assert _walk(rules, start, [3, 3, 3]) is None
+    assert _walk(rules, start, [3, 3, OFF, 1]) is not None
+    # Two nights already worked: a third on day 0 is forbidden
+    assert rules.next_state(rules.start_state("Night", 2, 2), 3) is None
+
+
+def _solve_fixed(rules, codes, start=None):
+    model = cp_model.CpModel()
+    x = [[model.NewBoolVar(f"x_{d}_{s}") for s in range(len(SHIFTS))] for d in range(len(codes))]
+    for row, code in zip(x, codes):
+        model.Add(sum(row) <= 1)
+        for s, var in enumerate(row):
+            model.Add(var == int(code == s + 1))
+    _, costs = add_sequence_constraint(model, rules, x, start)
+    solver = cp_model.CpSolver()
+    status = solver.Solve(model)
+    if status != cp_model.OPTIMAL:
+        return None
+    return {kind: sum(solver.Value(v) for v in values) for kind, values in costs.items()}
+
+
+def test_posted_automaton_forbids_and_prices_sequences():
+    rules = _rules(forbidden_successions={"Night": ["Early"]}, max_consecutive={"Night": 2})
+
+    assert _solve_fixed(rules, [3, 1, OFF, OFF, OFF]) is None
+    assert _solve_fixed(rules, [3, 3, 3, OFF, OFF]) is None
+    # Early once (1 short), then Night twice (1 short), then off: work run of 3 is fine
+    assert _solve_fixed(rules, [1, 3, 3, OFF, OFF]) == {"shift": 2, "work": 0, "off": 0}
+    assert _solve_fixed(rules, [OFF, 2, OFF, OFF, OFF], rules.start_state(None, days_off=0)) == {
+        "shift": 0, "work": 1, "off": 1}
+
+
+def test_hard_only_rules_post_on_shift_codes():
+    rules = SequenceRules(SHIFTS, {"Night": ["Early"]})
+    (_, _, _, labels), work = rules.automata(rules.start_state())
+
+    assert work is None
+    assert labels == [(code, (0, 0, 0)) for code in range(len(SHIFTS) + 1)]
+    assert _solve_fixed(rules, [3, OFF, 1, 2, 2]) == {}
@@ -0,0 +1,109 @@
+import pytest
+
+import malaysian_nurse_rostering_cp as handler
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, client, rows):
+        self.client, self.rows = client, rows
+
+    def select(self, columns):
+        return self
+
+    def gte(self, column, value):
+        return _Query(self.client, [r for r in self.rows if r[column] >= value])
+
+    def order(self, column):
+        return _Query(self.client, sorted(self.rows, key=lambda r: r[column]))
+
+    def range(self, start, end):
+        return _Query(self.client, self.rows[start:end + 1])
+
+    def execute(self):
+        self.client.queries += 1
+        return _Response(list(self.rows))
+
+
+class LocalSupabase:
+    """Stand-in for the Supabase client: one in-memory preference table."""
+
+    def __init__(self, rows):
+        self.rows = {row["userId"]: dict(row) for row in rows}
+        self.queries = 0
+
+    def table(self, name):
+        assert name == handler.PREFERENCE_TABLE
+        return _Query(self, list(self.rows.values()))
+
+    def upsert(self, row):
+        self.rows[row["userId"]] = dict(row)
+
+    def delete(self, user_id):
+        del self.rows[user_id]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(handler.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def client(clock):
+    client = LocalSupabase([
+        {"userId": "a", "dayOffs": [0], "preferredShift": "day", "updatedAt": "2026-01-01T00:00:00"},
+        {"userId": "b", "dayOffs": [6], "preferredShift": "night", "updatedAt": "2026-01-02T00:00:00"},
+    ])
+    handler.set_supabase_client(client)
+    yield client
+    handler.set_supabase_client(None)
+
+
+def _profiles():
+    return {n["nurse_id"]: n for n in handler.fetch_nurse_preferences()}
+
+
+def test_rows_are_mapped_to_nurse_profiles(client):
+    profiles = _profiles()
+    assert profiles["a"] == {"nurse_id": "a", "preferred_days_off": [0], "preferred_shift_type": 0}
+    assert profiles["b"]["preferred_shift_type"] == 1
+
+
+def test_cached_rows_are_served_within_the_ttl(client, clock):
+    _profiles()
+    queries = client.queries
+    client.upsert({"userId": "a", "dayOffs": [3], "preferredShift": "day", "updatedAt": "2026-01-03T00:00:00"})
+    clock[0] += handler.PREFERENCE_TTL_SECONDS - 1
+    assert _profiles()["a"]["preferred_days_off"] == [0]
+    assert client.queries == queries
+
+
+def test_incremental_refresh_after_the_ttl_fetches_only_updated_rows(client, clock, monkeypatch):
+    _profiles()
+    fetched = []
+    original = handler._fetch_preference_rows
+    monkeypatch.setattr(handler, "_fetch_preference_rows",
+                        lambda since=None: fetched.append(original(since)) or fetched[-1])
+    client.upsert({"userId": "a", "dayOffs": [3], "preferredShift": "day", "updatedAt": "2026-01-03T00:00:00"})
+    client.upsert({"userId": "c", "dayOffs": [], "preferredShift": None, "updatedAt": "2026-01-04T00:00:00"})
+    client.delete("b")  # deletions are only seen by the full reload
+    clock[0] += handler.PREFERENCE_TTL_SECONDS
+    profiles = _profiles()
+    # Rows updated at/after the high-water mark ("b" is gone, so only a and c come back)
+    assert sorted(r["userId"] for r in fetched[0]) == ["a", "c"]
+    assert profiles["a"]["preferred_days_off"] == [3]
+    assert profiles["c"]["preferred_shift_type"] == -1
+    assert "b" in profiles
+
+
+def test_full_refresh_drops_deleted_rows(client, clock):
+    _profiles()
+    client.delete("b")
+    clock[0] += handler.PREFERENCE_FULL_REFRESH_SECONDS
+    assert sorted(_profiles()) == ["a"]
@@ -0,0 +1,64 @@
+import itertools
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+import lambda_rostering
+from symmetry import add_lex_ordering, equivalence_classes, sort_rows
+
+
+class _Collector(cp_model.CpSolverSolutionCallback):
+    def __init__(self, rows):
+        super().__init__()
+        self.rows, self.solutions = rows, []
+
+    def on_solution_callback(self):
+        self.solutions.append(tuple(tuple(self.Value(v) for v in row) for row in self.rows))
+
+
+def _enumerate(num_rows, width, classes):
+    model = cp_model.CpModel()
+    rows = [[model.NewBoolVar(f"x{r}_{k}") for k in range(width)] for r in range(num_rows)]
+    pairs = add_lex_ordering(model, rows, classes)
+    solver = cp_model.CpSolver()
+    solver.parameters.enumerate_all_solutions = True
+    collector = _Collector(rows)
+    solver.Solve(model, collector)
+    return pairs, set(collector.solutions)
+
+
+def test_equivalence_classes_group_identical_signatures_and_drop_singletons():
+    assert equivalence_classes(["a", "b", "a", "c", "b", "a"]) == [[0, 2, 5], [1, 4]]
+    assert equivalence_classes(["a", "b"]) == []
+
+
+def test_lex_ordering_keeps_exactly_the_non_increasing_rows():
+    pairs, solutions = _enumerate(3, 3, [[0, 1, 2]])
+    assert pairs == 2
+    rows = list(itertools.product((0, 1), repeat=3))
+    expected = {(a, b, c) for a in rows for b in rows for c in rows if a >= b >= c}
+    assert solutions == expected
+
+
+def test_rows_outside_a_class_are_unconstrained():
+    _, solutions = _enumerate(3, 2, [[0, 2]])
+    assert len(solutions) == 10 * 4  # 10 ordered (row 0, row 2) pairs, row 1 free
+    assert all(s[0] >= s[2] for s in solutions)
+
+
+def test_sort_rows_puts_a_class_in_lex_order():
+    values = np.array([[0, 1], [1, 1], [1, 0], [0, 0]])
+    order = sort_rows(values, [[0, 2, 3]])
+    assert order.tolist() == [2, 1, 0, 3]
+    assert values[order].tolist() == [[1, 0], [1, 1], [0, 1], [0, 0]]
+
+
+def test_symmetry_breaking_keeps_the_optimal_objective():
+    # Two classes of two interchangeable nurses
+    profiles = [{"nurse_id": f"n{i:03d}", "preferred_days_off": [0, 6], "preferred_shift_type": i % 2}
+                for i in range(4)]
+    options = dict(time_limit=10, greedy_hint=False, early_stop={})
+    plain = lambda_rostering.build_and_solve(profiles, 2, **options)
+    broken = lambda_rostering.build_and_solve(profiles, 2, break_symmetry=True, **options)
+    assert plain["status"] == broken["status"] == "OPTIMAL"
+    assert broken["objective"] == plain["objective"]
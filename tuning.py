@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+CP-SAT PARAMETER TUNING
+=======================
+Races solver settings (solver_config.SolverConfig) over the bundled INRC-II
+instances and writes the winner per ward size class as a profile file that
+FinalMalaysianNurseRoster.load_solver_profiles and build_and_solve's
+solver_profiles read back (solver_config.SolverProfiles).
+
+For each size class (solver_config.SIZE_CLASSES):
+
+1. Candidates: the default settings plus a random sample of PARAMETER_SPACE
+   (search workers, portfolio or fixed subsolvers, search branching,
+   linearization level).
+2. Successive halving on the training suite (dataset/datasets_json): every
+   surviving candidate solves the first weekly model of the same instances,
+   (scenario, history, week) triples, and is ranked per instance by
+   objective, then time-to-best. The best 1/eta by mean rank survive and
+   the next round uses eta times as many instances.
+3. Validation on the held-out suite (dataset/hidden-JSON): the winner must
+   rank at least as well as the default settings there, or the class keeps
+   the defaults.
+
+The profile's time_limit is the tuning budget cut to 1.25x the winner's
+latest time-to-best in training, so small wards also get shorter solves.
+Profiles of classes not tuned in a run are kept from an existing output file.
+
+Usage:
+    python benchmark.py tune --classes small --time-limit 5
+    python tuning.py --engine lambda --candidates 12 --eta 3
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmark import SUITES, discover_instances, lambda_inputs
+from final_complete_system import FinalMalaysianNurseRoster
+from lambda_rostering import build_and_solve
+from solver_config import SIZE_CLASSES, SolverConfig, available_cpus, size_class
+
+# Solver settings raced against each other; None / 0 values are CP-SAT's defaults
+PARAMETER_SPACE = {
+    "num_workers": sorted({1, 2, 4, 8, available_cpus()}),
+    "subsolvers": [
+        None,
+        ["default_lp", "max_lp", "core", "quick_restart"],
+        ["default_lp", "no_lp", "pseudo_costs", "quick_restart_no_lp"],
+    ],
+    "search_branching": ["AUTOMATIC_SEARCH", "LP_SEARCH", "PSEUDO_COST_SEARCH",
+                         "PORTFOLIO_WITH_QUICK_RESTART_SEARCH"],
+    "linearization_level": [0, 1, 2],
+}
+TIME_LIMIT_MARGIN = 1.25  # profile time_limit = margin x latest time-to-best in training
+
+Instance = Tuple[str, str, str]  # (scenario_id, demand_id, history_id)
+
+
+def candidate_configs(count: int, seed: int = 0) -> List[Dict]:
+    """The default settings plus up to count - 1 distinct random points of PARAMETER_SPACE."""
+    names = list(PARAMETER_SPACE)
+    points = list(itertools.product(*PARAMETER_SPACE.values()))
+    random.Random(seed).shuffle(points)
+    candidates = [SolverConfig().as_dict()]
+    for point in points[:max(0, count - 1)]:
+        settings = dict(zip(names, point))
+        candidates.append(SolverConfig(
+            num_workers=settings.pop("num_workers"),
+            subsolvers=settings.pop("subsolvers"),
+            parameters=settings,
+        ).as_dict())
+    return candidates
+
+
+def load_suite(suite: str, verbose: bool = False) -> FinalMalaysianNurseRoster:
+    """A system with every instance of a benchmark suite loaded."""
+    system = FinalMalaysianNurseRoster(datasets_path=SUITES[suite])
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        for scenario_id in discover_instances(SUITES[suite]):
+            system._load_scenario(scenario_id)
+    return system
+
+
+def suite_instances(system: FinalMalaysianNurseRoster, size: str, seed: int = 0) -> List[Instance]:
+    """(scenario, first-week demand, history) triples of one size class, in a seeded order."""
+    instances = []
+    for scenario_id, data in sorted(system.scenarios.items()):
+        store = data["store"]
+        if size_class(len(store.nurses)) != size:
+            continue
+        for history_id, demand_id in itertools.product(store.history_ids, store.week_ids):
+            instances.append((scenario_id, demand_id, history_id))
+    random.Random(seed).shuffle(instances)
+    return instances
+
+
+def evaluate(system: FinalMalaysianNurseRoster, engine: str, instance: Instance, config: Dict,
+             time_limit: float, verbose: bool = False) -> Dict:
+    """Solve one weekly model under `config`; objective (None if unsolved) and time-to-best."""
+    scenario_id, demand_id, history_id = instance
+    solver_config = SolverConfig.from_dict(config)
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        if engine == "lambda":
+            nurse_profiles, N = lambda_inputs(system, scenario_id, demand_id)
+            result = build_and_solve(nurse_profiles, N, time_limit=time_limit, solver_config=solver_config)
+            result = None if "error" in result else result
+        else:
+            store = system.scenarios[scenario_id]["store"]
+            result = system._solve_with_full_compliance(
+                scenario_id, demand_id=demand_id, history=store.history(history_id),
+                time_limit=time_limit, solver_config=solver_config)
+    if not result:
+        return {"objective": None, "time_to_best": time_limit}
+    incumbents = result.get("incumbents") or []
+    return {
+        "objective": result["objective"],
+        "time_to_best": incumbents[-1]["wall_time"] if incumbents else result["solve_time"],
+    }
+
+
+def mean_ranks(results: Dict[Tuple[int, Instance], Dict], candidates: List[int],
+               instances: List[Instance]) -> Dict[int, float]:
+    """Mean per-instance rank (1 = best objective, then fastest) of each candidate."""
+    ranks = {k: [] for k in candidates}
+    for instance in instances:
+        def key(k):
+            r = results[(k, instance)]
+            return (math.inf if r["objective"] is None else r["objective"], r["time_to_best"])
+        for rank, k in enumerate(sorted(candidates, key=key), start=1):
+            ranks[k].append(rank)
+    return {k: float(np.mean(v)) for k, v in ranks.items()}
+
+
+def race(system: FinalMalaysianNurseRoster, engine: str, configs: List[Dict], instances: List[Instance],
+         time_limit: float, eta: int = 2, initial_instances: int = 2,
+         verbose: bool = False) -> Tuple[int, Dict, List[Dict]]:
+    """
+    Successive halving over `configs`; returns the winner's index, every
+    (candidate, instance) result and a per-round log.
+    """
+    survivors = list(range(len(configs)))
+    results, rounds = {}, []
+    count = min(len(instances), max(1, initial_instances))
+    while True:
+        used = instances[:count]
+        for k in survivors:
+            for instance in used:
+                if (k, instance) not in results:
+                    results[(k, instance)] = evaluate(system, engine, instance, configs[k], time_limit, verbose)
+        ranks = mean_ranks(results, survivors, used)
+        survivors = sorted(survivors, key=lambda k: ranks[k])
+        rounds.append({"instances": len(used), "ranks": {str(k): ranks[k] for k in survivors}})
+        print(f"   🏁 round {len(rounds)}: {len(survivors)} candidates on {len(used)} instances, "
+              f"leader #{survivors[0]} (mean rank {ranks[survivors[0]]:.2f})")
+        survivors = survivors[:max(1, math.ceil(len(survivors) / eta))]
+        if len(survivors) == 1:
+            return survivors[0], results, rounds
+        count = min(len(instances), count * eta)
+
+
+def tune_class(train: FinalMalaysianNurseRoster, validation: Optional[FinalMalaysianNurseRoster],
+               size: str, args) -> Optional[Dict]:
+    """Race candidates on one size class and validate the winner; None without training instances."""
+    instances = suite_instances(train, size, args.seed)
+    if not instances:
+        print(f"   ⚠️ No training instances for size class {size}")
+        return None
+    configs = candidate_configs(args.candidates, args.seed)
+    print(f"\n🔧 {size}: {len(configs)} candidates, {len(instances)} training instances")
+    winner, results, rounds = race(train, args.engine, configs, instances, args.time_limit,
+                                   args.eta, args.initial_instances, args.verbose)
+
+    report = {"winner_mean_rank": None, "default_mean_rank": None, "instances": 0, "accepted": True}
+    held_out = suite_instances(validation, size, args.seed)[:args.validation_instances] if validation else []
+    if held_out and winner != 0:
+        checked = {}
+        for k in (0, winner):
+            for instance in held_out:
+                checked[(k, instance)] = evaluate(validation, args.engine, instance, configs[k],
+                                                  args.time_limit, args.verbose)
+        ranks = mean_ranks(checked, [0, winner], held_out)
+        report = {"winner_mean_rank": ranks[winner], "default_mean_rank": ranks[0],
+                  "instances": len(held_out), "accepted": ranks[winner] <= ranks[0]}
+        print(f"   ✅ validation on {len(held_out)} held-out instances: winner {ranks[winner]:.2f}, "
+              f"default {ranks[0]:.2f}")
+    chosen = winner if report["accepted"] else 0
+
+    times = [r["time_to_best"] for (k, _), r in results.items() if k == chosen and r["objective"] is not None]
+    time_limit = min(args.time_limit, math.ceil(TIME_LIMIT_MARGIN * max(times, default=args.time_limit) * 10) / 10)
+    return {
+        "max_nurses": SIZE_CLASSES[size],
+        "solver": configs[chosen],
+        "time_limit": max(1.0, time_limit),
+        "engine": args.engine,
+        "training": {"instances": rounds[-1]["instances"], "candidates": len(configs), "rounds": rounds},
+        "validation": report,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Tune CP-SAT settings per ward size class")
+    parser.add_argument("--engine", default="full", choices=["full", "lambda"],
+                        help="model to tune: FinalMalaysianNurseRoster weekly model or build_and_solve")
+    parser.add_argument("--train-suite", default="datasets", choices=list(SUITES))
+    parser.add_argument("--validation-suite", default="hidden", choices=list(SUITES) + ["none"])
+    parser.add_argument("--classes", default=",".join(SIZE_CLASSES),
+                        help=f"comma-separated size classes: {','.join(SIZE_CLASSES)}")
+    parser.add_argument("--candidates", type=int, default=8, help="settings raced per class (incl. default)")
+    parser.add_argument("--eta", type=int, default=2, help="keep 1/eta of the candidates per round")
+    parser.add_argument("--initial-instances", type=int, default=2, help="instances in the first round")
+    parser.add_argument("--validation-instances", type=int, default=3)
+    parser.add_argument("--time-limit", type=float, default=10.0, help="solver seconds per instance")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="output/solver_profiles.json")
+    parser.add_argument("--verbose", action="store_true", help="show solver output")
+    args = parser.parse_args(argv)
+
+    classes = [c for c in args.classes.split(",") if c]
+    unknown = [c for c in classes if c not in SIZE_CLASSES]
+    if unknown:
+        parser.error(f"unknown size class(es): {', '.join(unknown)}")
+    args.eta = max(2, args.eta)
+
+    print("🎛️ CP-SAT PARAMETER TUNING")
+    print("=" * 60)
+    train = load_suite(args.train_suite, args.verbose)
+    validation = None
+    if args.validation_suite != "none" and os.path.isdir(SUITES[args.validation_suite]):
+        validation = load_suite(args.validation_suite, args.verbose)
+
+    profiles = {}
+    if os.path.exists(args.output):
+        with open(args.output, "r") as f:
+            profiles = json.load(f).get("profiles", {})
+    for size in classes:
+        profile = tune_class(train, validation, size, args)
+        if profile:
+            profiles[size] = profile
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"created_at": datetime.now().isoformat(), "config": vars(args), "profiles": profiles},
+                  f, indent=2)
+    print(f"\n💾 Profiles saved: {args.output} ({', '.join(profiles)})")
+
+
+if __name__ == "__main__":
+    main()
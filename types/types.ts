@@ -1,12 +1,7 @@
-// Define the input type for clarity
-export interface DeepARInput {
-    instances: {
-        start: string;
-        target: number[];
-    }[];
-    configuration: {
-        num_samples: number;
-        output_types: string[];
-        quantiles: string[];
+// Weekly roster returned by the rostering Lambda: nurse ids per day and shift
+export type Roster = {
+    [day: string]: {
+        day_shift: string[];
+        night_shift: string[];
     };
-}
\ No newline at end of file
+};